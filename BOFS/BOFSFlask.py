@@ -4,6 +4,7 @@ import jinja2
 import json
 import os
 import random
+import threading
 from typing import Union
 from flask import Flask, send_from_directory, Response, url_for, render_template, session, request, redirect
 from flask_sqlalchemy import SQLAlchemy
@@ -12,7 +13,7 @@ from markupsafe import Markup
 from BOFS import util
 from . import startup
 from .BOFSSession import BOFSSessionInterface
-from .JSONQuestionnaire import JSONQuestionnaire
+from .JSONQuestionnaire import JSONQuestionnaire, QuestionnaireRegistry
 from .JSONTable import JSONTable
 from .PageList import PageList
 from .setup_diagnostics import DiagnosticCollector
@@ -57,8 +58,9 @@ class BOFSFlask(Flask):
 
         self.db = SQLAlchemy(self)
         self._register_page_list_cache_invalidation()
+        self._register_progress_tracking()
 
-        self.questionnaires : dict[str, JSONQuestionnaire] = {}
+        self.questionnaires : dict[str, JSONQuestionnaire] = QuestionnaireRegistry()
         """A generated list of user-defined questionnaires, as found in the config file."""
 
         self.tables : dict[str, JSONTable] = {}
@@ -114,15 +116,76 @@ class BOFSFlask(Flask):
         self.questionnaire_paths = {}
         self.table_paths = {}
 
+        # Background maintenance sweep; set by start_maintenance().
+        self.maintenance = None
+        self.maintenance_report = None
+
+        # Background writer for interaction events and the ENABLE_LOGGING
+        # submission log; started on first use by get_interaction_writer()
+        # and get_submission_log().
+        self.interaction_writer = None
+        self.submission_log = None
+        self._background_lock = threading.Lock()
+
+        # /user_active heartbeats waiting to be written when
+        # HEARTBEAT_FLUSH_SECONDS is set; created by get_heartbeat_buffer().
+        self.heartbeats = None
+
     def _register_page_list_cache_invalidation(self):
-        """Clear the request-scoped ``flat_page_list`` cache on every commit,
-        since a committed write can change ``show_if`` page visibility."""
+        """Drop cached ``show_if`` page sequences when a commit writes data a
+        predicate can read: questionnaire or table rows, or the Participant
+        columns named in ``RESERVED_PARTICIPANT_BARE_NAMES``. Progress,
+        session and interaction-log writes leave the caches intact."""
         from sqlalchemy import event
-        from .PageList import invalidate_flat_page_list_cache
+        from .PageList import apply_show_if_changes, discard_show_if_changes, record_show_if_changes
+
+        @event.listens_for(self.db.session, "after_flush")
+        def _record_show_if_changes(session, flush_context):
+            record_show_if_changes(session, self._show_if_models(), getattr(self.db, "Participant", None))
 
         @event.listens_for(self.db.session, "after_commit")
-        def _clear_flat_page_list_cache(session):
-            invalidate_flat_page_list_cache()
+        def _apply_show_if_changes(session):
+            apply_show_if_changes(session)
+
+        @event.listens_for(self.db.session, "after_rollback")
+        def _discard_show_if_changes(session):
+            discard_show_if_changes(session)
+
+    def _register_progress_tracking(self):
+        """Write what ``track_progress`` staged just before the request's
+        first commit. Views that don't commit get theirs from
+        :meth:`process_response`."""
+        from sqlalchemy import event
+        from .services.routing import write_tracked_progress
+
+        event.listen(self.db.session, "before_commit", write_tracked_progress)
+
+    def process_response(self, response):
+        """Run the ``after_request`` hooks and save the session as Flask
+        does, then commit what they left staged, the session row and
+        ``track_progress``'s writes, together. A page view that doesn't
+        commit itself costs one commit. Error responses drop tracked
+        progress, and their session is saved with its own commit."""
+        from flask import g
+        from .services.routing import commit_tracked_progress
+
+        if response.status_code >= 500:
+            g.pop('bofs_tracked_progress', None)
+        g.bofs_defer_session_commit = True
+        try:
+            response = super().process_response(response)
+        finally:
+            g.pop('bofs_defer_session_commit', None)
+        if g.pop('bofs_session_uncommitted', False):
+            self.db.session.commit()
+        return commit_tracked_progress(response)
+
+    def _show_if_models(self) -> set:
+        """Model classes whose rows ``show_if`` predicates can read."""
+        models = {q.db_class for q in self.questionnaires.values()}
+        models.update(t.db_class for t in self.tables.values())
+        models.discard(None)
+        return models
 
     # Overriding Flask.run so production mode uses waitress instead of Flask's dev server.
     def run(self, host=None, port=None, **options) -> None:
@@ -144,6 +207,11 @@ class BOFSFlask(Flask):
             if not self.run_with_reloader_off:
                 print('Auto-reloading of project when changes are detected is turned ON.')
 
+            # With the reloader on, only the child process serves requests;
+            # the watching parent has no business sweeping the database.
+            if self.run_with_reloader_off or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+                self.start_maintenance()
+
             super(BOFSFlask, self).run(host, port, debug=True, use_reloader=not self.run_with_reloader_off, **options)
         else:
             self.waitress_run(host=host, port=port)
@@ -160,10 +228,84 @@ class BOFSFlask(Flask):
             except (TypeError, ValueError):
                 threads = 16
 
+        self.start_maintenance()
+
         try:
             serve(self, host=host, port=port, threads=threads)
         except KeyboardInterrupt:
             pass
+        finally:
+            if self.maintenance is not None:
+                self.maintenance.stop(timeout=5)
+            if self.interaction_writer is not None:
+                self.interaction_writer.stop(timeout=5)
+            if self.submission_log is not None:
+                self.submission_log.stop()
+            # Sessions held dirty by SESSION_CACHE_FLUSH_SECONDS would
+            # otherwise be lost on shutdown.
+            with self.app_context():
+                self.session_interface.flush(self)
+                self.flush_heartbeats()
+
+    def start_maintenance(self) -> None:
+        """Start the background sweep of expired sessions, bans and login
+        attempts (see ``BOFS/services/maintenance.py``). No-op when
+        ``MAINTENANCE_INTERVAL_MINUTES`` is 0."""
+        minutes = self.config.get('MAINTENANCE_INTERVAL_MINUTES', 0)
+        if not minutes or self.maintenance is not None:
+            return
+        from .services.maintenance import MaintenanceScheduler
+        self.maintenance = MaintenanceScheduler(self, minutes * 60)
+        self.maintenance.start()
+
+    def get_interaction_writer(self):
+        """The running :class:`~BOFS.services.interaction_writer.InteractionWriter`,
+        started on first use, or ``None`` when ``INTERACTION_LOG_QUEUE_SIZE``
+        is 0 and interaction events are written by the submit request."""
+        if not self.config.get('INTERACTION_LOG_QUEUE_SIZE', 0):
+            return None
+        with self._background_lock:
+            if self.interaction_writer is None:
+                from .services.interaction_writer import InteractionWriter
+                self.interaction_writer = InteractionWriter(
+                    self, self.config['INTERACTION_LOG_QUEUE_SIZE'],
+                    self.config.get('INTERACTION_LOG_BATCH_SIZE', 5000))
+                self.interaction_writer.start()
+        return self.interaction_writer
+
+    def get_submission_log(self):
+        """The :class:`~BOFS.services.submission_log.SubmissionLog` that
+        ``ENABLE_LOGGING`` writes submissions to, started on first use, or
+        ``None`` when logging is off."""
+        if not self.config.get('ENABLE_LOGGING'):
+            return None
+        with self._background_lock:
+            if self.submission_log is None:
+                from .services.submission_log import SubmissionLog
+                self.submission_log = SubmissionLog(self)
+                self.submission_log.start()
+        return self.submission_log
+
+    def get_heartbeat_buffer(self):
+        """The :class:`~BOFS.services.heartbeat.HeartbeatBuffer` that
+        ``/user_active`` records into, or ``None`` when
+        ``HEARTBEAT_FLUSH_SECONDS`` is 0 and every heartbeat is written
+        straight away."""
+        interval = self.config.get('HEARTBEAT_FLUSH_SECONDS', 0)
+        if not interval:
+            return None
+        with self._background_lock:
+            if self.heartbeats is None:
+                from .services.heartbeat import HeartbeatBuffer
+                self.heartbeats = HeartbeatBuffer(self, interval)
+        return self.heartbeats
+
+    def flush_heartbeats(self) -> None:
+        """Write buffered heartbeats so ``lastActiveOn`` (and with it
+        ``is_in_progress`` / ``is_abandoned``) is current. Commits the
+        current transaction; a no-op when nothing is buffered."""
+        if self.heartbeats is not None and len(self.heartbeats):
+            self.heartbeats.flush()
 
     @property
     def validation_errors(self):
@@ -465,8 +607,19 @@ class BOFSFlask(Flask):
     def warn_about_orphan_participants(self) -> None:
         return startup.warn_about_orphan_participants(self)
 
-    _ACTIVITY_POLL_TAG = b'<script src="/BOFS_static/js/user_active.js"></script>'
+    _ACTIVITY_POLL_TAG = b'<script src="/BOFS_static/js/user_active.js" data-interval="%d"></script>'
     _ACTIVITY_POLL_SKIP_PREFIXES = ('/admin', '/BOFS_static')
+    _ACTIVITY_POLL_MIN_SECONDS = 10
+
+    def activity_poll_interval(self) -> int:
+        """Seconds between ``/user_active`` heartbeats from a visible page:
+        a third of ``ABANDONED_MINUTES``, so a participant is only marked
+        abandoned after missing three heartbeats in a row."""
+        seconds = int(self.config.get('ABANDONED_MINUTES', 5) * 60) // 3
+        return max(seconds, self._ACTIVITY_POLL_MIN_SECONDS)
+
+    def _activity_poll_tag(self) -> bytes:
+        return self._ACTIVITY_POLL_TAG % self.activity_poll_interval()
 
     def after_request_(self, response):
         """
@@ -496,6 +649,12 @@ class BOFSFlask(Flask):
         if response.direct_passthrough:
             return response
 
+        if response.is_streamed:
+            # Buffering the body here would undo the streaming; inject the
+            # tag as the chunks go out instead.
+            response.response = self._inject_activity_poll_tag(response.response, request.path)
+            return response
+
         body = response.get_data()
         # Empty/whitespace-only responses (e.g. API endpoints that just return
         # "") aren't pages — skip silently rather than warning.
@@ -504,13 +663,47 @@ class BOFSFlask(Flask):
 
         idx = body.rfind(b'</body>')
         if idx == -1:
-            self.logger.warning(
-                "BOFS activity-polling: response for %s has no </body> tag; "
-                "skipping script injection. Participants on this page won't "
-                "have their lastActiveOn refreshed and may be marked abandoned.",
-                request.path,
-            )
+            self._warn_no_body_tag(request.path)
             return response
 
-        response.set_data(body[:idx] + self._ACTIVITY_POLL_TAG + body[idx:])
+        response.set_data(body[:idx] + self._activity_poll_tag() + body[idx:])
         return response
+
+    def _inject_activity_poll_tag(self, chunks, path):
+        """Yield ``chunks`` (str or bytes) with the activity-polling tag
+        inserted before the last ``</body>``, as :meth:`after_request_` does
+        for buffered responses. Only text that may still hold that tag is
+        held back: a possible partial ``</body>`` at the end of a chunk, and
+        everything from the latest ``</body>`` on."""
+        pending = None
+        for chunk in chunks:
+            if not chunk:
+                continue
+            pending = chunk if pending is None else pending + chunk
+            marker = b'</body>' if isinstance(pending, bytes) else '</body>'
+            idx = pending.rfind(marker)
+            if idx == -1:
+                idx = max(len(pending) - len(marker) + 1, 0)
+            if idx:
+                yield pending[:idx]
+                pending = pending[idx:]
+
+        if pending is None:
+            return
+        tag = self._activity_poll_tag()
+        marker = b'</body>'
+        if isinstance(pending, str):
+            tag, marker = tag.decode(), marker.decode()
+        if pending.startswith(marker):
+            yield tag + pending
+            return
+        self._warn_no_body_tag(path)
+        yield pending
+
+    def _warn_no_body_tag(self, path):
+        self.logger.warning(
+            "BOFS activity-polling: response for %s has no </body> tag; "
+            "skipping script injection. Participants on this page won't "
+            "have their lastActiveOn refreshed and may be marked abandoned.",
+            path,
+        )
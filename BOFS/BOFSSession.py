@@ -1,19 +1,266 @@
+import copy
 import hashlib
-from flask import Request, current_app, has_app_context
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import Request, current_app, g, has_app_context
 from flask.sessions import SessionInterface, SessionMixin, TaggedJSONSerializer
-from itsdangerous import BadData, BadSignature
+from itsdangerous import BadData, BadSignature, URLSafeTimedSerializer
 from werkzeug.datastructures import CallbackDict
 from uuid import uuid4
-from datetime import timedelta
+from datetime import datetime, timedelta
 from . import BOFSFlask
 from .util import utcnow_naive
 
+try:
+    import orjson
+except ImportError:  # Optional speed-up; the stdlib writes the same format.
+    orjson = None
+
+
+# Session keys mirrored into SessionStore by the cookie backend. They are
+# what SessionRecoveryService matches on and merges back.
+_RECOVERY_KEYS = ('participantID', 'externalID', 'mTurkID')
+
+
+def _recovery_ids(data) -> tuple:
+    """``(participantID, externalID)`` as session recovery sees them."""
+    return data.get('participantID'), data.get('externalID') or data.get('mTurkID')
+
+
+class BOFSSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sessionID=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        # When the dictionary is modified, self.modified will be set True
+        CallbackDict.__init__(self, initial, on_update)
+
+        self.modified = False  # Starting state
+        self.new = new
+        self.sessionID = sessionID
+
+
+class StaticSession(BOFSSession):
+    """Empty placeholder session handed to static asset requests. Flask
+    treats it as a null session, so it is never saved and no cookie is
+    set; reads like ``'participantID' in session`` still work."""
+
+    def __init__(self):
+        super().__init__(None, sessionID=None)
+
+
+class CookieSession(BOFSSession):
+    """A :class:`BOFSSession` carried in a signed cookie
+    (``SESSION_BACKEND = "cookie"``). Remembers when the cookie was signed,
+    for sliding expiry, and which recovery keys were last mirrored into
+    ``SessionStore`` and until when, so the mirror row is only rewritten
+    when they change or its expiry is due for an extension."""
+
+    def __init__(self, initial=None, sessionID=None, new=False, signed_at=None, mirror_expiry=None):
+        super().__init__(initial, sessionID=sessionID, new=new)
+        self.signed_at = signed_at
+        self.mirrored_ids = _recovery_ids(self)
+        self.mirror_expiry = mirror_expiry
+
+
+class CachedSession:
+    """One entry in :class:`SessionCache`: the deserialised session dict
+    plus the row's expiry. ``dirty`` is set when the dict has changed
+    since it was last written to ``SessionStore``."""
+
+    __slots__ = ("data", "expiry", "dirty")
+
+    def __init__(self, data, expiry, dirty=False):
+        self.data = data
+        self.expiry = expiry
+        self.dirty = dirty
+
+    @property
+    def expired(self) -> bool:
+        return self.expiry is None or self.expiry <= utcnow_naive()
+
+
+class SessionCache:
+    """Bounded, thread-safe LRU of :class:`CachedSession` entries keyed by
+    sessionID. Sits in front of ``SessionStore`` when ``SESSION_CACHE_SIZE``
+    is non-zero so a cache hit in ``open_session`` never touches the
+    database.
+
+    The cache is per-process. That matches the default waitress deployment
+    (one process, many threads); a multi-process deployment would serve
+    stale sessions from a sibling worker's cache and must leave it off.
+    """
+
+    def __init__(self, max_size: int, flush_interval: float = 0):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._entries: "OrderedDict[str, CachedSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, session_id):
+        """Return a deep copy of the cached dict and its expiry as a
+        :class:`CachedSession`, or ``None`` on a miss. The copy keeps two
+        concurrent requests on the same cookie from sharing one mutable
+        dict."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(session_id)
+            return CachedSession(copy.deepcopy(entry.data), entry.expiry, entry.dirty)
+
+    def put(self, session_id, data, expiry, dirty=False) -> list:
+        """Insert or replace an entry. Returns ``(sessionID, entry)`` pairs
+        evicted to stay within ``max_size`` that still need writing back;
+        clean evictions are dropped silently."""
+        evicted = []
+        with self._lock:
+            existing = self._entries.get(session_id)
+            # A clean put (re-reading the row) must not clear a pending
+            # write that hasn't reached the database yet.
+            dirty = dirty or (existing is not None and existing.dirty)
+            self._entries[session_id] = CachedSession(copy.deepcopy(data), expiry, dirty)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_size:
+                old_id, old_entry = self._entries.popitem(last=False)
+                if old_entry.dirty:
+                    evicted.append((old_id, old_entry))
+        return evicted
+
+    def discard(self, session_id) -> None:
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def clear(self) -> None:
+        """Drop every entry, including writes not yet flushed."""
+        with self._lock:
+            self._entries.clear()
+
+    def mark_clean(self, session_id) -> None:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry.dirty = False
+
+    def flush_due(self) -> bool:
+        """``True`` when the flush interval has elapsed since the last
+        write-back pass."""
+        return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def take_dirty(self) -> list:
+        """Return every dirty entry as ``(sessionID, entry)`` pairs and
+        mark them clean. Resets the flush timer."""
+        with self._lock:
+            dirty = []
+            for session_id, entry in self._entries.items():
+                if entry.dirty:
+                    dirty.append((session_id, CachedSession(copy.deepcopy(entry.data), entry.expiry)))
+                    entry.dirty = False
+            self._last_flush = time.monotonic()
+        return dirty
+
+
+def _is_plain_json(value) -> bool:
+    """``True`` when *value* survives a plain JSON round trip unchanged:
+    exact ``str``/``int``/``float``/``bool``/``None``, lists, and dicts with
+    string keys. Tuples, bytes, datetimes, UUIDs and ``str`` subclasses such
+    as ``Markup`` need TaggedJSON's type tags."""
+    t = type(value)
+    if t is str or t is int or t is bool or value is None:
+        return True
+    if t is float:
+        return math.isfinite(value)
+    if t is list:
+        return all(_is_plain_json(v) for v in value)
+    if t is dict:
+        return all(type(k) is str and _is_plain_json(v) for k, v in value.items())
+    return False
+
+
+class SessionSerializer:
+    """Serializer for the session blob (``SessionStore.data`` and the
+    cookie backend's payload). The base class writes Flask's
+    ``TaggedJSONSerializer`` format, which is what every existing row
+    holds.
+
+    Other formats mark their output with a version ``prefix``.
+    :meth:`loads` dispatches on that prefix and treats anything unprefixed
+    as TaggedJSON, so any serializer reads every format and a live study
+    can change ``SESSION_SERIALIZER`` without invalidating sessions.
+    """
+
+    name = "tagged_json"
+    prefix = ""
+    _tagged = TaggedJSONSerializer()
+
+    def dumps(self, value) -> str:
+        return self._tagged.dumps(value)
+
+    def loads(self, value):
+        if isinstance(value, str):
+            for prefix, fmt in _PREFIXED_SERIALIZERS.items():
+                if value.startswith(prefix):
+                    return fmt.decode(value[len(prefix):])
+        return self._tagged.loads(value)
+
+    def decode(self, body):
+        """Decode a payload with this format's prefix already removed.
+        TaggedJSON has no prefix, so for this class the payload is the
+        whole value."""
+        return self._tagged.loads(body)
+
+
+class OrjsonSessionSerializer(SessionSerializer):
+    """Plain JSON with an ``oj1:`` prefix, encoded by ``orjson`` when it
+    is installed and by the stdlib ``json`` module otherwise (same output
+    format, so the two are interchangeable). Skips TaggedJSON's per-value
+    tagging walk. Sessions holding values that plain JSON can't represent
+    faithfully fall back to TaggedJSON."""
+
+    name = "orjson"
+    prefix = "oj1:"
+
+    def dumps(self, value) -> str:
+        if not _is_plain_json(value):
+            return super().dumps(value)
+        if orjson is not None:
+            return self.prefix + orjson.dumps(value).decode("utf-8")
+        return self.prefix + json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+    def decode(self, body):
+        if orjson is not None:
+            return orjson.loads(body)
+        return json.loads(body)
+
+
+SESSION_SERIALIZERS = {
+    cls.name: cls for cls in (SessionSerializer, OrjsonSessionSerializer)
+}
+"""Values accepted by ``SESSION_SERIALIZER``."""
+
+_PREFIXED_SERIALIZERS = {
+    cls.prefix: cls() for cls in SESSION_SERIALIZERS.values() if cls.prefix
+}
+
 
 class BOFSSessionInterface(SessionInterface):
-    serializer = TaggedJSONSerializer()
+    serializer = SessionSerializer()
+    """Reads every session format; see :meth:`get_serializer` for the one
+    used to write."""
+    null_session_class = StaticSession
 
     def __init__(self):
         self._cookie_name = None
+        self._cache = None
+        self._cache_configured = False
+        self._serializer = None
 
     def get_cookie_name(self, app) -> str:
         """
@@ -31,6 +278,54 @@ class BOFSSessionInterface(SessionInterface):
             self._cookie_name = 'bofs_' + hashlib.sha256(seed).hexdigest()[:10]
         return self._cookie_name
 
+    def get_cache(self, app):
+        """The in-process :class:`SessionCache`, or ``None`` when
+        ``SESSION_CACHE_SIZE`` is 0 (the default). Built on first use
+        because the interface is constructed before ``create_app`` fills in
+        config defaults."""
+        if not self._cache_configured:
+            size = int(app.config.get('SESSION_CACHE_SIZE', 0) or 0)
+            if size > 0:
+                interval = float(app.config.get('SESSION_CACHE_FLUSH_SECONDS', 0) or 0)
+                self._cache = SessionCache(size, interval)
+            self._cache_configured = True
+        return self._cache
+
+    @staticmethod
+    def uses_cookie_backend(app) -> bool:
+        """``True`` when ``SESSION_BACKEND = "cookie"``: the session payload
+        lives in a signed cookie and only the recovery keys are written to
+        ``SessionStore``."""
+        return str(app.config.get('SESSION_BACKEND', 'database')).lower() == 'cookie'
+
+    def get_signing_serializer(self, app):
+        """itsdangerous serializer for cookie-backed sessions, signing with
+        the project's ``SECRET_KEY`` and encoding with the same
+        :class:`SessionSerializer` the database backend uses. The URL-safe
+        variant zlib-compresses the payload whenever that makes it shorter."""
+        return URLSafeTimedSerializer(
+            app.secret_key,
+            salt='bofs-session',
+            serializer=self.get_serializer(app),
+            signer_kwargs={'key_derivation': 'hmac', 'digest_method': hashlib.sha1},
+        )
+
+    def is_static_request(self, app, request) -> bool:
+        """``True`` for requests to BOFS' or the project's static folders."""
+        path = request.path
+        if path.startswith('/BOFS_static/'):
+            return True
+        return bool(app.static_url_path) and path.startswith(app.static_url_path + '/')
+
+    def get_serializer(self, app) -> SessionSerializer:
+        """The :class:`SessionSerializer` selected by
+        ``SESSION_SERIALIZER``. Unknown names fall back to TaggedJSON;
+        ``create_app`` reports them in setup diagnostics."""
+        if self._serializer is None:
+            name = app.config.get('SESSION_SERIALIZER', SessionSerializer.name)
+            self._serializer = SESSION_SERIALIZERS.get(name, SessionSerializer)()
+        return self._serializer
+
     def create_db_object(self, app, sessionID):
         storedSession = app.db.SessionStore()
         storedSession.sessionID = sessionID
@@ -40,22 +335,92 @@ class BOFSSessionInterface(SessionInterface):
         app.db.session.commit()
         return storedSession
 
+    @staticmethod
+    def _mirror_columns(storedSession, data) -> bool:
+        """Copy the session keys that ``SessionStore`` mirrors as columns
+        (used by session recovery) onto the row. Returns ``True`` when a
+        column value changed."""
+        changed = False
+        if 'participantID' in data and storedSession.participantID != data['participantID']:
+            storedSession.participantID = data['participantID']
+            changed = True
+
+        # Either session key writes the same SessionStore column (the model
+        # uses a synonym). Prefer the canonical externalID key; fall back to
+        # the legacy mTurkID so blueprints that only set the old key still
+        # persist correctly.
+        external_id = data.get('externalID') or data.get('mTurkID')
+        if external_id is not None and storedSession.externalID != external_id:
+            storedSession.externalID = external_id
+            changed = True
+        return changed
+
+    def _write_back(self, app, entries) -> None:
+        """Persist ``(sessionID, CachedSession)`` pairs to ``SessionStore``
+        in a single commit."""
+        if not entries:
+            return
+        for session_id, entry in entries:
+            storedSession = app.db.session.get(app.db.SessionStore, session_id)
+            if storedSession is None:
+                storedSession = app.db.SessionStore()
+                storedSession.sessionID = session_id
+                app.db.session.add(storedSession)
+            storedSession.data = self.get_serializer(app).dumps(entry.data)
+            self._mirror_columns(storedSession, entry.data)
+            storedSession.expiry = entry.expiry
+        app.db.session.commit()
+
+    def flush(self, app) -> None:
+        """Write every dirty cached session back to ``SessionStore``. A
+        no-op when the cache is disabled. Called on the flush interval, on
+        shutdown, and before anything that reads other sessions' rows
+        (session recovery)."""
+        cache = self.get_cache(app)
+        if cache is not None:
+            self._write_back(app, cache.take_dirty())
+
     def open_session(self, app: "BOFSFlask", request: "Request"):
         cookie_name = self.get_cookie_name(app)
         sessionID = request.cookies.get(cookie_name)
 
-        # No sessionID cookie is set; create a new session.
+        # Static assets never read or write the session; skip the lookup
+        # (and any row creation) entirely.
+        if self.is_static_request(app, request):
+            return self.make_null_session(app)
+
+        if self.uses_cookie_backend(app):
+            return self._open_cookie(app, sessionID)
+
+        # No sessionID cookie is set; create a new session. The row is only
+        # written by save_session once something is stored in the session,
+        # so crawlers, health checks and probes leave no trace.
         if not sessionID:
-            sessionID = str(uuid4())
-            self.create_db_object(app, sessionID)
+            return BOFSSession(None, sessionID=str(uuid4()), new=True)
+
+        cache = self.get_cache(app)
+        if cache is not None:
+            cached = cache.get(sessionID)
+            if cached is not None:
+                if not cached.expired:
+                    return BOFSSession(cached.data, sessionID=sessionID)  # Cache hit; no DB access.
+                # Fall through so the expired row is deleted below.
+                cache.discard(sessionID)
+
+        data = self._load_stored(app, sessionID)
+        if data is None:
             return BOFSSession(None, sessionID=sessionID, new=True)
+        return BOFSSession(data, sessionID=sessionID)  # All is well.
 
+    def _load_stored(self, app, sessionID):
+        """Load the session dict for *sessionID* from ``SessionStore``.
+        Returns ``None`` when there is no usable row: missing, expired (the
+        row is deleted), or undeserialisable."""
         storedSession = app.db.session.get(app.db.SessionStore, sessionID)
 
         # The database has no session info! The cookie exists, but the session is empty.
         if not storedSession:
-            self.create_db_object(app, sessionID)
-            return BOFSSession(None, sessionID=sessionID, new=True)
+            return None
 
         # The session has been expired, so let's clear out the DB and give a blank session
         if storedSession.expired:
@@ -65,7 +430,7 @@ class BOFSSessionInterface(SessionInterface):
                 )
             app.db.session.delete(storedSession)
             app.db.session.commit()
-            return BOFSSession(None, sessionID=sessionID, new=True)
+            return None
 
         # Try to load the data from the DB into the session dict. A bad
         # signature / corrupt blob / missing data is recoverable — just hand
@@ -74,15 +439,52 @@ class BOFSSessionInterface(SessionInterface):
         # and would otherwise spam the log on benign traffic.
         try:
             val = storedSession.data
-            data = self.serializer.loads(val)
-            return BOFSSession(data, sessionID=sessionID)  # All is well.
+            data = self.get_serializer(app).loads(val)
         except (BadSignature, BadData, ValueError, TypeError) as e:
             if has_app_context():
                 current_app.logger.warning(
                     "Session deserialise failed for sessionID=%s (%s); issuing blank session.",
                     sessionID, type(e).__name__,
                 )
-            return BOFSSession(None, sessionID=sessionID, new=True)
+            return None
+
+        cache = self.get_cache(app)
+        if cache is not None:
+            self._write_back(app, cache.put(sessionID, data, storedSession.expiry))
+        return data
+
+    def _open_cookie(self, app, value):
+        """Cookie-backend half of :meth:`open_session`: verify and decode
+        the signed payload without touching the database."""
+        if not value:
+            return CookieSession(None, sessionID=str(uuid4()), new=True)
+
+        lifetime = app.permanent_session_lifetime or timedelta(days=21)
+        try:
+            payload, signed_at = self.get_signing_serializer(app).loads(
+                value, max_age=int(lifetime.total_seconds()), return_timestamp=True,
+            )
+            mirror_expiry = payload.get('mirrorExpiry')
+            return CookieSession(payload.get('data'), sessionID=payload.get('id') or str(uuid4()),
+                                 signed_at=signed_at.replace(tzinfo=None),
+                                 mirror_expiry=datetime.fromisoformat(mirror_expiry) if mirror_expiry else None)
+        except (BadSignature, BadData, ValueError, TypeError, AttributeError) as e:
+            signature_error = e
+
+        # A bare session ID left over from the database backend. Carry the
+        # stored session across so switching SESSION_BACKEND on a live
+        # study doesn't reset participants; ``new`` re-issues it as a
+        # signed cookie on this response.
+        data = self._load_stored(app, value) if len(value) <= 255 else None
+        if data is not None:
+            return CookieSession(data, sessionID=value, new=True)
+
+        if has_app_context():
+            current_app.logger.warning(
+                "Session cookie rejected (%s); issuing blank session.",
+                type(signature_error).__name__,
+            )
+        return CookieSession(None, sessionID=str(uuid4()), new=True)
 
     def regenerate(self, app: "BOFSFlask", session) -> None:
         """Rotate the session ID, copying the session row to a fresh ID and
@@ -96,7 +498,18 @@ class BOFSSessionInterface(SessionInterface):
         old_id = session.sessionID
         new_id = str(uuid4())
 
+        cache = self.get_cache(app)
+        if cache is not None and old_id:
+            cache.discard(old_id)
+
         old_row = app.db.session.get(app.db.SessionStore, old_id) if old_id else None
+        if old_row is None and self.uses_cookie_backend(app):
+            # Nothing mirrored yet, so there is no row to carry over.
+            session.sessionID = new_id
+            session.new = True
+            session.modified = True
+            return
+
         new_row = app.db.SessionStore()
         new_row.sessionID = new_id
         new_row.expiry = utcnow_naive() + timedelta(days=21)
@@ -111,73 +524,178 @@ class BOFSSessionInterface(SessionInterface):
         session.new = True
         session.modified = True
 
-    def save_session(self, app: "BOFSFlask", session, response):
-        domain = self.get_cookie_domain(app)
-        #path = self.get_cookie_path(app)
-        path = "/"  # We'll only ever want one cookie per project.
-        cookie_name = self.get_cookie_name(app)
+    @staticmethod
+    def _refreshed_expiry(app, current_expiry, lifetime):
+        """Sliding expiry: return ``now + lifetime`` when the stored expiry
+        is due for an extension, otherwise ``None``.
 
-        # Looks like the session was deleted... delete the cookie.
-        # We can't delete stuff from the DB as we don't know the ID.
-        if not session:
-            response.delete_cookie(cookie_name, domain=domain, path=path,
-                                   secure=self.get_cookie_secure(app),
-                                   samesite=self.get_cookie_samesite(app))
-            return
+        Extending on every save would mean a ``session_store`` UPDATE on
+        nearly every page, since ``currentUrl`` changes with each
+        navigation. ``SESSION_EXPIRY_REFRESH_FRACTION`` throttles this: the
+        expiry only moves once more than that fraction of the lifetime has
+        passed since the last extension. ``0`` extends on every save.
+        """
+        target = utcnow_naive() + lifetime
+        if current_expiry is None:
+            return target
+        fraction = float(app.config.get('SESSION_EXPIRY_REFRESH_FRACTION', 0) or 0)
+        if target - current_expiry > lifetime * fraction:
+            return target
+        return None
+
+    def _save_cached(self, app, cache, session, lifetime):
+        """Cache-backed half of :meth:`save_session`. Updates the cached
+        entry and writes it through immediately, or leaves it dirty for the
+        next flush when ``SESSION_CACHE_FLUSH_SECONDS`` is set. Returns the
+        expiry to put on the cookie."""
+        data = dict(session)
+        previous = cache.get(session.sessionID)
+        current_expiry = previous.expiry if previous is not None else None
+        expiry = self._refreshed_expiry(app, current_expiry, lifetime)
 
-        httpOnly = self.get_cookie_httponly(app)
-        secure = self.get_cookie_secure(app)
-        samesite = self.get_cookie_samesite(app)
+        if previous is not None and expiry is None and previous.data == data:
+            return current_expiry  # Nothing changed worth writing.
 
+        expiry = expiry or current_expiry
+        evicted = cache.put(session.sessionID, data, expiry, dirty=True)
+
+        if cache.flush_interval <= 0:
+            cache.mark_clean(session.sessionID)
+            self._write_back(app, evicted + [(session.sessionID, CachedSession(data, expiry))])
+        else:
+            self._write_back(app, evicted)
+            if cache.flush_due():
+                self.flush(app)
+        return expiry
+
+    def _save_stored(self, app, session, lifetime, defer_commit=False):
+        """Database-backed half of :meth:`save_session`. Stages the data
+        blob, the mirrored columns and any due expiry extension on the
+        row, then commits once, and only if something actually changed.
+        With ``defer_commit`` the change is left for the request's own
+        commit (see :meth:`BOFSFlask.process_response`) instead. Returns the
+        expiry to put on the cookie."""
         storedSession = app.db.session.get(app.db.SessionStore, session.sessionID)
+        changed = False
 
-        # This must be a new session.
+        # This must be a new session. Stage the row rather than using
+        # create_db_object so it shares the commit below.
         if not storedSession:
-            storedSession = self.create_db_object(app, session.sessionID)
+            storedSession = app.db.SessionStore()
+            storedSession.sessionID = session.sessionID
+            app.db.session.add(storedSession)
+            changed = True
 
         if session.modified:
-            storedSession.data = self.serializer.dumps(dict(session))
+            blob = self.get_serializer(app).dumps(dict(session))
+            if blob != storedSession.data:
+                storedSession.data = blob
+                changed = True
 
-        if 'participantID' in session:
-            storedSession.participantID = session['participantID']
+        if self._mirror_columns(storedSession, session):
+            changed = True
 
-        # Either session key writes the same SessionStore column (the model
-        # uses a synonym). Prefer the canonical externalID key; fall back to
-        # the legacy mTurkID so blueprints that only set the old key still
-        # persist correctly.
-        external_id = session.get('externalID') or session.get('mTurkID')
-        if external_id is not None:
-            storedSession.externalID = external_id
+        expiry = self._refreshed_expiry(app, storedSession.expiry, lifetime)
+        if expiry is not None:
+            storedSession.expiry = expiry
+            changed = True
 
-        # Sliding expiry: every save extends the row's expiry by the
-        # configured session lifetime. Without this, long-running studies
-        # silently time out at the 21-day initial window even when
-        # participants are actively interacting with the app.
-        lifetime = app.permanent_session_lifetime or timedelta(days=21)
-        if session.new or session.modified:
-            storedSession.expiry = utcnow_naive() + lifetime
-            app.db.session.commit()
+        if changed:
+            if defer_commit:
+                g.bofs_session_uncommitted = True
+            else:
+                app.db.session.commit()
 
         # ``expires=None`` would silently downgrade to a session cookie
         # (cleared on browser close), which surprises returning
         # participants. Fall back to a future expiry derived from the
         # configured lifetime if the row somehow lost its value.
-        cookie_expires = storedSession.expiry or (utcnow_naive() + lifetime)
-        if session.new or session.modified:
-            response.set_cookie(cookie_name, session.sessionID,
-                                expires=cookie_expires, httponly=httpOnly,
-                                domain=domain, path=path, secure=secure,
-                                samesite=samesite)
+        return storedSession.expiry or (utcnow_naive() + lifetime)
 
+    def _save_cookie(self, app, session, lifetime) -> str:
+        """Cookie-backend half of :meth:`save_session`. Mirrors
+        ``participantID``/``externalID`` into ``SessionStore`` so
+        :class:`SessionRecoveryService` can still find the participant, and
+        returns the signed cookie value. The row is only written when the
+        IDs changed since the cookie was issued, or when its expiry is due
+        for the same sliding extension a database-backed session gets, so
+        the maintenance sweep doesn't delete it while the cookie is live."""
+        ids = _recovery_ids(session)
+        mirror_expiry = getattr(session, 'mirror_expiry', None)
+        ids_changed = ids != getattr(session, 'mirrored_ids', None)
+        if ids_changed or (any(ids) and self._refreshed_expiry(app, mirror_expiry, lifetime) is not None):
+            storedSession = app.db.session.get(app.db.SessionStore, session.sessionID)
+            if storedSession is None:
+                storedSession = app.db.SessionStore()
+                storedSession.sessionID = session.sessionID
+                app.db.session.add(storedSession)
+            storedSession.data = self.get_serializer(app).dumps(
+                {k: session[k] for k in _RECOVERY_KEYS if k in session}
+            )
+            self._mirror_columns(storedSession, session)
+            storedSession.expiry = mirror_expiry = utcnow_naive() + lifetime
+            app.db.session.commit()
+            session.mirrored_ids = ids
+            session.mirror_expiry = mirror_expiry
 
-class BOFSSession(CallbackDict, SessionMixin):
-    def __init__(self, initial=None, sessionID=None, new=False):
-        def on_update(self):
-            self.modified = True
+        payload = {'id': session.sessionID, 'data': dict(session)}
+        if mirror_expiry is not None:
+            payload['mirrorExpiry'] = mirror_expiry.isoformat()
+        return self.get_signing_serializer(app).dumps(payload)
 
-        # When the dictionary is modified, self.modified will be set True
-        CallbackDict.__init__(self, initial, on_update)
+    def save_session(self, app: "BOFSFlask", session, response):
+        domain = self.get_cookie_domain(app)
+        #path = self.get_cookie_path(app)
+        path = "/"  # We'll only ever want one cookie per project.
+        cookie_name = self.get_cookie_name(app)
+        cache = self.get_cache(app)
 
-        self.modified = False  # Starting state
-        self.new = new
-        self.sessionID = sessionID
\ No newline at end of file
+        # Routes decorated with @suppress_session_save only read it.
+        if g.pop('bofs_skip_session_save', False):
+            return
+
+        # An empty session is never persisted. If it was emptied during
+        # this request (logout, restart), delete the cookie too. We can't
+        # delete stuff from the DB as we don't know the ID.
+        if not session:
+            if cache is not None and session.sessionID:
+                cache.discard(session.sessionID)
+            if not session.modified:
+                return
+            response.delete_cookie(cookie_name, domain=domain, path=path,
+                                   secure=self.get_cookie_secure(app),
+                                   samesite=self.get_cookie_samesite(app))
+            return
+
+        lifetime = app.permanent_session_lifetime or timedelta(days=21)
+        if self.uses_cookie_backend(app):
+            signed_at = getattr(session, 'signed_at', None)
+            refresh_due = signed_at is None or self._refreshed_expiry(
+                app, signed_at + lifetime, lifetime) is not None
+            if not (session.new or session.modified or refresh_due):
+                return
+            cookie_value = self._save_cookie(app, session, lifetime)
+            cookie_expires = utcnow_naive() + lifetime
+        else:
+            # An untouched session has nothing to persist and no cookie to
+            # refresh, so it costs no database access at all.
+            if not (session.new or session.modified):
+                if cache is not None and cache.flush_interval > 0 and cache.flush_due():
+                    self.flush(app)
+                return
+
+            if cache is not None:
+                cookie_expires = self._save_cached(app, cache, session, lifetime)
+            else:
+                # Inside a request (and not an error response) the row joins
+                # the commit BOFSFlask.process_response issues afterwards.
+                defer_commit = g.get('bofs_defer_session_commit', False) and response.status_code < 500
+                cookie_expires = self._save_stored(app, session, lifetime, defer_commit)
+            cookie_value = session.sessionID
+
+        response.set_cookie(cookie_name, cookie_value,
+                            expires=cookie_expires,
+                            httponly=self.get_cookie_httponly(app),
+                            domain=domain, path=path,
+                            secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
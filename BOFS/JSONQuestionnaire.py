@@ -8,15 +8,45 @@ from sqlalchemy.exc import NoSuchTableError, OperationalError, SQLAlchemyError
 from .globals import db
 from .expressions import (
     ExpressionError,
+    SubstitutionIndex,
+    build_field_index,
+    compile_ast,
     default_functions,
-    evaluate as expr_evaluate,
+    optimize,
     parse_with_field_ids,
     referenced_fields,
 )
+from .expressions.vectorized import Unvectorizable, evaluate_columns, numpy, worth_vectorizing
 from .sanitizer import sanitize_questionnaire_json
 from .validation import EXPANDED_TYPES
 
 
+def _calc_column(rows, field_id):
+    """Build the ``(values, missing)`` column of *field_id* over *rows* with
+    the same coercion the per-row calc env applies (``None``/``""`` are
+    missing, everything else goes through ``float``). ``None`` when the
+    column can't be vectorized: numpy is unavailable, the attribute is
+    missing, or a value isn't numeric."""
+    if numpy is None:
+        return None
+    values = numpy.empty(len(rows))
+    missing = numpy.zeros(len(rows), dtype=bool)
+    for i, row in enumerate(rows):
+        try:
+            raw = getattr(row, field_id)
+        except AttributeError:
+            return None
+        if raw is None or raw == "":
+            values[i] = numpy.nan
+            missing[i] = True
+            continue
+        try:
+            values[i] = float(raw)
+        except (TypeError, ValueError):
+            return None
+    return values, missing
+
+
 def _normalize_type_name(sa_type) -> str:
     """Normalize a SQLAlchemy reflected type to a canonical name for comparison."""
     type_name = type(sa_type).__name__.upper()
@@ -343,8 +373,19 @@ class JSONQuestionnaire(object):
         # alone — see BOFS/sanitizer.py.
         sanitize_questionnaire_json(self.json_data)
 
+        # Record where the ``{{ }}`` placeholders are (after sanitizing, so
+        # the indexed strings are the ones rendered); rendering then only
+        # copies the containers on those paths.
+        self.substitution_index = SubstitutionIndex(self.json_data)
+
+        # ``(question index, tag) -> (templates, html)`` for questions whose
+        # rendering doesn't depend on the participant; see
+        # ParticipantQuestionnaireService.render_unloaded_questionnaire.
+        self.fragment_cache: dict = {}
+
         self.__fields: list["JSONQuestionnaireColumn"] = []
         self.__calc_fields: list[str] = []
+        self.__calc_asts: dict[str, dict] = {}
         self.db_class : db.Model | None = None
 
     def get_table_name(self):
@@ -378,6 +419,33 @@ class JSONQuestionnaire(object):
     def get_calculated_fields(self) -> list[str]:
         return self.__calc_fields
 
+    def calculate_fields(self, rows: list) -> dict[str, list]:
+        """Evaluate every calculated field over *rows* (instances of
+        ``db_class``) and return ``{calc_name: [value per row]}``.
+
+        Used by exports. Calculations that call an aggregate run once over
+        whole columns (see :mod:`BOFS.expressions.vectorized`); the rest,
+        and any whose vectorized result could differ, call the per-row
+        method, so the values are always exactly what ``row.<calc_name>()``
+        returns.
+        """
+        results = {}
+        columns = {}
+        for calc_name in self.__calc_fields:
+            ast_node = self.__calc_asts.get(calc_name)
+            try:
+                if ast_node is None or not rows or not worth_vectorizing(ast_node):
+                    raise Unvectorizable(calc_name)
+                for fid in referenced_fields(ast_node):
+                    if fid not in columns:
+                        columns[fid] = _calc_column(rows, fid)
+                    if columns[fid] is None:
+                        raise Unvectorizable(fid)
+                results[calc_name] = evaluate_columns(ast_node, columns, len(rows))
+            except Unvectorizable:
+                results[calc_name] = [getattr(row, calc_name)() for row in rows]
+        return results
+
     def fetch_fields(self) -> list["JSONQuestionnaireColumn"]:
         if self.__fields:
             return self.__fields
@@ -462,6 +530,12 @@ class JSONQuestionnaire(object):
         the engine's JSON AST and attach them as ``_show_if_ast`` on the
         question dict so the renderer can emit them without re-parsing.
 
+        Also records the fields each predicate reads as ``_show_if_fields``
+        and, on the questionnaire, ``_show_if_dependencies``: a map from
+        field ID to the indices of the questions whose predicate reads it,
+        so the browser only re-evaluates questions downstream of the input
+        that changed.
+
         Raises if a predicate is unparseable — show_if errors should fail
         loudly at app startup, not silently at request time.
         """
@@ -472,8 +546,9 @@ class JSONQuestionnaire(object):
             return
 
         field_ids = [f.id for f in self.__fields]
+        dependencies: dict[str, list[int]] = {}
 
-        for question in self.json_data['questions']:
+        for index, question in enumerate(self.json_data['questions']):
             expr = question.get('show_if')
             if expr is None:
                 continue
@@ -492,6 +567,12 @@ class JSONQuestionnaire(object):
                     f"Expression: `{expr}`. {e}"
                 )
             question['_show_if_ast'] = ast_node
+            question['_show_if_fields'] = sorted(referenced_fields(ast_node))
+            for field_id in question['_show_if_fields']:
+                dependencies.setdefault(field_id, []).append(index)
+
+        if dependencies:
+            self.json_data['_show_if_dependencies'] = dependencies
 
     def create_db_class(self):
         #print "createDBClass() for " + self.fileName
@@ -543,7 +624,10 @@ class JSONQuestionnaire(object):
             label_stored_row_ids = self._collect_label_stored_row_ids()
 
             def make_calc_method(calc_name, ast_node):
+                ast_node = optimize(ast_node, funcs)
+                self.__calc_asts[calc_name] = ast_node
                 referenced = referenced_fields(ast_node)
+                compiled = compile_ast(ast_node, funcs)
 
                 def _calc(self):
                     # Build the evaluation env. Missing values (None or empty
@@ -567,7 +651,7 @@ class JSONQuestionnaire(object):
                             except (TypeError, ValueError):
                                 env[fid] = raw
                     try:
-                        return expr_evaluate(ast_node, env, functions=funcs)
+                        return compiled(env)
                     except Exception as e:
                         ref_state = ", ".join(
                             f"{k}={env.get(k)!r}" for k in referenced
@@ -687,3 +771,64 @@ class JSONQuestionnaire(object):
                  ))
 
         return q.all()
+
+
+class QuestionnaireRegistry(dict):
+    """``app.questionnaires``: the loaded questionnaires by filename, plus
+    an index of which questionnaires define each field ID.
+
+    Bare field names in expressions resolve through :meth:`field_index`
+    instead of listing every questionnaire's fields on each evaluation.
+    The index is rebuilt on first use after the registry changes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._field_index = None
+
+    def field_index(self) -> dict[str, list[str]]:
+        """``{field_id: [filename, ...]}`` in registry order; see
+        :func:`BOFS.expressions.participant_env.build_field_index`."""
+        if self._field_index is None:
+            self._field_index = build_field_index(self)
+        return self._field_index
+
+    def ambiguous_fields(self) -> dict[str, list[str]]:
+        """The field IDs defined by more than one questionnaire. A bare
+        reference to one of them reads the first of those questionnaires
+        the participant has submitted."""
+        return {f: owners for f, owners in self.field_index().items() if len(owners) > 1}
+
+    def _changed(self):
+        self._field_index = None
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._changed()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._changed()
+        return item
+
+    def setdefault(self, key, default=None):
+        value = super().setdefault(key, default)
+        self._changed()
+        return value
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
@@ -1,14 +1,21 @@
+import itertools
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
 from typing import Union
 from flask import current_app, g, has_request_context, request, session
+from sqlalchemy import inspect as sa_inspect
 from BOFS import util
 from BOFS.expressions import (
     ExpressionError,
+    ParticipantEnvBatch,
     build_participant_env,
-    default_functions,
-    evaluate,
+    compile_ast,
+    optimize,
     parse_page_predicate,
     referenced_fields,
 )
+from BOFS.expressions.participant_env import RESERVED_PARTICIPANT_BARE_NAMES
 from urllib.parse import urlsplit
 
 
@@ -24,6 +31,18 @@ _RESOLVE_FROM_SESSION = object()
 _CACHE_ATTR = "_bofs_flat_page_list_cache"
 
 
+# WSGI environ key marking that PageList._sync_page_list already ran for
+# this request.
+_SYNCED_ENVIRON_KEY = "bofs.page_list_synced"
+
+
+# Participant data loader shared by every show_if evaluated while one flat
+# page list is resolved, so each referenced questionnaire is read once per
+# build rather than once per predicate. Set by
+# PageList._resolve_flat_page_list.
+_ENV_BATCH = ContextVar("bofs_show_if_env_batch", default=None)
+
+
 def _flat_page_list_cache():
     """Per-request cache dict on ``flask.g``, created on first use. ``None``
     outside a request context so those callers always recompute."""
@@ -37,14 +56,171 @@ def _flat_page_list_cache():
 
 
 def invalidate_flat_page_list_cache():
-    """Drop the cache. Wired to ``after_commit`` because a committed write
-    can change ``show_if`` visibility (e.g. ``route_end`` stamps ``finished``
-    then resolves the filtered page list). No-op outside a request."""
+    """Drop the cache. Called after a commit that changed ``show_if`` inputs
+    (e.g. ``route_end`` stamps ``end_reason`` then resolves the filtered
+    page list). No-op outside a request."""
     if not has_request_context():
         return
     g.pop(_CACHE_ATTR, None)
 
 
+def _current_visibility_cache():
+    try:
+        page_list = current_app.page_list
+    except (RuntimeError, AttributeError):
+        return None
+    return page_list._visibility_cache
+
+
+def bump_participant_data_version(participant_id):
+    """Mark *participant_id*'s show_if inputs as changed so page sequences
+    cached across requests for them are rebuilt on next use. ORM commits
+    do this automatically (see :func:`record_show_if_changes`); call it
+    after writing show_if inputs through SQLAlchemy Core or raw SQL. No-op
+    outside an app context."""
+    if participant_id is None:
+        return
+    cache = _current_visibility_cache()
+    if cache is not None:
+        cache.bump(participant_id)
+
+
+# Session.info key under which after_flush collects the participant IDs
+# whose show_if inputs the open transaction has written. ``None`` in the
+# set stands for a row that can't be attributed to one participant.
+_SHOW_IF_CHANGES_KEY = "bofs_show_if_changes"
+
+
+def record_show_if_changes(db_session, tracked_models, participant_model=None):
+    """``after_flush`` hook: note which participants this flush changed
+    ``show_if`` inputs for.
+
+    *tracked_models* are the questionnaire and JSONTable model classes; any
+    inserted, modified or deleted row of theirs counts. A ``Participant``
+    row counts when inserted or deleted, or when one of the
+    ``RESERVED_PARTICIPANT_BARE_NAMES`` columns changed. Everything else —
+    ``Progress``, ``SessionStore``, the interaction log — is ignored.
+    """
+    changed = None
+    for obj in itertools.chain(db_session.new, db_session.dirty, db_session.deleted):
+        model = type(obj)
+        if model is participant_model:
+            if obj in db_session.dirty and not _reserved_columns_changed(obj):
+                continue
+        elif model not in tracked_models:
+            continue
+        elif obj in db_session.dirty and not db_session.is_modified(obj):
+            continue
+        if changed is None:
+            changed = db_session.info.setdefault(_SHOW_IF_CHANGES_KEY, set())
+        changed.add(getattr(obj, "participantID", None))
+
+
+def _reserved_columns_changed(participant):
+    attrs = sa_inspect(participant).attrs
+    return any(
+        attrs[name].history.has_changes()
+        for name in RESERVED_PARTICIPANT_BARE_NAMES
+        if name in attrs
+    )
+
+
+def apply_show_if_changes(db_session):
+    """``after_commit`` hook: drop the request cache and bump the data
+    version of every participant :func:`record_show_if_changes` noted."""
+    changed = db_session.info.pop(_SHOW_IF_CHANGES_KEY, None)
+    if not changed:
+        return
+    invalidate_flat_page_list_cache()
+    cache = _current_visibility_cache()
+    if cache is None:
+        return
+    if None in changed:
+        cache.clear()
+    else:
+        for participant_id in changed:
+            cache.bump(participant_id)
+
+
+def discard_show_if_changes(db_session):
+    """``after_rollback`` hook: the recorded writes never landed."""
+    db_session.info.pop(_SHOW_IF_CHANGES_KEY, None)
+
+
+def _snapshot(value):
+    """Comparable copy of a PAGE_LIST (or part of one) for noticing edits
+    made in place. Keys starting with ``_`` are derived by BOFS and
+    ignored."""
+    if isinstance(value, dict):
+        return tuple((k, _snapshot(v)) for k, v in value.items()
+                     if not (isinstance(k, str) and k.startswith('_')))
+    if isinstance(value, (list, tuple)):
+        return [_snapshot(v) for v in value]
+    return value
+
+
+class VisibilityCache:
+    """Bounded, thread-safe LRU of :class:`NavigationIndex` objects keyed by
+    ``(participant_id, condition, hide_unresolved)``, shared across requests
+    when ``PAGE_VISIBILITY_CACHE_SIZE`` is non-zero.
+
+    Each entry records the participant's data version at the time it was
+    built; :func:`bump_participant_data_version` moves the version on, so
+    stale entries miss without having to be found and removed. Like the
+    session cache it is per-process, so a multi-process deployment must
+    leave it off.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._versions: dict = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def version(self, participant_id) -> tuple:
+        """Read before resolving a sequence and pass to :meth:`put`, so a
+        bump or clear that lands mid-build leaves the stored entry already
+        stale."""
+        with self._lock:
+            return self._current_version(participant_id)
+
+    def _current_version(self, participant_id) -> tuple:
+        return self._generation, self._versions.get(participant_id, 0)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            index, version = entry
+            if version != self._current_version(key[0]):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return index
+
+    def put(self, key, index, version) -> None:
+        with self._lock:
+            self._entries[key] = (index, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def bump(self, participant_id) -> None:
+        with self._lock:
+            self._versions[participant_id] = self._versions.get(participant_id, 0) + 1
+
+    def clear(self) -> None:
+        """Invalidate every participant's entries."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
 class Visibility:
     """Tri-state result of evaluating a page entry's or routing arm's
     ``show_if``. ``UNRESOLVED`` means the predicate referenced data that
@@ -60,15 +236,77 @@ class Visibility:
     UNRESOLVED = "unresolved"
 
 
+class NavigationIndex(object):
+    """One resolved flat page list plus the lookups navigation needs.
+
+    ``annotated`` is the :meth:`PageList.annotate_occurrences` view of
+    ``entries``; :meth:`index_of` maps a ``(path, occurrence)`` cursor, or
+    a bare path, to its position in O(1) instead of scanning the list.
+    """
+
+    __slots__ = ("entries", "annotated", "_by_cursor", "_first_by_path")
+
+    def __init__(self, entries):
+        self.entries = tuple(entries)
+        self.annotated = PageList.annotate_occurrences(self.entries)
+        self._by_cursor = {}
+        self._first_by_path = {}
+        for i, (entry, occ) in enumerate(self.annotated):
+            path = entry.get('path', '')
+            self._by_cursor[(path, occ)] = i
+            self._first_by_path.setdefault(path, i)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def index_of(self, path, occurrence=None):
+        """Position of *path* at *occurrence*, or of its first occurrence
+        when *occurrence* is ``None``. ``None`` if it isn't in the list."""
+        if occurrence is None:
+            return self._first_by_path.get(path)
+        return self._by_cursor.get((path, occurrence))
+
+
 class PageList(object):
-    page_list = []
     procedure = []
 
     def __init__(self, page_list):
         self.page_list = page_list
-        self._compile_show_if(self.page_list)
         #self.procedure = self.parse_list_into_procedure()
 
+    @property
+    def page_list(self):
+        return self._page_list
+
+    @page_list.setter
+    def page_list(self, page_list):
+        # Assigning a new PAGE_LIST recompiles its predicates and drops the
+        # navigation indexes derived from the old one.
+        self._compile_show_if(page_list)
+        self._page_list = page_list
+        self._page_list_snapshot = _snapshot(page_list)
+        self._static_navigation = {}
+        self._visibility_cache = None
+        self._visibility_cache_configured = False
+
+    def _sync_page_list(self):
+        """Pick up edits made to :attr:`page_list` in place (``append``,
+        ``extend``, changing an entry) since the navigation indexes were
+        built: recompile ``show_if`` and drop every sequence derived from
+        the old contents. Compares the whole list, so within a request it
+        only runs on the first navigation lookup."""
+        if has_request_context():
+            if request.environ.get(_SYNCED_ENVIRON_KEY) is self:
+                return
+            request.environ[_SYNCED_ENVIRON_KEY] = self
+        snapshot = _snapshot(self._page_list)
+        if snapshot == self._page_list_snapshot:
+            return
+        self._compile_show_if(self._page_list)
+        self._page_list_snapshot = snapshot
+        self._static_navigation = {}
+        self.clear_visibility_cache()
+
     @staticmethod
     def _compile_show_if(page_list):
         """Parse any ``show_if`` predicate strings on page entries and any
@@ -112,6 +350,11 @@ class PageList(object):
             )
         entry["_show_if_ast"] = ast_node
         entry["_show_if_refs"] = refs
+        # Fields and the compiled predicate come from the optimized AST, so
+        # a dead branch neither runs nor pulls its data into the env.
+        optimized = optimize(ast_node)
+        entry["_show_if_fields"] = referenced_fields(optimized)
+        entry["_show_if_fn"] = compile_ast(optimized)
 
     @staticmethod
     def _validate_outgoing_url(entry):
@@ -166,6 +409,9 @@ class PageList(object):
             )
         arm["_show_if_ast"] = ast_node
         arm["_show_if_refs"] = refs
+        optimized = optimize(ast_node)
+        arm["_show_if_fields"] = referenced_fields(optimized)
+        arm["_show_if_fn"] = compile_ast(optimized)
 
     @staticmethod
     def _page_visibility(entry, participant_id):
@@ -192,16 +438,26 @@ class PageList(object):
             app = current_app._get_current_object()
         except RuntimeError:
             return Visibility.UNRESOLVED
-        env = build_participant_env(
-            participant_id,
-            referenced_fields(ast),
-            refs,
-            getattr(app, "questionnaires", {}),
-            app.db,
-            tables=getattr(app, "tables", {}),
-        )
+        fields = entry.get("_show_if_fields")
+        if fields is None:
+            fields = referenced_fields(ast)
+        batch = _ENV_BATCH.get()
+        if batch is not None and batch.participant_id == participant_id:
+            env = batch.env_for(fields, refs)
+        else:
+            env = build_participant_env(
+                participant_id,
+                fields,
+                refs,
+                getattr(app, "questionnaires", {}),
+                app.db,
+                tables=getattr(app, "tables", {}),
+            )
+        predicate = entry.get("_show_if_fn")
+        if predicate is None:
+            predicate = compile_ast(ast)
         try:
-            value = evaluate(ast, env, functions=default_functions())
+            value = predicate(env)
         except ExpressionError:
             return Visibility.UNRESOLVED
         return Visibility.VISIBLE if bool(value) else Visibility.HIDDEN
@@ -380,6 +636,10 @@ class PageList(object):
                     assigned.append((name, new_tag))
                     seen[(name, new_tag)] = entry
 
+        if assigned:
+            # Paths were rewritten in place; rebuild the indexes on demand.
+            self._static_navigation = {}
+
         return assigned
 
     def flat_page_list(self, condition=None,
@@ -412,19 +672,160 @@ class PageList(object):
             mode is intended for the breadcrumb, where displaying pages
             we don't yet know the participant will visit is misleading.
         """
+        return list(self._navigation(condition, participant_id, hide_unresolved).entries)
+
+    def navigation(self, condition=None,
+                   participant_id=_RESOLVE_FROM_SESSION,
+                   hide_unresolved=False) -> NavigationIndex:
+        """The :class:`NavigationIndex` behind :meth:`flat_page_list`, taking
+        the same arguments.
+
+        When no ``show_if`` can affect the page sequence for *condition*,
+        the index is built once and reused for every participant in that
+        condition. Otherwise the list is resolved for the participant and
+        cached for the rest of the request. If :meth:`flat_page_list` is
+        overridden (by a subclass or on the instance), the index is built
+        from what it returns on every call instead.
+        """
+        if self._flat_page_list_overridden():
+            return NavigationIndex(self.flat_page_list(condition, participant_id, hide_unresolved))
+        return self._navigation(condition, participant_id, hide_unresolved)
+
+    def _flat_page_list_overridden(self):
+        return 'flat_page_list' in self.__dict__ or \
+            type(self).flat_page_list is not PageList.flat_page_list
+
+    def _navigation(self, condition, participant_id, hide_unresolved):
         if condition is None:
             condition = util.fetch_current_condition()
 
+        self._sync_page_list()
+        static = self._static_navigation_for(condition)
+        if static is not None:
+            return static
+
         participant_id = self._resolve_participant_id(participant_id)
 
         # Serve repeated identical builds within a request from cache;
         # a DB commit invalidates it (invalidate_flat_page_list_cache).
-        # Hand back a copy so a caller mutating the list can't poison it.
         cache = _flat_page_list_cache()
         cache_key = (condition, participant_id, hide_unresolved)
         if cache is not None and cache_key in cache:
-            return list(cache[cache_key])
+            return cache[cache_key]
+
+        # Then across requests, while the participant's data is unchanged.
+        shared = self._get_visibility_cache() if participant_id is not None else None
+        shared_key = (participant_id, condition, hide_unresolved)
+        index = shared.get(shared_key) if shared is not None else None
+        if index is None:
+            version = shared.version(participant_id) if shared is not None else None
+            index = NavigationIndex(
+                self._resolve_flat_page_list(condition, participant_id, hide_unresolved)
+            )
+            if shared is not None:
+                shared.put(shared_key, index, version)
+
+        if cache is not None:
+            cache[cache_key] = index
+        return index
+
+    def _get_visibility_cache(self):
+        """The cross-request :class:`VisibilityCache`, or ``None`` when
+        ``PAGE_VISIBILITY_CACHE_SIZE`` is 0 or there is no app context.
+        Built on first use because the page list is constructed before
+        ``create_app`` fills in config defaults."""
+        if not self._visibility_cache_configured:
+            try:
+                size = int(current_app.config.get('PAGE_VISIBILITY_CACHE_SIZE', 0) or 0)
+            except RuntimeError:
+                return None
+            if size > 0:
+                self._visibility_cache = VisibilityCache(size)
+            self._visibility_cache_configured = True
+        return self._visibility_cache
+
+    def clear_visibility_cache(self) -> None:
+        """Drop every page sequence cached across requests. Needed after
+        rows are removed without the ORM (see :func:`bump_participant_data_version`)
+        on a scale where bumping each participant isn't practical, such as
+        clearing the whole database."""
+        invalidate_flat_page_list_cache()
+        if self._visibility_cache is not None:
+            self._visibility_cache.clear()
+
+    def _static_navigation_for(self, condition):
+        """Precompiled index for *condition*, or ``None`` when its sequence
+        depends on a ``show_if`` and has to be resolved per participant."""
+        try:
+            return self._static_navigation[condition]
+        except KeyError:
+            pass
+        index = None
+        if not self._sequence_has_show_if(condition):
+            index = NavigationIndex(
+                self._resolve_flat_page_list(condition, None, False)
+            )
+        self._static_navigation[condition] = index
+        return index
+
+    def precompile_navigation(self, condition_count=0):
+        """Build the static navigation index for every condition up front,
+        so the first participant in each condition doesn't pay for it."""
+        conditions = range(1, condition_count + 1) if condition_count > 0 else (0,)
+        self._sync_page_list()
+        for condition in conditions:
+            self._static_navigation_for(condition)
+
+    def _sequence_has_show_if(self, condition):
+        """True if any ``show_if`` can change the flat page list for
+        *condition*: a top-level page, a routing arm that *condition*
+        doesn't rule out (``hide_unresolved`` looks at all of them), or a
+        page inside the arm that would be selected."""
+        for entry in self.page_list:
+            if 'conditional_routing' not in entry:
+                if '_show_if_ast' in entry:
+                    return True
+                continue
+            selected = False
+            for arm in entry['conditional_routing']:
+                arm_condition = arm.get('condition')
+                if arm_condition is not None and condition != 0 and arm_condition != condition:
+                    continue
+                if '_show_if_ast' in arm:
+                    return True
+                if not selected:
+                    selected = True
+                    if any('_show_if_ast' in e for e in arm['page_list']):
+                        return True
+        return False
+
+    def _resolve_flat_page_list(self, condition, participant_id, hide_unresolved):
+        """Walk PAGE_LIST for *condition*, evaluating ``show_if`` predicates
+        against *participant_id*. Uncached; see :meth:`navigation`."""
+        token = _ENV_BATCH.set(self._env_batch(participant_id))
+        try:
+            return self._walk_page_list(condition, participant_id, hide_unresolved)
+        finally:
+            _ENV_BATCH.reset(token)
+
+    @staticmethod
+    def _env_batch(participant_id):
+        """A :class:`ParticipantEnvBatch` for one flat-list build, or
+        ``None`` when predicates can't be evaluated anyway."""
+        if participant_id is None:
+            return None
+        try:
+            app = current_app._get_current_object()
+        except RuntimeError:
+            return None
+        return ParticipantEnvBatch(
+            participant_id,
+            getattr(app, "questionnaires", {}),
+            app.db,
+            tables=getattr(app, "tables", {}),
+        )
 
+    def _walk_page_list(self, condition, participant_id, hide_unresolved):
         flat_page_list = list()
 
         for entry in self.page_list:
@@ -464,9 +865,6 @@ class PageList(object):
                     if self._page_visible(entry, participant_id):
                         flat_page_list.append(entry)
 
-        if cache is not None:
-            cache[cache_key] = list(flat_page_list)
-
         return flat_page_list
 
     def has_branching(self) -> bool:
@@ -687,10 +1085,7 @@ class PageList(object):
         """
         if path.startswith("/"):
             path = path[1:]
-        for i, page in enumerate(self.flat_page_list()):
-            if page['path'] == path:
-                return i
-        return None
+        return self.navigation().index_of(path)
 
     def next_path(self, current_path=None):
         """
@@ -705,8 +1100,9 @@ class PageList(object):
             current_path = parsed.path
         if current_path.startswith("/"):
             current_path = current_path[1:]
-        current_index = self.get_index(current_path)
-        flat_page_list = self.flat_page_list()
+        navigation = self.navigation()
+        flat_page_list = navigation.entries
+        current_index = navigation.index_of(current_path)
 
         # get_index returns None for a path that isn't in the page list.
         # Without this guard the subtraction below blows up with TypeError;
@@ -731,8 +1127,9 @@ class PageList(object):
         if current_path.startswith("/"):
             current_path = current_path[1:]
 
-        current_index = self.get_index(current_path)
-        flat_page_list = self.flat_page_list()
+        navigation = self.navigation()
+        flat_page_list = navigation.entries
+        current_index = navigation.index_of(current_path)
 
         # Same None-guard as next_path — a path outside the configured list
         # would otherwise hit ``flat_page_list[None - 1]`` and TypeError.
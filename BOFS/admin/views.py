@@ -104,6 +104,14 @@ def _verify_admin_csrf():
         abort(403, description="CSRF token missing or invalid.")
 
 
+@admin.before_request
+def _flush_heartbeats():
+    """Write buffered ``/user_active`` heartbeats before any admin page
+    reads ``lastActiveOn``, so in-progress and abandoned counts match
+    what the participants are actually doing."""
+    current_app.flush_heartbeats()
+
+
 @admin.context_processor
 def inject_template_vars():
     """
@@ -1228,6 +1236,15 @@ def route_database_delete():
                     conn.execute(tbl.delete())
         db.session.commit()
 
+        # The Core deletes bypass the ORM hooks that keep in-process caches
+        # in step, and SQLite hands the freed participant IDs out again.
+        current_app.page_list.clear_visibility_cache()
+        session_cache = current_app.session_interface.get_cache(current_app)
+        if session_cache is not None:
+            session_cache.clear()
+        if current_app.heartbeats is not None:
+            current_app.heartbeats.take()
+
         current_app.logger.info(
             "database_delete: cleared rows from %d bind(s); backup at %s",
             len(list(db.metadatas)), backup_path,
@@ -1,4 +1,5 @@
 import os
+import re
 import sys
 import time
 from . import startup
@@ -174,6 +175,154 @@ def create_app(path, config_name, debug=False, reloader_off=False):
         # that the session can't be hijacked so easily.
         app.config['SESSION_BIND_TO_IP_PARTICIPANT'] = True
 
+    if 'SESSION_BACKEND' not in app.config:
+        app.config['SESSION_BACKEND'] = "database"
+
+    if str(app.config['SESSION_BACKEND']).lower() not in ("database", "cookie"):
+        app.setup_diagnostics.add(
+            "warning", "config",
+            f"SESSION_BACKEND={app.config['SESSION_BACKEND']!r} is not a "
+            f"recognised session backend. Falling back to \"database\".",
+            suggestion='Use "database" (the default) or "cookie".',
+            source="SESSION_BACKEND",
+        )
+        app.config['SESSION_BACKEND'] = "database"
+
+    if 'SESSION_SERIALIZER' not in app.config:
+        app.config['SESSION_SERIALIZER'] = "tagged_json"
+
+    from .BOFSSession import SESSION_SERIALIZERS, orjson
+    if app.config['SESSION_SERIALIZER'] not in SESSION_SERIALIZERS:
+        app.setup_diagnostics.add(
+            "warning", "config",
+            f"SESSION_SERIALIZER={app.config['SESSION_SERIALIZER']!r} is not a "
+            f"recognised session serializer. Falling back to \"tagged_json\".",
+            suggestion="Use one of: " + ", ".join(f'"{n}"' for n in SESSION_SERIALIZERS) + ".",
+            source="SESSION_SERIALIZER",
+        )
+        app.config['SESSION_SERIALIZER'] = "tagged_json"
+    elif app.config['SESSION_SERIALIZER'] == "orjson" and orjson is None:
+        app.setup_diagnostics.add(
+            "info", "config",
+            "SESSION_SERIALIZER is \"orjson\" but the orjson package is not "
+            "installed; sessions are written in the same format using the "
+            "slower standard-library json module.",
+            suggestion="pip install orjson",
+            source="SESSION_SERIALIZER",
+        )
+
+    if 'SESSION_CACHE_SIZE' not in app.config:
+        # Number of deserialised sessions kept in memory in front of the
+        # session_store table. 0 disables the cache.
+        app.config['SESSION_CACHE_SIZE'] = 0
+
+    if 'SESSION_CACHE_FLUSH_SECONDS' not in app.config:
+        # 0 writes every modified session straight through to the database;
+        # a positive value batches write-back on that interval.
+        app.config['SESSION_CACHE_FLUSH_SECONDS'] = 0
+
+    if 'SESSION_EXPIRY_REFRESH_FRACTION' not in app.config:
+        # Sliding session expiry is only pushed forward once this fraction
+        # of the session lifetime has passed since the last extension, so
+        # routine navigation doesn't rewrite session_store on every page.
+        app.config['SESSION_EXPIRY_REFRESH_FRACTION'] = 0.01
+
+    if 'PAGE_VISIBILITY_CACHE_SIZE' not in app.config:
+        # Number of resolved show_if page sequences kept in memory across
+        # requests, keyed by participant and condition. 0 disables it.
+        app.config['PAGE_VISIBILITY_CACHE_SIZE'] = 0
+
+    if 'QUESTION_FRAGMENT_CACHE' not in app.config:
+        # Reuse the rendered HTML of questions that prior values and {{ }}
+        # substitution leave untouched. Off by default because a project's
+        # own question templates may render participant-specific markup.
+        app.config['QUESTION_FRAGMENT_CACHE'] = False
+
+    if 'STREAM_QUESTIONNAIRES' not in app.config:
+        # Send questionnaire pages as they render instead of all at once.
+        # Off by default: streamed pages can't redirect or show an error
+        # page once the first bytes have gone out.
+        app.config['STREAM_QUESTIONNAIRES'] = False
+
+    if 'INTERACTION_LOG_QUEUE_SIZE' not in app.config:
+        # Submissions whose interaction events may wait for the background
+        # writer. 0 writes them during the submit request instead.
+        app.config['INTERACTION_LOG_QUEUE_SIZE'] = 0
+
+    if 'INTERACTION_LOG_BATCH_SIZE' not in app.config:
+        # Events the background writer inserts per transaction.
+        app.config['INTERACTION_LOG_BATCH_SIZE'] = 5000
+
+    if 'SUBMISSION_LOG_MAX_BYTES' not in app.config:
+        # With ENABLE_LOGGING, logs/submissions.jsonl rotates at this size
+        # unless SUBMISSION_LOG_WHEN asks for time-based rotation.
+        app.config['SUBMISSION_LOG_MAX_BYTES'] = 10 * 1024 * 1024
+
+    if 'SUBMISSION_LOG_WHEN' not in app.config:
+        # A TimedRotatingFileHandler interval such as "midnight" or "H".
+        app.config['SUBMISSION_LOG_WHEN'] = ""
+
+    if 'SUBMISSION_LOG_BACKUP_COUNT' not in app.config:
+        app.config['SUBMISSION_LOG_BACKUP_COUNT'] = 10
+
+    if 'SUBMISSION_LOG_GZIP' not in app.config:
+        app.config['SUBMISSION_LOG_GZIP'] = False
+
+    when = app.config['SUBMISSION_LOG_WHEN']
+    if when and not (isinstance(when, str) and
+                     re.fullmatch(r"[SMHD]|MIDNIGHT|W[0-6]", when.upper())):
+        app.setup_diagnostics.add(
+            "warning", "config",
+            f"SUBMISSION_LOG_WHEN={when!r} is not a rotation interval. "
+            f"Falling back to rotating by size.",
+            suggestion='Use "S", "M", "H", "D", "midnight" or "W0"-"W6", or leave it empty.',
+            source="SUBMISSION_LOG_WHEN",
+        )
+        app.config['SUBMISSION_LOG_WHEN'] = ""
+
+    if 'HEARTBEAT_FLUSH_SECONDS' not in app.config:
+        # 0 writes every /user_active heartbeat straight to the database; a
+        # positive value buffers them in memory and writes them together on
+        # that interval.
+        app.config['HEARTBEAT_FLUSH_SECONDS'] = 0
+
+    if 'MAINTENANCE_INTERVAL_MINUTES' not in app.config:
+        # How often the background sweep deletes expired sessions, lapsed
+        # bans and stale login attempts while the server runs. 0 disables it.
+        app.config['MAINTENANCE_INTERVAL_MINUTES'] = 60
+
+    if 'MAINTENANCE_BATCH_SIZE' not in app.config:
+        app.config['MAINTENANCE_BATCH_SIZE'] = 500
+
+    if 'MAINTENANCE_BAN_RETENTION_DAYS' not in app.config:
+        # Lapsed bans still count toward the progressive ban schedule, so
+        # they are kept this long after expiring.
+        app.config['MAINTENANCE_BAN_RETENTION_DAYS'] = 30
+
+    for key, fallback, minimum in (('MAINTENANCE_INTERVAL_MINUTES', 60, 0),
+                                   ('MAINTENANCE_BATCH_SIZE', 500, 1),
+                                   ('MAINTENANCE_BAN_RETENTION_DAYS', 30, 0),
+                                   ('INTERACTION_LOG_QUEUE_SIZE', 0, 0),
+                                   ('INTERACTION_LOG_BATCH_SIZE', 5000, 1),
+                                   ('SUBMISSION_LOG_MAX_BYTES', 10 * 1024 * 1024, 0),
+                                   ('SUBMISSION_LOG_BACKUP_COUNT', 10, 0),
+                                   ('HEARTBEAT_FLUSH_SECONDS', 0, 0)):
+        value = app.config[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < minimum:
+            app.setup_diagnostics.add(
+                "warning", "config",
+                f"{key}={value!r} is not a number of at least {minimum}. "
+                f"Falling back to {fallback}.",
+                suggestion=f"Set {key} to a number of at least {minimum}.",
+                source=key,
+            )
+            app.config[key] = fallback
+    app.config['MAINTENANCE_BATCH_SIZE'] = int(app.config['MAINTENANCE_BATCH_SIZE'])
+    app.config['INTERACTION_LOG_QUEUE_SIZE'] = int(app.config['INTERACTION_LOG_QUEUE_SIZE'])
+    app.config['INTERACTION_LOG_BATCH_SIZE'] = int(app.config['INTERACTION_LOG_BATCH_SIZE'])
+    app.config['SUBMISSION_LOG_MAX_BYTES'] = int(app.config['SUBMISSION_LOG_MAX_BYTES'])
+    app.config['SUBMISSION_LOG_BACKUP_COUNT'] = int(app.config['SUBMISSION_LOG_BACKUP_COUNT'])
+
     if 'SESSION_COOKIE_SAMESITE' not in app.config:
         # Lax keeps cookies on top-level navigations (so the MTurk/Prolific
         # post-completion redirect still carries them) but blocks cross-site
@@ -252,6 +401,10 @@ def create_app(path, config_name, debug=False, reloader_off=False):
                 ),
             )
 
+        # Paths are final once auto-tagging has run; index each condition's
+        # page sequence now so navigation lookups don't rebuild it per request.
+        app.page_list.precompile_navigation(condition_count)
+
         app.load_questionnaires()
         app.load_tables()
 
@@ -361,6 +514,17 @@ def create_app(path, config_name, debug=False, reloader_off=False):
         check_and_rename_column('participant', 'mTurkID', 'external_id')
         check_and_rename_column('session_store', 'mTurkID', 'external_id')
 
+        # Expiry indexes used by the maintenance sweep. create_all() builds
+        # them on a fresh DB but never adds indexes to existing tables.
+        # Index.create(checkfirst=True) asks the inspector first, because
+        # MySQL has no CREATE INDEX IF NOT EXISTS.
+        with app.db.engine.begin() as conn:
+            for column in (app.db.SessionStore.__table__.c.expiry,
+                           app.db.BannedIp.__table__.c.expiresAt):
+                for index in column.table.indexes:
+                    if list(index.columns) == [column]:
+                        index.create(conn, checkfirst=True)
+
         check_and_add_column('participant', 'excludeFromCount', 'BOOLEAN', 0)
         check_and_add_column('participant', 'notes', 'TEXT', '')
 
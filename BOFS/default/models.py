@@ -19,12 +19,15 @@ _ASSIGN_CONDITION_LOCK = threading.Lock()
 
 @functools.lru_cache(maxsize=128)
 def _compile_expression(expression):
-    """Parse a BOFS expression once per source string. Bounded so a
-    runaway loop of unique expressions can't grow the cache without
+    """Parse and compile a BOFS expression once per source string. Bounded
+    so a runaway loop of unique expressions can't grow the cache without
     bound. Used by :meth:`Participant.evaluate`.
+
+    :returns: ``(ast, refs, fields, compiled)``, see
+        :func:`~BOFS.expressions.participant_env.compile_page_predicate`.
     """
-    from BOFS.expressions import parse_page_predicate
-    return parse_page_predicate(expression)
+    from BOFS.expressions import compile_page_predicate
+    return compile_page_predicate(expression)
 
 
 class TableAccessor:
@@ -330,35 +333,50 @@ def create(db):
             ``{% if participant.evaluate(...) %}`` falls through to the
             ``else`` branch instead of raising.
             """
-            from BOFS.expressions import (
-                ExpressionError,
-                build_participant_env,
-                default_functions,
-                evaluate as _evaluate_ast,
-                referenced_fields,
-            )
             if not isinstance(expression, str):
                 return None
-            try:
-                ast_node, refs = _compile_expression(expression)
-            except ExpressionError:
-                return None
-
+            return self.evaluate_many([expression])[expression]
+
+        def evaluate_many(self, expressions, compiled=None):
+            """Evaluate several BOFS expressions against this participant's
+            stored data, sharing one :class:`ParticipantEnvBatch` so each
+            referenced questionnaire, table export and the participant row
+            are read at most once for the whole set.
+
+            :param compiled: optional ``{expression: compile_page_predicate
+                result}`` built ahead of time (``None`` for an expression
+                that doesn't parse); expressions missing from it are
+                compiled here.
+            :returns: ``{expression: value}`` for every string in
+                ``expressions``, with the same ``None`` results as
+                :meth:`evaluate`.
+            """
+            from BOFS.expressions import ExpressionError, ParticipantEnvBatch
             app = current_app._get_current_object()
-            env = build_participant_env(
+            batch = ParticipantEnvBatch(
                 self.participantID,
-                referenced_fields(ast_node),
-                refs,
                 getattr(app, "questionnaires", {}),
                 app.db,
-                tables=getattr(app, "tables", {}),
+                getattr(app, "tables", {}),
             )
-            try:
-                return _evaluate_ast(
-                    ast_node, env, functions=default_functions()
-                )
-            except ExpressionError:
-                return None
+
+            results = {}
+            for expression in expressions:
+                if not isinstance(expression, str) or expression in results:
+                    continue
+                results[expression] = None
+                try:
+                    if compiled is not None and expression in compiled:
+                        entry = compiled[expression]
+                        if entry is None:
+                            continue
+                    else:
+                        entry = _compile_expression(expression)
+                    _, refs, fields, fn = entry
+                    results[expression] = fn(batch.env_for(fields, refs))
+                except ExpressionError:
+                    pass
+            return results
 
         def questionnaire(self, name, tag=""):
             from BOFS.globals import questionnaires
@@ -401,6 +419,8 @@ def create(db):
             """
             numConditions = len(current_app.config['CONDITIONS'])
             counts = [0] * numConditions
+            if not current_app.config['COUNTS_INCLUDE_ABANDONED']:
+                current_app.flush_heartbeats()
             for condition in range(1, numConditions + 1):
                 if current_app.config['COUNTS_INCLUDE_ABANDONED']:
                     counts[condition - 1] = db.session.query(db.Participant).\
@@ -608,7 +628,7 @@ def create(db):
         externalID = db.Column("external_id", db.Text, nullable=True)
         mTurkID = synonym("externalID")
         data = db.Column(db.Text)
-        expiry = db.Column(db.DateTime)
+        expiry = db.Column(db.DateTime, index=True)
         createdOn = db.Column(db.DateTime, nullable=False, default=utcnow_naive)
 
         def __repr__(self):
@@ -632,7 +652,7 @@ def create(db):
         id = db.Column(db.Integer, primary_key=True, autoincrement=True)
         ipAddress = db.Column(db.String, nullable=False, index=True)
         bannedAt = db.Column(db.DateTime, nullable=False, default=utcnow_naive)
-        expiresAt = db.Column(db.DateTime, nullable=True)
+        expiresAt = db.Column(db.DateTime, nullable=True, index=True)
         reason = db.Column(db.String, nullable=False, default="admin_login")
         failCount = db.Column(db.Integer, nullable=False, default=0)
         notes = db.Column(db.String, nullable=True)
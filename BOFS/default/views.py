@@ -575,13 +575,29 @@ def _find_matching_end_entry(participant_id, reason):
     return None
 
 
-@default.route("/user_active")
+@default.route("/user_active", methods=['GET', 'POST'])
+@suppress_session_save
 def route_user_active():
+    """
+    ``/user_active``
+
+    Heartbeat from ``user_active.js`` (a ``POST`` via ``navigator.sendBeacon``,
+    or a plain ``GET``) that refreshes the participant's ``lastActiveOn``.
+    Answers with an empty 204 and never writes the session.
+    """
     if 'participantID' in session:
-        participant = db.session.get(db.Participant, session['participantID'])
-        participant.lastActiveOn = utcnow_naive()
-        db.session.commit()
-    return ""
+        heartbeats = current_app.get_heartbeat_buffer()
+        if heartbeats is not None:
+            heartbeats.record(session['participantID'], utcnow_naive())
+            if heartbeats.flush_due():
+                heartbeats.flush()
+        else:
+            db.session.execute(
+                db.update(db.Participant).
+                where(db.Participant.participantID == session['participantID']).
+                values(lastActiveOn=utcnow_naive()))
+            db.session.commit()
+    return "", 204
 
 
 @default.route("/current_url")
@@ -612,12 +628,10 @@ def route_restart():
 
     # save_session only assigns the FK columns when their keys exist in the
     # session dict; it never clears them. Null them out explicitly so the row
-    # doesn't keep pointing at the previous participant. The cookie name is
-    # the per-project ``bofs_<hash>`` produced by BOFSSessionInterface, not
-    # the Flask default "session" — read it through the interface.
-    sessionID = request.cookies.get(
-        current_app.session_interface.get_cookie_name(current_app)
-    )
+    # doesn't keep pointing at the previous participant. Read the ID off the
+    # session rather than the cookie: with SESSION_BACKEND = "cookie" the
+    # cookie holds the signed payload, not the row key.
+    sessionID = getattr(session, 'sessionID', None)
     if sessionID:
         ss = db.session.get(db.SessionStore, sessionID)
         if ss:
@@ -9,25 +9,42 @@ and live client-side question show/hide.
 
 Public surface:
 
-    from BOFS.expressions import parse, evaluate, referenced_fields, ExpressionError
+    from BOFS.expressions import parse, evaluate, compile_ast, referenced_fields, ExpressionError
 """
 
 from .parser import parse, referenced_fields, ExpressionError, ALLOWED_FUNCTIONS
-from .evaluator import evaluate, default_functions
+from .evaluator import evaluate, compile_ast, default_functions
+from .optimizer import optimize
 from .fields import parse_with_field_ids
-from .participant_env import parse_page_predicate, build_env as build_participant_env
-from .substitute import substitute_string, substitute_in_questionnaire
+from .participant_env import (
+    ParticipantEnvBatch,
+    parse_page_predicate,
+    compile_page_predicate,
+    build_field_index,
+    build_env as build_participant_env,
+)
+from .substitute import (
+    SubstitutionIndex,
+    substitute_string,
+    substitute_in_questionnaire,
+)
 
 __all__ = [
     "parse",
     "parse_with_field_ids",
     "parse_page_predicate",
+    "compile_page_predicate",
     "build_participant_env",
+    "build_field_index",
+    "ParticipantEnvBatch",
     "evaluate",
+    "compile_ast",
+    "optimize",
     "referenced_fields",
     "ExpressionError",
     "ALLOWED_FUNCTIONS",
     "default_functions",
     "substitute_string",
     "substitute_in_questionnaire",
+    "SubstitutionIndex",
 ]
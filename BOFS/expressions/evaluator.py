@@ -14,8 +14,15 @@ return ``None`` when any list element is ``None``. ``==``/``!=`` and the
 boolean ops (``and``/``or``/``not``/``if``) follow standard Python (``None``
 is falsy, ``None == None`` is True), since those have well-defined behavior
 in the presence of missing data.
+
+:func:`evaluate` walks the AST on every call. For an expression evaluated
+many times — a ``show_if``, a ``participant_calculations`` entry —
+:func:`compile_ast` turns the AST into a reusable callable once, with the
+same semantics and the function implementations bound up front.
 """
 
+import operator
+
 from .parser import ALLOWED_FUNCTIONS, ExpressionError
 
 
@@ -86,6 +93,19 @@ def default_functions():
     }
 
 
+_shared_functions = None
+
+
+def _shared_default_functions():
+    """One :func:`default_functions` map reused by every call that doesn't
+    pass its own, instead of rebuilding the wrappers each time. Never
+    mutate it; call :func:`default_functions` for a private copy."""
+    global _shared_functions
+    if _shared_functions is None:
+        _shared_functions = default_functions()
+    return _shared_functions
+
+
 def evaluate(node, env, functions=None):
     """
     Evaluate a parsed AST node.
@@ -97,10 +117,186 @@ def evaluate(node, env, functions=None):
     :returns: The expression's value.
     """
     if functions is None:
-        functions = default_functions()
+        functions = _shared_default_functions()
     return _eval(node, env, functions)
 
 
+def compile_ast(node, functions=None):
+    """
+    Compile a parsed AST node into a callable taking ``env``.
+
+    ``compile_ast(node, functions)(env)`` returns what
+    ``evaluate(node, env, functions)`` would, raising the same
+    :class:`ExpressionError` at the same point: errors in the AST surface
+    when the offending node is evaluated, not at compile time, so an
+    unreachable branch stays harmless. Function implementations are looked
+    up once here, so later changes to *functions* are not seen.
+
+    :param node: The AST produced by :func:`BOFS.expressions.parser.parse`.
+    :param functions: Mapping of function names to callables. When ``None``,
+        :func:`default_functions` is used if the expression calls any.
+    :returns: A callable ``fn(env)`` returning the expression's value.
+    """
+    if functions is None:
+        # Expressions without a call don't need BOFS.util imported.
+        functions = _shared_default_functions() if _has_call(node) else {}
+    return _compile(node, functions)
+
+
+def _has_call(node):
+    if isinstance(node, dict):
+        return "call" in node or any(_has_call(v) for v in node.values())
+    if isinstance(node, list):
+        return any(_has_call(v) for v in node)
+    return False
+
+
+# Binary operators whose operands propagate ``None``; see _eval.
+_NONE_PROPAGATING_OPS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "//": operator.floordiv,
+    "%": operator.mod,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+_PLAIN_OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "in": lambda a, b: a in b,
+    "not_in": lambda a, b: a not in b,
+}
+
+
+def _compile(node, functions):
+    def interpret(env):
+        # Anything unusual — malformed nodes, unknown operators or
+        # functions, wrong arity — is left to _eval so the error (and the
+        # point at which it is raised) is exactly the interpreter's.
+        return _eval(node, env, functions)
+
+    if not isinstance(node, dict):
+        return interpret
+
+    if "const" in node:
+        value = node["const"]
+        return lambda env: value
+
+    if "var" in node:
+        name = node["var"]
+
+        def var(env):
+            try:
+                return env[name]
+            except KeyError:
+                raise ExpressionError(f"undefined variable: {name!r}") from None
+        return var
+
+    if "call" in node:
+        fname = node["call"]
+        if fname not in ALLOWED_FUNCTIONS or fname not in functions:
+            return interpret
+        fn = functions[fname]
+        arg_fns = [_compile(a, functions) for a in node.get("args", [])]
+        if len(arg_fns) == 1:
+            (only,) = arg_fns
+            return lambda env: fn(only(env))
+        return lambda env: fn(*[f(env) for f in arg_fns])
+
+    if "subscript" in node:
+        if "key" not in node:
+            return interpret
+        container_fn = _compile(node["subscript"], functions)
+        key_fn = _compile(node["key"], functions)
+        return lambda env: _subscript(container_fn(env), key_fn(env))
+
+    if "op" not in node:
+        return interpret
+
+    op = node["op"]
+    arg_fns = [_compile(a, functions) for a in node.get("args", [])]
+
+    if op == "and":
+        if len(arg_fns) == 2:
+            left, right = arg_fns
+            return lambda env: left(env) and right(env)
+
+        def and_(env):
+            result = True
+            for f in arg_fns:
+                result = f(env)
+                if not result:
+                    return result
+            return result
+        return and_
+
+    if op == "or":
+        if len(arg_fns) == 2:
+            left, right = arg_fns
+            return lambda env: left(env) or right(env)
+
+        def or_(env):
+            result = False
+            for f in arg_fns:
+                result = f(env)
+                if result:
+                    return result
+            return result
+        return or_
+
+    if op == "if":
+        if len(arg_fns) != 3:
+            return interpret
+        test, then, otherwise = arg_fns
+        return lambda env: then(env) if test(env) else otherwise(env)
+
+    if op == "list":
+        return lambda env: [f(env) for f in arg_fns]
+
+    if op in ("not", "neg", "pos"):
+        if len(arg_fns) != 1:
+            return interpret
+        (operand,) = arg_fns
+        if op == "not":
+            return lambda env: not operand(env)
+        if op == "neg":
+            def neg(env):
+                value = operand(env)
+                return None if value is None else -value
+            return neg
+
+        def pos(env):
+            value = operand(env)
+            return None if value is None else +value
+        return pos
+
+    if len(arg_fns) != 2:
+        return interpret
+    left, right = arg_fns
+
+    if op in _NONE_PROPAGATING_OPS:
+        apply = _NONE_PROPAGATING_OPS[op]
+
+        def propagating(env):
+            a = left(env)
+            b = right(env)
+            if a is None or b is None:
+                return None
+            return apply(a, b)
+        return propagating
+
+    if op in _PLAIN_OPS:
+        apply = _PLAIN_OPS[op]
+        return lambda env: apply(left(env), right(env))
+
+    return interpret
+
+
 def _eval(node, env, functions):
     if not isinstance(node, dict):
         raise ExpressionError(f"malformed AST node: {node!r}")
@@ -126,34 +322,7 @@ def _eval(node, env, functions):
     if "subscript" in node:
         container = _eval(node["subscript"], env, functions)
         key = _eval(node["key"], env, functions)
-        if isinstance(container, dict):
-            if key in container:
-                return container[key]
-            # SQLite round-trips integer group_by levels as strings in
-            # some paths; allow ``dict[1]`` to find a string-"1" key and
-            # vice-versa so authors don't have to think about the storage
-            # type.
-            if isinstance(key, str) and key.lstrip("-").isdigit():
-                int_key = int(key)
-                if int_key in container:
-                    return container[int_key]
-            elif isinstance(key, int) and not isinstance(key, bool):
-                str_key = str(key)
-                if str_key in container:
-                    return container[str_key]
-            raise ExpressionError(f"key {key!r} not in dict")
-        if isinstance(container, list):
-            if not isinstance(key, int) or isinstance(key, bool):
-                raise ExpressionError(
-                    f"list index must be int, got {type(key).__name__}"
-                )
-            try:
-                return container[key]
-            except IndexError as e:
-                raise ExpressionError(str(e)) from e
-        raise ExpressionError(
-            f"subscript on {type(container).__name__} is not supported"
-        )
+        return _subscript(container, key)
 
     if "op" not in node:
         raise ExpressionError(f"malformed AST node: {node!r}")
@@ -240,3 +409,34 @@ def _eval(node, env, functions):
         return a not in b
 
     raise ExpressionError(f"unknown operator: {op!r}")
+
+
+def _subscript(container, key):
+    if isinstance(container, dict):
+        if key in container:
+            return container[key]
+        # SQLite round-trips integer group_by levels as strings in
+        # some paths; allow ``dict[1]`` to find a string-"1" key and
+        # vice-versa so authors don't have to think about the storage
+        # type.
+        if isinstance(key, str) and key.lstrip("-").isdigit():
+            int_key = int(key)
+            if int_key in container:
+                return container[int_key]
+        elif isinstance(key, int) and not isinstance(key, bool):
+            str_key = str(key)
+            if str_key in container:
+                return container[str_key]
+        raise ExpressionError(f"key {key!r} not in dict")
+    if isinstance(container, list):
+        if not isinstance(key, int) or isinstance(key, bool):
+            raise ExpressionError(
+                f"list index must be int, got {type(key).__name__}"
+            )
+        try:
+            return container[key]
+        except IndexError as e:
+            raise ExpressionError(str(e)) from e
+    raise ExpressionError(
+        f"subscript on {type(container).__name__} is not supported"
+    )
@@ -0,0 +1,141 @@
+"""
+Constant folding and dead-branch elimination for the BOFS expression AST.
+
+:func:`optimize` rewrites a parsed AST into an equivalent, smaller one:
+
+* Subtrees without variables are evaluated once and replaced by their
+  value, e.g. ``2 * 3`` becomes ``{"const": 6}``. A subtree whose
+  evaluation raises (``1 / 0``, an unknown function) is left in place so
+  the error still surfaces when the expression is evaluated.
+* ``if`` with a constant test keeps only the arm it selects.
+* ``and``/``or`` chains drop constant operands that cannot change the
+  result and stop at the first constant that decides it.
+
+Every rewrite preserves the value the evaluator would return, not just its
+truthiness, so the optimized AST is safe for ``participant_calculations``
+as well as ``show_if``. Because unreachable branches are removed,
+:func:`~BOFS.expressions.parser.referenced_fields` on the result names only
+the variables evaluation can actually read.
+
+The input AST is never mutated. Optimized ASTs are for server-side
+evaluation; ASTs shipped to the browser are left as parsed so the
+JavaScript evaluator computes every value itself.
+"""
+
+from .evaluator import _eval, _has_call, _shared_default_functions
+
+
+# Values a folded subtree may be replaced with. Lists are left unfolded so
+# the evaluator keeps building a fresh one per call.
+_SCALAR_TYPES = (bool, int, float, str, type(None))
+
+
+def optimize(node, functions=None):
+    """
+    Return an optimized copy of a parsed AST node.
+
+    :param node: The AST produced by :func:`BOFS.expressions.parser.parse`.
+    :param functions: Mapping used to fold calls with constant arguments.
+        When ``None``, :func:`~BOFS.expressions.evaluator.default_functions`
+        is used, loaded only once a constant call needs folding. Pass the
+        same map the expression is evaluated with.
+    """
+    return _optimize(node, functions)[0]
+
+
+def _optimize(node, functions):
+    """Return ``(optimized_node, is_constant)``; a constant node contains
+    no ``var`` and so evaluates the same for every env."""
+    if not isinstance(node, dict):
+        return node, False
+
+    if "const" in node:
+        return node, True
+
+    if "var" in node:
+        return node, False
+
+    if "call" in node:
+        args, constant = _optimize_all(node.get("args", []), functions)
+        new = dict(node, args=args)
+        return _fold(new, functions) if constant else (new, False)
+
+    if "subscript" in node:
+        if "key" not in node:
+            return node, False
+        container, c_const = _optimize(node["subscript"], functions)
+        key, k_const = _optimize(node["key"], functions)
+        new = dict(node, subscript=container, key=key)
+        return _fold(new, functions) if c_const and k_const else (new, False)
+
+    if "op" not in node:
+        return node, False
+
+    op = node["op"]
+    args = node.get("args", [])
+
+    if op in ("and", "or"):
+        return _optimize_bool_chain(node, op, args, functions)
+
+    if op == "if" and len(args) == 3:
+        test, test_const = _optimize(args[0], functions)
+        if test_const and "const" in test:
+            return _optimize(args[1] if test["const"] else args[2], functions)
+        then, then_const = _optimize(args[1], functions)
+        otherwise, otherwise_const = _optimize(args[2], functions)
+        new = dict(node, args=[test, then, otherwise])
+        if test_const and then_const and otherwise_const:
+            return _fold(new, functions)
+        return new, False
+
+    new_args, constant = _optimize_all(args, functions)
+    new = dict(node, args=new_args)
+    return _fold(new, functions) if constant else (new, False)
+
+
+def _optimize_all(args, functions):
+    optimized = [_optimize(a, functions) for a in args]
+    return [n for n, _ in optimized], all(c for _, c in optimized)
+
+
+def _optimize_bool_chain(node, op, args, functions):
+    """Simplify an ``and``/``or`` chain.
+
+    For ``and`` (``or`` is the mirror image): a truthy constant can be
+    dropped anywhere but last, since evaluation just moves past it; a
+    falsy constant ends the chain, since nothing after it is evaluated.
+    A chain reduced to one operand is that operand.
+    """
+    decisive = (lambda v: not v) if op == "and" else bool
+    kept = []
+    last = len(args) - 1
+    for i, arg in enumerate(args):
+        new, constant = _optimize(arg, functions)
+        if constant and "const" in new:
+            if decisive(new["const"]):
+                kept.append(new)
+                break
+            if i != last:
+                continue
+        kept.append(new)
+
+    if not kept:
+        # Only reachable for an empty chain; the evaluator's value for it.
+        return {"const": op == "and"}, True
+    if len(kept) == 1:
+        return kept[0], "const" in kept[0]
+    return dict(node, args=kept), False
+
+
+def _fold(node, functions):
+    """Evaluate a variable-free node and return it as a constant, or keep
+    the node when evaluation fails or yields a non-scalar."""
+    if functions is None:
+        functions = _shared_default_functions() if _has_call(node) else {}
+    try:
+        value = _eval(node, {}, functions)
+    except Exception:
+        return node, False
+    if not isinstance(value, _SCALAR_TYPES):
+        return node, True
+    return {"const": value}, True
@@ -32,7 +32,9 @@ table on every page render.
 
 import re
 
-from .parser import parse, ExpressionError
+from .evaluator import compile_ast
+from .optimizer import optimize
+from .parser import parse, referenced_fields, ExpressionError
 
 
 # Match dotted references: an identifier-looking head, then any number of
@@ -99,6 +101,12 @@ def _resolve_table_ref(participant_id, tname, column, db, tables, key=None):
         # has no rows — both are "undecided" for show_if purposes.
         return _UNRESOLVED
 
+    return _apply_table_key(value, key)
+
+
+def _apply_table_key(value, key):
+    """Apply an optional literal ``key`` to a resolved table export value;
+    see :func:`_resolve_table_ref`."""
     if isinstance(value, dict):
         if key is None:
             # group_by export, no dotted key — hand back the whole dict so
@@ -199,6 +207,42 @@ def parse_page_predicate(src):
     return ast, refs
 
 
+def compile_page_predicate(src):
+    """Parse, optimize and compile a page-level expression.
+
+    :returns: ``(ast, refs, fields, compiled)``: the AST and placeholder map
+        from :func:`parse_page_predicate`, then the fields the optimized AST
+        reads and its compiled closure, so only fields a reachable branch
+        reads are loaded into the env.
+    :raises ExpressionError: when the expression can't be parsed.
+    """
+    ast_node, refs = parse_page_predicate(src)
+    optimized = optimize(ast_node)
+    return ast_node, refs, referenced_fields(optimized), compile_ast(optimized)
+
+
+def build_field_index(questionnaires):
+    """Map each questionnaire field ID to the names of the questionnaires
+    defining it, in ``questionnaires`` order, which is the order a bare
+    reference searches them in. Questionnaires without a model or whose
+    fields can't be listed are left out.
+
+    :param questionnaires: dict ``{filename: JSONQuestionnaire}``.
+    :returns: ``{field_id: [qname, ...]}``.
+    """
+    index = {}
+    for qname, q in (questionnaires or {}).items():
+        if getattr(q, "db_class", None) is None:
+            continue
+        try:
+            field_ids = {f.id for f in q.fetch_fields()}
+        except Exception:
+            continue
+        for field_id in field_ids:
+            index.setdefault(field_id, []).append(qname)
+    return index
+
+
 def build_env(participant_id, referenced, refs, questionnaires, db,
               tables=None):
     """Build an env dict for the expression engine, populated only with
@@ -222,82 +266,143 @@ def build_env(participant_id, referenced, refs, questionnaires, db,
     """
     if not referenced:
         return {}
+    batch = ParticipantEnvBatch(participant_id, questionnaires, db, tables)
+    return batch.env_for(referenced, refs)
 
-    refs = refs or {}
-    tables = tables or {}
-    env = {}
-
-    placeholder_names = set(refs.keys())
-    referenced_placeholders = set(referenced) & placeholder_names
-    referenced_bare = set(referenced) - placeholder_names
-
-    # Bare names backed by the ``Participant`` row itself (not by a
-    # questionnaire field). ``condition`` is the legacy member of this set;
-    # ``source`` and ``end_reason`` join it so ``show_if = "source ==
-    # 'prolific'"`` and ``show_if = "end_reason == 'screened_out'"`` work
-    # without per-name special cases. ``None`` flows through the evaluator's
-    # ``==`` / ``!=`` paths cleanly, so a participant with no source or no
-    # recorded end reason matches against any string as ``False``.
-    reserved_in_use = referenced_bare & RESERVED_PARTICIPANT_BARE_NAMES
-    if reserved_in_use:
-        referenced_bare -= reserved_in_use
-        participant_model = getattr(db, "Participant", None)
-        if participant_model is not None:
-            participant = db.session.get(participant_model, participant_id)
-            if participant is not None:
-                for name in reserved_in_use:
-                    env[name] = getattr(participant, name, None)
 
-    # Resolve qualified references through the placeholder side table.
-    for ph in referenced_placeholders:
-        spec = refs[ph]
-        kind = spec.get("kind", "questionnaire")
+class ParticipantEnvBatch(object):
+    """Shared loader for evaluating many predicates against one participant.
 
-        if kind == "table":
-            value = _resolve_table_ref(
-                participant_id, spec["tname"], spec["column"], db, tables,
-                key=spec.get("key"),
-            )
-            if value is not _UNRESOLVED:
-                env[ph] = value
-            continue
+    :func:`build_env` issues its own queries on every call, so a PAGE_LIST
+    with a dozen gated pages re-reads the same questionnaire rows a dozen
+    times per navigation. A batch loads each questionnaire's rows for the
+    participant at most once (newest first), each table export at most
+    once, and the ``Participant`` row once, then answers any number of
+    :meth:`env_for` calls from memory. Build a fresh batch whenever the
+    participant's data may have changed.
+    """
 
-        qname = spec["qname"]
-        tag = spec["tag"]
-        field = spec["field"]
+    def __init__(self, participant_id, questionnaires, db, tables=None):
+        self.participant_id = participant_id
+        self.questionnaires = questionnaires
+        self.db = db
+        self.tables = tables or {}
+        self._participant = _UNRESOLVED
+        self._rows = {}
+        self._field_index = None
+        self._table_values = {}
+
+    def env_for(self, referenced, refs):
+        """Same contract as :func:`build_env` for one predicate."""
+        if not referenced:
+            return {}
+
+        refs = refs or {}
+        env = {}
+
+        placeholder_names = set(refs.keys())
+        referenced_placeholders = set(referenced) & placeholder_names
+        referenced_bare = set(referenced) - placeholder_names
+
+        # Bare names backed by the ``Participant`` row itself (not by a
+        # questionnaire field). ``condition`` is the legacy member of this
+        # set; ``source`` and ``end_reason`` join it so ``show_if = "source
+        # == 'prolific'"`` and ``show_if = "end_reason == 'screened_out'"``
+        # work without per-name special cases. ``None`` flows through the
+        # evaluator's ``==`` / ``!=`` paths cleanly, so a participant with
+        # no source or no recorded end reason matches against any string
+        # as ``False``.
+        reserved_in_use = referenced_bare & RESERVED_PARTICIPANT_BARE_NAMES
+        if reserved_in_use:
+            referenced_bare -= reserved_in_use
+            participant = self._get_participant()
+            if participant is not None:
+                for name in reserved_in_use:
+                    env[name] = getattr(participant, name, None)
 
-        q = questionnaires.get(qname)
-        if q is None or q.db_class is None:
-            continue
+        # Resolve qualified references through the placeholder side table.
+        for ph in referenced_placeholders:
+            spec = refs[ph]
+            kind = spec.get("kind", "questionnaire")
 
-        query = db.session.query(q.db_class).filter(
-            q.db_class.participantID == participant_id
-        )
-        if tag is not None:
-            query = query.filter(q.db_class.tag == tag)
-        record = query.order_by(q.db_class.timeEnded.desc()).first()
-        if record is None:
-            continue
-        env[ph] = getattr(record, field, None)
-
-    # Resolve bare references: search every questionnaire for a field by
-    # this name, taking the most recent matching row regardless of tag.
-    for bare in referenced_bare:
-        for qname, q in questionnaires.items():
-            try:
-                field_ids = {f.id for f in q.fetch_fields()}
-            except Exception:
+            if kind == "table":
+                value = self._table_value(
+                    spec["tname"], spec["column"], spec.get("key"),
+                )
+                if value is not _UNRESOLVED:
+                    env[ph] = value
                 continue
-            if bare not in field_ids or q.db_class is None:
+
+            rows = self._questionnaire_rows(spec["qname"])
+            tag = spec["tag"]
+            record = next(
+                (r for r in rows if tag is None or r.tag == tag), None,
+            )
+            if record is None:
                 continue
-            record = (
-                db.session.query(q.db_class)
-                .filter(q.db_class.participantID == participant_id)
-                .order_by(q.db_class.timeEnded.desc())
-                .first()
+            env[ph] = getattr(record, spec["field"], None)
+
+        # Resolve bare references: the first questionnaire defining a field
+        # by this name that the participant has submitted, taking its most
+        # recent row regardless of tag.
+        for bare in referenced_bare:
+            for qname in self._field_owners(bare):
+                rows = self._questionnaire_rows(qname)
+                if rows:
+                    env.setdefault(bare, getattr(rows[0], bare, None))
+                    break
+
+        return env
+
+    def _get_participant(self):
+        if self._participant is _UNRESOLVED:
+            participant_model = getattr(self.db, "Participant", None)
+            self._participant = (
+                None if participant_model is None
+                else self.db.session.get(participant_model, self.participant_id)
             )
-            if record is not None:
-                env.setdefault(bare, getattr(record, bare, None))
-                break
-
-    return env
+        return self._participant
+
+    def _questionnaire_rows(self, qname):
+        """The participant's rows for *qname*, newest ``timeEnded`` first.
+        One query per questionnaire; ``[]`` when it isn't loaded."""
+        rows = self._rows.get(qname)
+        if rows is None:
+            q = self.questionnaires.get(qname)
+            if q is None or q.db_class is None:
+                rows = []
+            else:
+                rows = (
+                    self.db.session.query(q.db_class)
+                    .filter(q.db_class.participantID == self.participant_id)
+                    .order_by(q.db_class.timeEnded.desc())
+                    .all()
+                )
+            self._rows[qname] = rows
+        return rows
+
+    def _field_owners(self, name):
+        """Questionnaires defining field *name*, from the registry's
+        startup-built index when ``questionnaires`` is ``app.questionnaires``
+        and from a one-off :func:`build_field_index` otherwise."""
+        if self._field_index is None:
+            field_index = getattr(self.questionnaires, "field_index", None)
+            self._field_index = (
+                field_index() if callable(field_index)
+                else build_field_index(self.questionnaires)
+            )
+        return self._field_index.get(name, ())
+
+    def _table_value(self, tname, column, key):
+        """Memoised :func:`_resolve_table_ref`; the ``key`` lookup runs on
+        the cached export so ``round_score.1`` and ``round_score.2`` share
+        one aggregation query."""
+        cache_key = (tname, column)
+        if cache_key not in self._table_values:
+            self._table_values[cache_key] = _resolve_table_ref(
+                self.participant_id, tname, column, self.db, self.tables,
+            )
+        value = self._table_values[cache_key]
+        if value is _UNRESOLVED:
+            return value
+        return _apply_table_key(value, key)
@@ -13,16 +13,26 @@ Substitution is single-pass: the result of one substitution is not
 re-scanned. This keeps a substituted value of literal ``{{ x }}`` from
 triggering a second eval, and sidesteps nested-placeholder ambiguity.
 
+Where a questionnaire's placeholders are is fixed once its JSON is loaded,
+so :class:`SubstitutionIndex` records the path to every string holding one,
+with each placeholder expression already compiled. Rendering evaluates all
+of them together through :meth:`Participant.evaluate_many`, which loads
+the participant's data once for the whole set, and copies only the dicts
+and lists along those paths; everything else is shared with the cached
+JSON. A questionnaire without placeholders is returned as is.
+
 Keys whose values are NOT user-facing copy — expression strings,
 compiled ASTs, IDs, question types, asset URLs, or the ``code`` JS slot
 where literal ``{{`` is common in third-party templating — are skipped.
 """
 
-import copy
 import re
 
 from markupsafe import escape
 
+from .parser import ExpressionError
+from .participant_env import compile_page_predicate
+
 
 _PLACEHOLDER_RE = re.compile(r"\{\{(.*?)\}\}")
 
@@ -36,6 +46,8 @@ _SKIP_KEYS = frozenset({
     "participant_calculations",
     "_show_if_ast",
     "_show_if_refs",
+    "_show_if_fields",
+    "_show_if_dependencies",
     "code",
     "src",
 })
@@ -51,46 +63,120 @@ def substitute_string(text, participant):
     """
     if not isinstance(text, str) or "{{" not in text:
         return text
+    if participant is None:
+        return _substitute(text, {})
+    return _substitute(text, participant.evaluate_many(_placeholders(text)))
 
-    def replace(match):
-        expr = match.group(1).strip()
-        if not expr:
-            return ""
-        if participant is None:
-            return ""
-        value = participant.evaluate(expr)
-        if value is None:
-            return ""
-        return str(escape(str(value)))
-
-    return _PLACEHOLDER_RE.sub(replace, text)
 
-
-def substitute_in_questionnaire(json_data, participant):
-    """Return a deep-copied questionnaire dict with every ``{{ ... }}``
-    placeholder substituted, walking nested dicts and lists.
+def substitute_in_questionnaire(json_data, participant, index=None):
+    """Return the questionnaire dict with every ``{{ ... }}`` placeholder
+    substituted, walking nested dicts and lists.
 
     The original ``json_data`` is the cached
-    :class:`JSONQuestionnaire.json_data` and must not be mutated.
+    :class:`JSONQuestionnaire.json_data` and is never mutated. Containers on
+    the way to a substituted string are copied; the rest of the result,
+    and the whole result when there are no placeholders, is shared with
+    ``json_data`` and must not be mutated either.
+
+    :param index: the :class:`SubstitutionIndex` of ``json_data``, normally
+        :attr:`JSONQuestionnaire.substitution_index`. Built on the fly when
+        omitted.
     """
     if not isinstance(json_data, dict):
         return json_data
-    return _walk_dict(copy.deepcopy(json_data), participant)
+    if index is None:
+        index = SubstitutionIndex(json_data)
+    if not index:
+        return json_data
+    values = (
+        participant.evaluate_many(index.compiled, compiled=index.compiled)
+        if participant is not None else {}
+    )
+    return index.apply(json_data, values)
+
+
+class SubstitutionIndex(object):
+    """The placeholders of one questionnaire's JSON, found once at load.
+
+    ``paths`` lists ``(path, text)`` for every substitutable string holding
+    a placeholder, ``path`` being the tuple of keys and list indices that
+    leads to it from the root. ``compiled`` maps each placeholder
+    expression to its :func:`compile_page_predicate` result, or ``None``
+    when it doesn't parse (which renders as an empty string).
+    """
+
+    __slots__ = ("paths", "compiled")
+
+    def __init__(self, json_data):
+        self.paths = []
+        self.compiled = {}
+        if isinstance(json_data, dict):
+            _index_dict(json_data, (), self.paths)
+        for _, text in self.paths:
+            for expression in _placeholders(text):
+                if expression in self.compiled:
+                    continue
+                try:
+                    self.compiled[expression] = compile_page_predicate(expression)
+                except ExpressionError:
+                    self.compiled[expression] = None
+
+    def __bool__(self):
+        return bool(self.paths)
+
+    def apply(self, json_data, values):
+        """Return ``json_data`` with each indexed string substituted from
+        ``values`` (``{expression: value}``), copying only the containers
+        along the indexed paths."""
+        root = dict(json_data)
+        copies = {(): root}
+        for path, text in self.paths:
+            parent = root
+            for depth in range(1, len(path)):
+                prefix = path[:depth]
+                child = copies.get(prefix)
+                if child is None:
+                    original = parent[path[depth - 1]]
+                    child = dict(original) if isinstance(original, dict) else list(original)
+                    parent[path[depth - 1]] = child
+                    copies[prefix] = child
+                parent = child
+            parent[path[-1]] = _substitute(text, values)
+        return root
+
+
+def _placeholders(text):
+    """The non-empty placeholder expressions in ``text``, in order."""
+    return [e for e in (m.strip() for m in _PLACEHOLDER_RE.findall(text)) if e]
+
+
+def _substitute(text, values):
+    """Replace each placeholder in ``text`` with its entry in ``values``
+    (``{expression: value}``); missing or ``None`` entries become ``""``."""
+    if "{{" not in text:
+        return text
+
+    def replace(match):
+        value = values.get(match.group(1).strip())
+        if value is None:
+            return ""
+        return str(escape(str(value)))
+
+    return _PLACEHOLDER_RE.sub(replace, text)
 
 
-def _walk_dict(node, participant):
-    for key, value in list(node.items()):
-        if key in _SKIP_KEYS:
-            continue
-        node[key] = _walk_value(value, participant)
-    return node
+def _index_dict(node, path, paths):
+    for key, value in node.items():
+        if key not in _SKIP_KEYS:
+            _index_value(value, path + (key,), paths)
 
 
-def _walk_value(value, participant):
+def _index_value(value, path, paths):
     if isinstance(value, str):
-        return substitute_string(value, participant)
-    if isinstance(value, dict):
-        return _walk_dict(value, participant)
-    if isinstance(value, list):
-        return [_walk_value(item, participant) for item in value]
-    return value
+        if "{{" in value and _PLACEHOLDER_RE.search(value):
+            paths.append((path, value))
+    elif isinstance(value, dict):
+        _index_dict(value, path, paths)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            _index_value(item, path + (i,), paths)
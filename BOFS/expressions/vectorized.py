@@ -0,0 +1,287 @@
+"""
+Column-at-a-time evaluation of the BOFS expression AST.
+
+Used when a whole questionnaire is exported: instead of building an env and
+walking the AST once per row, :func:`evaluate_columns` runs the expression
+once over NumPy arrays holding every row's value of each referenced field.
+
+A column is a ``(values, missing)`` pair of equal-length arrays. ``values``
+is ``float64`` with NaN in missing slots; ``missing`` is the boolean mask
+that actually marks them, so a real NaN answer is still told apart from a
+missing one. Missing propagates the way ``None`` does in
+:mod:`BOFS.expressions.evaluator`: arithmetic, ordered comparisons and
+aggregates of a missing operand are missing, ``==``/``!=`` and the boolean
+operators follow Python truthiness.
+
+The result has to be exactly what the per-row path returns, so only the
+part of the language whose NumPy form has the same semantics is handled.
+Anything else — strings, ``in``, subscripts, ``int``/``round``/``len``,
+``sum`` (whose float algorithm changes between CPython versions), a
+division by zero the per-row path would raise on — raises
+:class:`Unvectorizable` and the caller falls back to evaluating row by row.
+
+Building the columns costs about as much as evaluating plain arithmetic or
+a conditional row by row, so only expressions that call an aggregate are
+worth running this way; see :func:`worth_vectorizing`.
+"""
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - numpy ships with pandas
+    numpy = None
+
+
+class Unvectorizable(Exception):
+    """The expression can't be evaluated column-wise with results identical
+    to the per-row evaluator; evaluate it row by row instead."""
+
+
+# Kinds of vector. ``int`` only arises from integer constants selected by
+# ``if``/``and``/``or``, which the per-row path returns as Python ints.
+_FLOAT, _INT, _BOOL, _NONE = "float", "int", "bool", "none"
+
+# Largest integer every float64 represents exactly; bigger integer
+# constants would compare differently once converted.
+_EXACT_INT_LIMIT = 2 ** 53
+
+_ARITHMETIC = ("+", "-", "*", "/", "//", "%")
+_ORDERED = ("<", "<=", ">", ">=")
+
+# Aggregates whose per-row implementation (BOFS.util, NumPy-backed) reduces
+# the same way along axis 1 of the stacked columns.
+_AGGREGATES = ("mean", "median", "stdev", "std", "var", "variance")
+
+# Calls that cost the per-row path a Python function call (and usually a
+# list) per row. Expressions without one don't beat the per-row path once
+# the columns are built (tests/benchmarks/bench_vectorized_calculations.py).
+_WORTHWHILE_CALLS = ("min", "max") + _AGGREGATES
+
+
+def worth_vectorizing(node):
+    """``True`` when the AST calls ``min``, ``max`` or one of the
+    statistical aggregates anywhere, so :func:`evaluate_columns` is
+    expected to beat evaluating it row by row."""
+    if isinstance(node, dict):
+        if node.get("call") in _WORTHWHILE_CALLS:
+            return True
+        return any(worth_vectorizing(value) for value in node.values())
+    if isinstance(node, list):
+        return any(worth_vectorizing(value) for value in node)
+    return False
+
+
+class _Vec(object):
+    __slots__ = ("values", "missing", "kind")
+
+    def __init__(self, values, missing, kind):
+        self.values = values
+        self.missing = missing
+        self.kind = kind
+
+
+def evaluate_columns(node, columns, n):
+    """
+    Evaluate a parsed AST over *n* rows at once.
+
+    :param node: The AST, as evaluated by the per-row path.
+    :param columns: Mapping of variable name to a ``(values, missing)``
+        pair of length-*n* arrays.
+    :param n: Number of rows.
+    :returns: A list of *n* Python values, ``None`` where the per-row
+        evaluator would return ``None``.
+    :raises Unvectorizable: when the result could differ from the per-row
+        evaluator.
+    """
+    if numpy is None:
+        raise Unvectorizable("numpy is not installed")
+    with numpy.errstate(all="ignore"):
+        vec = _Evaluator(columns, n).eval(node)
+    if vec.kind == _FLOAT:
+        values = vec.values.tolist()
+    elif vec.kind == _INT:
+        values = vec.values.astype(numpy.int64).tolist()
+    elif vec.kind == _BOOL:
+        values = vec.values.astype(bool).tolist()
+    else:
+        return [None] * n
+    missing = vec.missing.tolist()
+    return [None if m else v for v, m in zip(values, missing)]
+
+
+class _Evaluator(object):
+    def __init__(self, columns, n):
+        self.columns = columns
+        self.n = n
+
+    def eval(self, node):
+        if not isinstance(node, dict):
+            raise Unvectorizable("malformed AST node")
+
+        if "const" in node:
+            return self._const(node["const"])
+
+        if "var" in node:
+            name = node["var"]
+            if name not in self.columns:
+                raise Unvectorizable(f"no column for {name!r}")
+            values, missing = self.columns[name]
+            return _Vec(values, missing, _FLOAT)
+
+        if "call" in node:
+            return self._call(node["call"], node.get("args", []))
+
+        op = node.get("op")
+        args = node.get("args", [])
+
+        if op in ("and", "or") and args:
+            result = self.eval(args[0])
+            for arg in args[1:]:
+                result = self._bool_op(op, result, self.eval(arg))
+            return result
+
+        if op == "if" and len(args) == 3:
+            test = self._truthy(self.eval(args[0]))
+            return self._select(test, self.eval(args[1]), self.eval(args[2]))
+
+        if op == "not" and len(args) == 1:
+            return _Vec(~self._truthy(self.eval(args[0])), self._no_missing(), _BOOL)
+
+        if op in ("neg", "pos") and len(args) == 1:
+            operand = self._numeric(self.eval(args[0]))
+            values = -operand.values if op == "neg" else operand.values
+            return _Vec(values, operand.missing, operand.kind)
+
+        if op in _ARITHMETIC and len(args) == 2:
+            return self._arithmetic(op, self.eval(args[0]), self.eval(args[1]))
+
+        if op in _ORDERED and len(args) == 2:
+            a = self._numeric(self.eval(args[0]))
+            b = self._numeric(self.eval(args[1]))
+            values = {
+                "<": numpy.less, "<=": numpy.less_equal,
+                ">": numpy.greater, ">=": numpy.greater_equal,
+            }[op](a.values, b.values)
+            return _Vec(values, a.missing | b.missing, _BOOL)
+
+        if op in ("==", "!=") and len(args) == 2:
+            return self._equality(op, self.eval(args[0]), self.eval(args[1]))
+
+        raise Unvectorizable(f"unsupported node {node!r}")
+
+    # -- leaves ----------------------------------------------------------
+
+    def _no_missing(self):
+        return numpy.zeros(self.n, dtype=bool)
+
+    def _const(self, value):
+        if value is None:
+            return _Vec(numpy.full(self.n, numpy.nan), numpy.ones(self.n, dtype=bool), _NONE)
+        if isinstance(value, bool):
+            return _Vec(numpy.full(self.n, value), self._no_missing(), _BOOL)
+        if isinstance(value, int):
+            if abs(value) > _EXACT_INT_LIMIT:
+                raise Unvectorizable("integer constant too large for float64")
+            return _Vec(numpy.full(self.n, float(value)), self._no_missing(), _INT)
+        if isinstance(value, float):
+            return _Vec(numpy.full(self.n, value), self._no_missing(), _FLOAT)
+        raise Unvectorizable(f"unsupported constant {value!r}")
+
+    def _call(self, fname, args):
+        if fname in ("abs", "float") and len(args) == 1:
+            operand = self.eval(args[0])
+            if operand.kind != _FLOAT:
+                raise Unvectorizable(f"{fname}() of a non-float")
+            values = numpy.abs(operand.values) if fname == "abs" else operand.values
+            return _Vec(values, operand.missing, _FLOAT)
+
+        if fname in ("min", "max"):
+            items = self._aggregate_items(args)
+            values, missing = items[0].values, items[0].missing
+            # Python keeps the earliest element unless a later one is
+            # strictly smaller (larger); numpy.minimum would not.
+            better = numpy.less if fname == "min" else numpy.greater
+            for item in items[1:]:
+                values = numpy.where(better(item.values, values), item.values, values)
+                missing = missing | item.missing
+            return _Vec(values, missing, _FLOAT)
+
+        if fname in _AGGREGATES:
+            from BOFS import util
+            if not util.numpy:
+                raise Unvectorizable("per-row aggregates don't use numpy")
+            items = self._aggregate_items(args)
+            stacked = numpy.ascontiguousarray(numpy.stack([i.values for i in items], axis=1))
+            missing = numpy.logical_or.reduce([i.missing for i in items])
+            reducer = {
+                "mean": numpy.mean, "median": numpy.median,
+                "stdev": numpy.std, "std": numpy.std,
+                "var": numpy.var, "variance": numpy.var,
+            }[fname]
+            return _Vec(reducer(stacked, axis=1), missing, _FLOAT)
+
+        raise Unvectorizable(f"function {fname!r} is not vectorized")
+
+    def _aggregate_items(self, args):
+        """The float vectors passed to an aggregate, either as one list
+        literal (``mean([a, b])``) or, for min/max, as separate arguments."""
+        if len(args) == 1 and isinstance(args[0], dict) and args[0].get("op") == "list":
+            args = args[0].get("args", [])
+        elif len(args) == 1:
+            raise Unvectorizable("aggregate over a non-literal list")
+        if not args:
+            raise Unvectorizable("aggregate over an empty list")
+        items = [self.eval(a) for a in args]
+        if any(item.kind != _FLOAT for item in items):
+            raise Unvectorizable("aggregate over non-float values")
+        return items
+
+    # -- operators -------------------------------------------------------
+
+    def _numeric(self, vec):
+        if vec.kind not in (_FLOAT, _INT, _NONE):
+            raise Unvectorizable("numeric operator on a boolean")
+        return vec
+
+    def _arithmetic(self, op, a, b):
+        a, b = self._numeric(a), self._numeric(b)
+        if a.kind != _FLOAT and b.kind != _FLOAT:
+            # int op int keeps Python int semantics; not modelled here.
+            raise Unvectorizable("integer arithmetic")
+        missing = a.missing | b.missing
+        if op in ("/", "//", "%") and numpy.any((b.values == 0) & ~missing):
+            # The per-row path raises ZeroDivisionError for these rows.
+            raise Unvectorizable("division by zero")
+        values = {
+            "+": numpy.add, "-": numpy.subtract, "*": numpy.multiply,
+            "/": numpy.true_divide, "//": numpy.floor_divide, "%": numpy.mod,
+        }[op](a.values, b.values)
+        return _Vec(values, missing, _FLOAT)
+
+    def _equality(self, op, a, b):
+        numeric = (_FLOAT, _INT)
+        if _NONE not in (a.kind, b.kind) and \
+                not (a.kind in numeric and b.kind in numeric) and a.kind != b.kind:
+            raise Unvectorizable("equality between a number and a boolean")
+        both_present = ~a.missing & ~b.missing
+        equal = (both_present & (a.values == b.values)) | (a.missing & b.missing)
+        return _Vec(equal if op == "==" else ~equal, self._no_missing(), _BOOL)
+
+    def _truthy(self, vec):
+        if vec.kind == _BOOL:
+            return vec.values.astype(bool) & ~vec.missing
+        return (vec.values != 0) & ~vec.missing
+
+    def _bool_op(self, op, a, b):
+        a_true = self._truthy(a)
+        return self._select(a_true, b, a) if op == "and" else self._select(a_true, a, b)
+
+    def _select(self, mask, when_true, when_false):
+        """Per-row ``when_true if mask else when_false``. Both sides must be
+        of one kind (or missing) so every row gets the same Python type."""
+        kinds = {when_true.kind, when_false.kind} - {_NONE}
+        if len(kinds) > 1:
+            raise Unvectorizable("branches of different types")
+        kind = kinds.pop() if kinds else _NONE
+        values = numpy.where(mask, when_true.values, when_false.values)
+        missing = numpy.where(mask, when_true.missing, when_false.missing)
+        return _Vec(values, missing, kind)
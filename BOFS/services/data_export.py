@@ -178,18 +178,37 @@ class Results(object):
 
         query_result = query_questionnaires.all()
 
+        entry_rows = {entry: [] for entry in entries}
         for row in query_result:
             for entry in entries:
                 questionnaire_data = getattr(row, entry)
                 if not questionnaire_data:
                     continue
                 pid = row.Participant.participantID
+                entry_rows[entry].append((pid, questionnaire_data))
                 for col in q_columns[entry]:
                     self.export_data[pid][entry + "_" + col] = getattr(questionnaire_data, col)
+                # Placeholder so the column keeps its position; filled in
+                # by _export_calculated_fields.
                 for col in q_calculated_columns[entry]:
-                    self.export_data[pid][entry + "_" + col] = getattr(questionnaire_data, col)()
+                    self.export_data[pid][entry + "_" + col] = None
                 self.export_data[pid][entry + "_duration"] = questionnaire_data.duration()
 
+        for entry in entries:
+            self._export_calculated_fields(entry, entry_rows[entry])
+
+    def _export_calculated_fields(self, entry: str, rows: list) -> None:
+        """Fill in *entry*'s calculated columns for ``(pid, row)`` pairs,
+        evaluating each calculation over all rows at once."""
+        questionnaire_name, _ = questionnaire_name_and_tag(entry)
+        questionnaire = questionnaires[questionnaire_name]
+        if not rows or not questionnaire.get_calculated_fields():
+            return
+        calculated = questionnaire.calculate_fields([row for _, row in rows])
+        for col, values in calculated.items():
+            for (pid, _), value in zip(rows, values):
+                self.export_data[pid][entry + "_" + col] = value
+
     def _handle_cross_bind_questionnaires(self, bind_key: str, entries: list) -> None:
         """Pull rows for questionnaires on a non-default bind.
 
@@ -235,6 +254,7 @@ class Results(object):
                 q_class.participantID.in_(known_pids),
             ).all()
 
+            exported = []
             for row in rows:
                 pid = row.participantID
                 if pid not in self.export_data:
@@ -244,12 +264,15 @@ class Results(object):
                 # only this bind's questionnaire.
                 self.export_data[pid].setdefault("participantID", pid)
                 bind_pids.add(pid)
+                exported.append((pid, row))
                 for col_id in field_ids:
                     self.export_data[pid][entry + "_" + col_id] = getattr(row, col_id)
                 for col_id in calc_field_ids:
-                    self.export_data[pid][entry + "_" + col_id] = getattr(row, col_id)()
+                    self.export_data[pid][entry + "_" + col_id] = None
                 self.export_data[pid][entry + "_duration"] = row.duration()
 
+            self._export_calculated_fields(entry, exported)
+
     def handle_custom_exports(self) -> None:
         # Repeated measures in other tables...
         custom_exports = []
@@ -0,0 +1,83 @@
+"""In-memory buffer for ``/user_active`` heartbeats.
+
+Every open participant tab pings ``/user_active`` to keep
+``Participant.lastActiveOn`` fresh. With ``HEARTBEAT_FLUSH_SECONDS`` set,
+the route only records ``participantID -> time of the ping`` in a
+:class:`HeartbeatBuffer`; the first heartbeat after the interval has
+elapsed writes every buffered time back with one executemany ``UPDATE``.
+
+``is_in_progress`` and ``is_abandoned`` are computed in SQL from
+``lastActiveOn``, so anything that reads them flushes the buffer first:
+the admin pages (see ``BOFS/admin/views.py``) and the condition balancer's
+counts. The buffer is also flushed on shutdown. Like the session cache it
+is per-process, so it is only suitable for a single-process deployment.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import bindparam
+
+from BOFS.globals import db
+
+
+class HeartbeatBuffer(object):
+    """Thread-safe map of participantID to the time of their latest
+    heartbeat that hasn't been written to the database yet."""
+
+    def __init__(self, app, flush_interval: float):
+        self.app = app
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def record(self, participant_id, when: datetime) -> None:
+        with self._lock:
+            previous = self._pending.get(participant_id)
+            if previous is None or when > previous:
+                self._pending[participant_id] = when
+
+    def flush_due(self) -> bool:
+        """``True`` when the flush interval has elapsed since the last
+        write-back."""
+        return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def take(self) -> dict:
+        """Remove and return every buffered heartbeat. Resets the flush
+        timer."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        return pending
+
+    def flush(self) -> int:
+        """Write the buffered heartbeats with one executemany ``UPDATE`` and
+        commit. Returns the number of participants written. Requires an app
+        context."""
+        pending = self.take()
+        if not pending:
+            return 0
+        table = db.Participant.__table__
+        # The lastActiveOn guard stops an older heartbeat from overwriting a
+        # page load that track_progress committed after it was buffered.
+        statement = table.update(). \
+            where(table.c.participantID == bindparam('b_participant_id')). \
+            where(table.c.lastActiveOn < bindparam('b_active_on')). \
+            values(lastActiveOn=bindparam('b_active_on'))
+        rows = [{'b_participant_id': pid, 'b_active_on': when} for pid, when in pending.items()]
+        try:
+            db.session.execute(statement, rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception("Failed to write %d participant heartbeat(s)", len(rows))
+            # Keep them for the next flush rather than losing them.
+            for pid, when in pending.items():
+                self.record(pid, when)
+            return 0
+        return len(rows)
@@ -0,0 +1,199 @@
+"""Background writer for questionnaire interaction events.
+
+With ``LOG_QUESTIONNAIRE_INTERACTIONS`` on, a submission can carry hundreds
+of keystroke and click events. When ``INTERACTION_LOG_QUEUE_SIZE`` is
+non-zero, ``handle_submission`` commits the answer row and then hands the
+raw ``questionnaireInteractions`` payload to :class:`InteractionWriter`, whose
+daemon thread parses it and inserts the events into ``bofs_interaction_log``
+in batches of up to ``INTERACTION_LOG_BATCH_SIZE`` rows, one transaction
+per batch.
+
+The queue is bounded. When it is full the submission writes its own events
+on the request thread, as it does with the writer off; the first time that
+happens a warning is added to the setup diagnostics. A batch whose insert
+fails (e.g. SQLite's "database is locked") is retried with a growing delay.
+If every attempt fails its events are lost: they are counted in
+``InteractionWriter.dropped`` and reported as a setup-diagnostics error.
+:meth:`InteractionWriter.stop` drains the queue, and is called on shutdown.
+"""
+
+import atexit
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from BOFS.globals import db
+
+# Seconds to wait before each retry of a batch whose insert failed.
+_RETRY_DELAYS = (0.1, 0.5, 2.0)
+
+
+def parse_interaction_events(raw: str, participant_id, questionnaire_name: str, tag: str, logger) -> list:
+    """Turn a posted ``questionnaireInteractions`` field into
+    ``bofs_interaction_log`` rows (dicts keyed by column name). Events that
+    don't parse are logged to ``logger`` and skipped."""
+    rows = []
+    # Events are newline-delimited JSON (see questionnaire_macro.html):
+    # JSON.stringify escapes literal newlines, so splitting on them is
+    # safe even when a free-text value contains the line separator.
+    for event_str in raw.splitlines():
+        event_str = event_str.strip()
+        if not event_str:
+            continue
+        try:
+            event = json.loads(event_str)
+            rows.append({
+                'participantID': participant_id,
+                'questionnaire': questionnaire_name,
+                'tag': tag,
+                'questionID': event.get('questionID', ''),
+                'eventType': event.get('eventType', ''),
+                'timestamp': datetime.fromtimestamp(float(event['timestamp'])),
+                'value': event.get('value', '') or '',
+            })
+        except Exception:
+            logger.exception("Failed to parse questionnaire interaction event: %r", event_str)
+    return rows
+
+
+def insert_interaction_rows(rows: list) -> None:
+    """Add ``rows`` to the current transaction with one executemany."""
+    if rows:
+        db.session.execute(db.QuestionnaireInteraction.__table__.insert(), rows)
+
+
+class InteractionWriter(object):
+    """Bounded queue of raw interaction payloads and the daemon thread that
+    writes them. ``depth`` is the number of payloads waiting and
+    ``max_depth`` the most there have been at once. ``written`` and
+    ``dropped`` count the events inserted and given up on."""
+
+    def __init__(self, app, max_size: int, batch_size: int):
+        self.app = app
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._warned_full = False
+        self._dropped_diagnostic = None
+        self._exit_hook = False
+        self.max_depth = 0
+        self.written = 0
+        self.dropped = 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="bofs-interaction-writer", daemon=True,
+        )
+        self._thread.start()
+        if not self._exit_hook:
+            self._exit_hook = True
+            atexit.register(self.stop, 5)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Write everything still queued, then stop the thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, raw: str, participant_id, questionnaire_name: str, tag: str) -> bool:
+        """Queue a payload for the writer thread. Returns ``False`` when the
+        queue is full (or the writer stopped) and the caller must write the
+        events itself."""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait((raw, participant_id, questionnaire_name, tag))
+        except queue.Full:
+            self._report_full()
+            return False
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    def _report_full(self) -> None:
+        if self._warned_full:
+            return
+        self._warned_full = True
+        self.app.setup_diagnostics.add(
+            "warning", "interaction_log",
+            f"The interaction log queue filled up ({self._queue.maxsize} submissions); "
+            f"interaction events were written during the submit request instead.",
+            suggestion="Raise INTERACTION_LOG_QUEUE_SIZE or INTERACTION_LOG_BATCH_SIZE.",
+            source="INTERACTION_LOG_QUEUE_SIZE",
+        )
+
+    def _take_batch(self) -> list:
+        """Block briefly for one payload, then take whatever else is queued
+        until the batch holds ``batch_size`` events."""
+        try:
+            payloads = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        events = payloads[0][0].count('\n') + 1
+        while events < self.batch_size:
+            try:
+                payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            payloads.append(payload)
+            events += payload[0].count('\n') + 1
+        return payloads
+
+    def _write(self, payloads: list) -> None:
+        rows = []
+        for raw, participant_id, questionnaire_name, tag in payloads:
+            rows.extend(parse_interaction_events(
+                raw, participant_id, questionnaire_name, tag, self.app.logger))
+        if not rows:
+            return
+        for delay in _RETRY_DELAYS + (None,):
+            with self.app.app_context():
+                try:
+                    insert_interaction_rows(rows)
+                    db.session.commit()
+                    self.written += len(rows)
+                    return
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception(
+                        "Failed to write %d questionnaire interaction event(s)", len(rows))
+            if delay is not None:
+                time.sleep(delay)
+        self._report_dropped(len(rows))
+
+    def _report_dropped(self, count: int) -> None:
+        self.dropped += count
+        message = (f"{self.dropped} questionnaire interaction event(s) could not be written "
+                   f"by the background writer and were lost.")
+        if self._dropped_diagnostic is not None:
+            self._dropped_diagnostic.message = message
+            return
+        self._dropped_diagnostic = self.app.setup_diagnostics.add(
+            "error", "interaction_log", message,
+            suggestion="Check the application log for the database error. Setting "
+                       "INTERACTION_LOG_QUEUE_SIZE to 0 writes events during the submit request.",
+            source="INTERACTION_LOG_QUEUE_SIZE",
+        )
+
+    def _run(self) -> None:
+        while True:
+            payloads = self._take_batch()
+            if payloads:
+                self._write(payloads)
+            elif self._stop.is_set():
+                return
@@ -0,0 +1,211 @@
+"""Background sweeps over tables that otherwise only shrink lazily.
+
+``SessionStore`` rows are removed when their own cookie comes back expired,
+``LoginAttempt`` rows when the same IP fails again, and ``BannedIp`` rows
+never. :class:`MaintenanceScheduler` runs :func:`run_sweep` on a daemon
+thread every ``MAINTENANCE_INTERVAL_MINUTES`` so those tables (and the
+admin results cache file) stay bounded without any request paying for it.
+
+Deletes are issued in batches of ``MAINTENANCE_BATCH_SIZE`` primary keys,
+one short transaction per batch, so a large backlog never holds the SQLite
+write lock long enough to stall participant requests.
+"""
+
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from BOFS.globals import db
+from BOFS.util import utcnow_naive
+
+
+class SweepReport(object):
+    """Row counts removed by one :func:`run_sweep` pass."""
+
+    __slots__ = ("ranAt", "sessions", "bans", "login_attempts", "cache_files", "error")
+
+    def __init__(self):
+        self.ranAt = utcnow_naive()
+        self.sessions = 0
+        self.bans = 0
+        self.login_attempts = 0
+        self.cache_files = 0
+        self.error: Optional[str] = None
+
+    @property
+    def total(self) -> int:
+        return self.sessions + self.bans + self.login_attempts + self.cache_files
+
+    def summary(self) -> str:
+        return (
+            f"{self.sessions} expired session(s), {self.bans} expired ban(s), "
+            f"{self.login_attempts} stale login attempt(s) and "
+            f"{self.cache_files} stale results cache file(s)"
+        )
+
+
+def _delete_in_batches(pk_column, condition, batch_size: int) -> int:
+    """Delete rows matching *condition*, at most *batch_size* per commit.
+
+    Primary keys are selected with ``LIMIT`` and deleted with ``IN``; a
+    ``DELETE ... LIMIT`` (or a ``LIMIT`` inside the ``IN`` sub-select) is
+    not portable across the SQLite, PostgreSQL and MySQL builds BOFS runs
+    on.
+    """
+    removed = 0
+    while True:
+        ids = [row[0] for row in
+               db.session.query(pk_column).filter(condition).limit(batch_size).all()]
+        if not ids:
+            break
+        db.session.query(pk_column.class_).filter(pk_column.in_(ids)) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+        removed += len(ids)
+        if len(ids) < batch_size:
+            break
+    return removed
+
+
+def _remove_stale_results_cache(app) -> int:
+    """Remove ``cached_results.json`` once no ``Results`` can still use it.
+
+    The file holds a per-participant export frame; once it is older than
+    ``MAX_CACHE_SECONDS`` it is rebuilt on the next visit anyway. A second
+    ``MAX_CACHE_SECONDS`` of grace covers a request that decided to use the
+    file just before it aged out.
+    """
+    from BOFS.services.data_export import MAX_CACHE_SECONDS
+
+    cache_path = os.path.join(app.root_path, 'cached_results.json')
+    try:
+        age = time.time() - os.path.getmtime(cache_path)
+    except OSError:
+        return 0
+    if age < 2 * MAX_CACHE_SECONDS:
+        return 0
+    try:
+        os.remove(cache_path)
+    except OSError:
+        return 0
+    return 1
+
+
+def run_sweep(app) -> SweepReport:
+    """Run one maintenance pass and record it on ``app.maintenance_report``.
+
+    Must be called inside an application context. Database errors are
+    rolled back and logged; the report's ``error`` carries the message so
+    the admin diagnostics show that the sweep is failing.
+    """
+    report = SweepReport()
+    config = app.config
+    batch_size = config.get('MAINTENANCE_BATCH_SIZE', 500)
+    now = utcnow_naive()
+
+    try:
+        report.sessions = _delete_in_batches(
+            db.SessionStore.sessionID,
+            db.SessionStore.expiry < now,
+            batch_size,
+        )
+
+        # Expired bans still count toward the progressive ban schedule, so
+        # keep them for MAINTENANCE_BAN_RETENTION_DAYS after they lapse.
+        retention = config.get('MAINTENANCE_BAN_RETENTION_DAYS', 30)
+        report.bans = _delete_in_batches(
+            db.BannedIp.id,
+            db.BannedIp.expiresAt < now - timedelta(days=retention),
+            batch_size,
+        )
+
+        window = config.get('BRUTE_FORCE_WINDOW_MINUTES', 15)
+        report.login_attempts = _delete_in_batches(
+            db.LoginAttempt.id,
+            db.LoginAttempt.attemptedAt < now - timedelta(minutes=window),
+            batch_size,
+        )
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        report.error = str(e).splitlines()[0] if str(e) else type(e).__name__
+        app.logger.exception("Maintenance sweep failed")
+
+    report.cache_files = _remove_stale_results_cache(app)
+
+    if report.total:
+        app.logger.info("Maintenance sweep removed %s.", report.summary())
+
+    app.maintenance_report = report
+    _report_to_diagnostics(app, report)
+    return report
+
+
+def _report_to_diagnostics(app, report: SweepReport) -> None:
+    """Replace the previous sweep's entry in the setup diagnostics so the
+    admin panel always shows the most recent pass."""
+    diagnostics = app.setup_diagnostics
+    diagnostics.remove_by_category("maintenance")
+    ran_at = report.ranAt.strftime('%Y-%m-%d %H:%M UTC')
+    if report.error is not None:
+        diagnostics.add(
+            "warning", "maintenance",
+            f"The maintenance sweep at {ran_at} failed: {report.error}",
+            suggestion="Check the server log for the full traceback.",
+            source="MAINTENANCE_INTERVAL_MINUTES",
+            log=False,
+        )
+    else:
+        diagnostics.add(
+            "info", "maintenance",
+            f"The maintenance sweep at {ran_at} removed {report.summary()}.",
+            source="MAINTENANCE_INTERVAL_MINUTES",
+            log=False,
+        )
+
+
+class MaintenanceScheduler(object):
+    """Daemon thread that calls :func:`run_sweep` on a fixed cadence.
+
+    The first sweep runs as soon as the thread starts, which clears any
+    backlog left by a previous run of the server.
+    """
+
+    def __init__(self, app, interval_seconds: float):
+        self.app = app
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="bofs-maintenance", daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    run_sweep(self.app)
+                except Exception:
+                    # Never let one bad pass kill the thread; the next
+                    # interval gets another try.
+                    self.app.logger.exception("Maintenance sweep failed")
+            self._stop.wait(self.interval_seconds)
@@ -1,12 +1,16 @@
-import os
-import json
-import pprint
+import copy
 import traceback
 from datetime import datetime
-from flask import current_app, request, session, render_template
+from flask import Response, current_app, request, session, render_template, stream_template
 
 from ..globals import db
 from ..util import utcnow_naive
+from .interaction_writer import insert_interaction_rows, parse_interaction_events
+
+
+# Streamed questionnaire pages are sent in pieces of at least this many
+# characters, so Jinja's many small fragments don't each become a write.
+_STREAM_CHUNK_SIZE = 8192
 
 
 class ParticipantQuestionnaireService:
@@ -17,13 +21,18 @@ class ParticipantQuestionnaireService:
         self.participant_id = participant_id
 
     def handle_submission(self, questionnaire, tag: str = "") -> None:
+        """Store the posted answers, and any logged interaction events, in a
+        single transaction. With ``INTERACTION_LOG_QUEUE_SIZE`` set, the
+        events are queued for the background writer instead (see
+        ``BOFS/services/interaction_writer.py``)."""
         # Check to see if the user has submitted this once already. If
         # multiple prior rows exist (legacy data, or a fix-and-resubmit
         # workflow), use the most recent rather than inserting yet another.
+        # Two rows are enough to tell whether that's the case.
         previous = db.session.query(questionnaire.db_class).filter(
             questionnaire.db_class.participantID == self.participant_id,
             questionnaire.db_class.tag == tag
-        ).order_by(questionnaire.db_class.timeEnded.desc()).all()
+        ).order_by(questionnaire.db_class.timeEnded.desc()).limit(2).all()
 
         if previous:
             new_object = previous[0]
@@ -58,31 +67,15 @@ class ParticipantQuestionnaireService:
 
         fields = questionnaire.fetch_fields()
 
+        interactions = []
+        raw = ''
+        writer = None
         if current_app.config.get('LOG_QUESTIONNAIRE_INTERACTIONS', False):
             raw = request.form.get('questionnaireInteractions', '')
-            # Events are newline-delimited JSON (see questionnaire_macro.html):
-            # JSON.stringify escapes literal newlines, so splitting on them is
-            # safe even when a free-text value contains the line separator.
-            for event_str in raw.splitlines():
-                event_str = event_str.strip()
-                if not event_str:
-                    continue
-                try:
-                    event = json.loads(event_str)
-                    interaction = db.QuestionnaireInteraction()
-                    interaction.participantID = self.participant_id
-                    interaction.questionnaire = questionnaire.file_name
-                    interaction.tag = tag
-                    interaction.questionID = event.get('questionID', '')
-                    interaction.eventType = event.get('eventType', '')
-                    interaction.timestamp = datetime.fromtimestamp(float(event['timestamp']))
-                    interaction.value = event.get('value', '') or ''
-                    db.session.add(interaction)
-                except Exception:
-                    current_app.logger.exception(
-                        "Failed to parse questionnaire interaction event: %r", event_str
-                    )
-            db.session.commit()
+            writer = current_app.get_interaction_writer() if raw.strip() else None
+            if writer is None:
+                interactions = parse_interaction_events(
+                    raw, self.participant_id, questionnaire.file_name, tag, current_app.logger)
 
         for field in fields:
             try:
@@ -117,26 +110,20 @@ class ParticipantQuestionnaireService:
         setattr(new_object, 'tag', tag)
 
         db.session.add(new_object)
+        # One executemany rather than an ORM object per event.
+        insert_interaction_rows(interactions)
         db.session.commit()
 
-        if 'ENABLE_LOGGING' in current_app.config and current_app.config['ENABLE_LOGGING'] == True:
-            log_dir = "logs"
-            if not os.path.exists(log_dir):
-                os.makedirs(log_dir)
-            # file_name comes from researcher-authored JSON; basename strips
-            # any '/' or '..' that could escape the logs directory.
-            safe_name = os.path.basename(questionnaire.file_name)
-            formatted = pprint.pformat(request.form)
-            MAX_LOG_BYTES = 64 * 1024
-            if len(formatted) > MAX_LOG_BYTES:
-                formatted = (
-                    formatted[:MAX_LOG_BYTES]
-                    + f"\n... (truncated; original length {len(formatted)} bytes)"
-                )
-            with open(os.path.join(log_dir, safe_name + ".txt"), "a+", encoding="utf-8") as f:
-                f.write(
-                    f"Time = {timeStarted}; pID = {self.participant_id};\n{formatted}\n\n"
-                )
+        # Queued only once the answers are saved, so a failed submission
+        # leaves no events behind. A full queue means writing them here.
+        if writer is not None and not writer.submit(raw, self.participant_id, questionnaire.file_name, tag):
+            insert_interaction_rows(parse_interaction_events(
+                raw, self.participant_id, questionnaire.file_name, tag, current_app.logger))
+            db.session.commit()
+
+        submission_log = current_app.get_submission_log()
+        if submission_log is not None:
+            submission_log.log(self.participant_id, questionnaire.file_name, tag, timeStarted, request.form)
 
     def fetch_prior_values(self, questionnaire, tag: str = "") -> dict:
         """Return {field_id: stored_value} for this participant's prior submission of this
@@ -153,19 +140,20 @@ class ParticipantQuestionnaireService:
         fields = questionnaire.fetch_fields()
         return {f.id: getattr(previous, f.id) for f in fields}
 
-    def render_questionnaire(self, questionnaire, template_name: str = 'questionnaire.html', tag: str = "") -> str:
+    def render_questionnaire(self, questionnaire, template_name: str = 'questionnaire.html', tag: str = ""):
+        """Render ``questionnaire`` for this participant: the page as a
+        string, or a streamed response when ``STREAM_QUESTIONNAIRES`` is on."""
         from ..expressions import substitute_in_questionnaire
         prior_values = self.fetch_prior_values(questionnaire, tag)
-        participant = (
-            db.session.get(db.Participant, self.participant_id)
-            if self.participant_id is not None else None
-        )
-        json_data = (
-            substitute_in_questionnaire(questionnaire.json_data, participant)
-            if participant is not None else questionnaire.json_data
-        )
+        json_data = questionnaire.json_data
+        index = questionnaire.substitution_index
+        if index and self.participant_id is not None:
+            participant = db.session.get(db.Participant, self.participant_id)
+            if participant is not None:
+                json_data = substitute_in_questionnaire(json_data, participant, index)
         return ParticipantQuestionnaireService.render_unloaded_questionnaire(
-            json_data, template_name, tag, prior_values=prior_values)
+            json_data, template_name, tag, prior_values=prior_values,
+            questionnaire=questionnaire, stream=current_app.config.get('STREAM_QUESTIONNAIRES', False))
 
     @staticmethod
     def _inject_prior_values(question_data: dict, prior_values: dict) -> dict:
@@ -173,7 +161,8 @@ class ParticipantQuestionnaireService:
         from prior_values, for the question and any sub-questions in `questions`/`q_text`.
         Templates check `has_value` to decide whether to prefill — that flag handles values
         that are legitimately falsy (0, empty string) without leaking that detail into the
-        template. Returns the input unchanged when prior_values is empty."""
+        template. Returns the input itself when no prior value applies to it, which the
+        fragment cache relies on to tell untouched questions apart."""
         if not prior_values:
             return question_data
 
@@ -230,73 +219,199 @@ class ParticipantQuestionnaireService:
                     new_subs.append(s)
                 else:
                     new_subs.append(sub)
-            q[sub_key] = new_subs
+            if any(new is not old for new, old in zip(new_subs, subs)):
+                q[sub_key] = new_subs
 
+        if len(q) == len(question_data) and all(q[k] is question_data[k] for k in q):
+            return question_data
         return q
 
     @staticmethod
     def render_questionnaire_question(question_type: str, question_data: dict) -> str:
+        return ParticipantQuestionnaireService._render_question(question_type, question_data)[0]
+
+    @staticmethod
+    def _require_participant() -> None:
         if 'participantID' not in session:
             raise Exception('Error: No participantID in session. Did you forget /consent or /create_participant, etc.?')
 
+    @staticmethod
+    def _render_question(question_type: str, question_data: dict) -> tuple[str, bool]:
+        """Render one question template. Returns ``(html, ok)``; ``ok`` is
+        False when the template raised and ``html`` is the inline error."""
+        ParticipantQuestionnaireService._require_participant()
         participant = db.session.get(db.Participant, session['participantID'])
 
         try:
             return render_template(f'questions/{question_type}.html',
                                    question=question_data,
-                                   participant=participant)
+                                   participant=participant), True
         except Exception as ex:
             if current_app.run_with_debugging:
                 debugging_info = str(ex) + "<p><pre>" + str(traceback.format_exc()) + "</pre>"
             else:
                 debugging_info = str(ex)
 
-            return f"Exception in <b>{question_type}.html</b>: {debugging_info}"
+            return f"Exception in <b>{question_type}.html</b>: {debugging_info}", False
 
     @staticmethod
-    def render_unloaded_questionnaire(json_data: dict, template_name='questionnaire.html', tag="", prior_values: dict = None, **kwargs):
-        questions_html = []
-        prior_values = prior_values or {}
-
-        # Render the HTML for each question. For groups, pre-render each
-        # sub-question through the same render_questionnaire_question path
-        # used for top-level questions — this is what gets each sub the
-        # per-question try/except wrapper and the explicit ``participant``
-        # kwarg. The pre-rendered strings are stashed on the group's dict
-        # under ``_sub_html`` (parallel to ``questions``) and the group
-        # template splices them in by loop index, mirroring how the outer
-        # macro consumes ``q_html``.
-        for question_data in json_data['questions']:
-            injected = ParticipantQuestionnaireService._inject_prior_values(question_data, prior_values)
-
-            if injected.get('questiontype') == 'group':
-                sub_html = []
-                for sub in injected.get('questions', []) or []:
-                    sub_type = sub.get('questiontype') if isinstance(sub, dict) else None
-                    if sub_type == 'group' or not isinstance(sub_type, str):
-                        # Validation rejects nested groups; if one slips
-                        # through, surface it inline rather than crashing
-                        # the whole group render.
-                        sub_html.append(
-                            '<div class="bofs-error">Invalid sub-question '
-                            'inside group.</div>'
-                        )
-                    else:
-                        sub_html.append(
-                            ParticipantQuestionnaireService.render_questionnaire_question(
-                                sub_type, sub
-                            )
-                        )
-                injected = dict(injected)
-                injected['_sub_html'] = sub_html
-
-            question_html = ParticipantQuestionnaireService.render_questionnaire_question(
-                injected['questiontype'], injected)
-            questions_html.append(question_html)
-
-        return render_template(template_name,
-                               **kwargs,
-                               tag=tag,
-                               q=json_data,
-                               q_html=questions_html,
-                               timeStarted=utcnow_naive())
+    def _render_question_with_subs(question_data: dict) -> tuple[str, bool]:
+        """Render a top-level question; for groups, pre-render each
+        sub-question through the same :meth:`_render_question` path used
+        for top-level questions — this is what gets each sub the
+        per-question try/except wrapper and the explicit ``participant``
+        kwarg. The pre-rendered strings are stashed on a copy of the
+        group's dict under ``_sub_html`` (parallel to ``questions``) and
+        the group template splices them in by loop index, mirroring how the
+        outer macro consumes ``q_html``. ``ok`` is False if any template
+        raised."""
+        ok = True
+        if question_data.get('questiontype') == 'group':
+            sub_html = []
+            for sub in question_data.get('questions', []) or []:
+                sub_type = sub.get('questiontype') if isinstance(sub, dict) else None
+                if sub_type == 'group' or not isinstance(sub_type, str):
+                    # Validation rejects nested groups; if one slips
+                    # through, surface it inline rather than crashing
+                    # the whole group render.
+                    sub_html.append(
+                        '<div class="bofs-error">Invalid sub-question '
+                        'inside group.</div>'
+                    )
+                else:
+                    html, sub_ok = ParticipantQuestionnaireService._render_question(sub_type, sub)
+                    sub_html.append(html)
+                    ok = ok and sub_ok
+            question_data = dict(question_data)
+            question_data['_sub_html'] = sub_html
+
+        html, question_ok = ParticipantQuestionnaireService._render_question(
+            question_data['questiontype'], question_data)
+        return html, ok and question_ok
+
+    @staticmethod
+    def _is_shuffled(question_data: dict) -> bool:
+        """``True`` when the question, or a sub-question of a group, sets
+        ``shuffle``. Its template shuffles its option list in place."""
+        if question_data.get('shuffle'):
+            return True
+        if question_data.get('questiontype') == 'group':
+            subs = question_data.get('questions') or []
+            return any(isinstance(sub, dict) and sub.get('shuffle') for sub in subs)
+        return False
+
+    @staticmethod
+    def _fragment_templates(question_data: dict):
+        """The compiled templates a question renders with, or ``None`` when
+        its HTML can differ between renders (``shuffle``) or a template is
+        missing. Jinja hands back a new template object once a template
+        file changes on disk (with template auto-reload on), so comparing
+        these objects invalidates cached fragments like a modification
+        time would."""
+        if ParticipantQuestionnaireService._is_shuffled(question_data):
+            return None
+        types = [question_data.get('questiontype')]
+        if types[0] == 'group':
+            subs = question_data.get('questions') or []
+            types += [sub.get('questiontype') for sub in subs if isinstance(sub, dict)]
+        try:
+            return tuple(
+                current_app.jinja_env.get_template(f'questions/{question_type}.html')
+                for question_type in types if isinstance(question_type, str)
+            )
+        except Exception:
+            return None
+
+    @staticmethod
+    def render_unloaded_questionnaire(json_data: dict, template_name='questionnaire.html', tag="", prior_values: dict = None,
+                                      questionnaire=None, stream=False, **kwargs):
+        """Render a questionnaire page from ``json_data``.
+
+        :param questionnaire: the :class:`JSONQuestionnaire` ``json_data``
+            was derived from. With ``QUESTION_FRAGMENT_CACHE`` on, the HTML
+            of each question neither prior values nor ``{{ }}`` substitution
+            changed (it is still the very dict in ``questionnaire.json_data``)
+            is cached on the questionnaire and reused.
+        :param stream: return a streamed :class:`Response` that renders each
+            question as the template reaches it, instead of rendering every
+            question up front and returning the page as a string.
+        """
+        q_html = _QuestionHtml(json_data, tag, prior_values or {}, questionnaire)
+        context = dict(kwargs, tag=tag, q=json_data, timeStarted=utcnow_naive())
+
+        if stream:
+            chunks = stream_template(template_name, q_html=q_html, **context)
+            return Response(_buffered(chunks, _STREAM_CHUNK_SIZE), mimetype='text/html')
+
+        return render_template(template_name, q_html=list(q_html), **context)
+
+
+class _QuestionHtml(object):
+    """``q_html`` for the questionnaire templates: a sequence whose item
+    *i* is the rendered HTML of question *i*, produced on first access.
+
+    Prior values are injected per question, and questions untouched by
+    both prior values and substitution are served from the
+    questionnaire's fragment cache when ``QUESTION_FRAGMENT_CACHE`` is on.
+    """
+
+    def __init__(self, json_data: dict, tag: str, prior_values: dict, questionnaire=None):
+        self.questions = json_data['questions']
+        self.tag = tag
+        self.prior_values = prior_values
+        self.cache = None
+        if questionnaire is not None and current_app.config.get('QUESTION_FRAGMENT_CACHE'):
+            self.cache = questionnaire.fragment_cache
+            self.source_questions = questionnaire.json_data['questions']
+        self._html = {}
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __iter__(self):
+        for index in range(len(self.questions)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        if index not in self._html:
+            self._html[index] = self._render(index)
+        return self._html[index]
+
+    def _render(self, index):
+        # A cached fragment must not let a request without a participant
+        # through where rendering the question would have refused it.
+        ParticipantQuestionnaireService._require_participant()
+        injected = ParticipantQuestionnaireService._inject_prior_values(self.questions[index], self.prior_values)
+
+        templates = None
+        if self.cache is not None and index < len(self.source_questions) and injected is self.source_questions[index]:
+            templates = ParticipantQuestionnaireService._fragment_templates(injected)
+        if templates is not None:
+            cached = self.cache.get((index, self.tag))
+            if cached is not None and cached[0] == templates:
+                return cached[1]
+
+        if ParticipantQuestionnaireService._is_shuffled(injected):
+            # The lists the template shuffles are still the cached
+            # questionnaire's own; give this render its own copy.
+            injected = copy.deepcopy(injected)
+        question_html, ok = ParticipantQuestionnaireService._render_question_with_subs(injected)
+        if templates is not None and ok:
+            self.cache[(index, self.tag)] = (templates, question_html)
+        return question_html
+
+
+def _buffered(chunks, size):
+    """Join an iterable of strings into pieces of at least ``size``
+    characters (the last may be shorter)."""
+    pending = []
+    length = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(pending)
+            pending = []
+            length = 0
+    if pending:
+        yield ''.join(pending)
@@ -1,11 +1,87 @@
 from urllib.parse import urlsplit
 
-from flask import current_app, redirect, render_template, request, session
+from flask import current_app, g, has_app_context, redirect, render_template, request, session
+from sqlalchemy import update
 
 from BOFS.globals import db
 from BOFS.util import utcnow_naive
 
 
+def _upsert_progress(participant_id, path, occurrence, started_on, submitted_on=None):
+    """Insert the ``Progress`` row for *(participant_id, path, occurrence)*,
+    or, when it exists, leave it alone (``submitted_on`` is ``None``) or
+    set its ``submittedOn``. One statement on SQLite, PostgreSQL and
+    MySQL/MariaDB; other dialects look the row up first."""
+    table = db.Progress.__table__
+    values = dict(participantID=participant_id, path=path, occurrence=occurrence,
+                  startedOn=started_on, submittedOn=submitted_on)
+    dialect = db.session.get_bind(mapper=db.Progress).dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(**values)
+        key = [table.c.participantID, table.c.path, table.c.occurrence]
+        if submitted_on is None:
+            stmt = stmt.on_conflict_do_nothing(index_elements=key)
+        else:
+            stmt = stmt.on_conflict_do_update(index_elements=key, set_={'submittedOn': submitted_on})
+        db.session.execute(stmt)
+        return
+
+    if dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(**values)
+        # Assigning submittedOn to itself is MySQL's "do nothing".
+        stmt = stmt.on_duplicate_key_update(
+            submittedOn=submitted_on if submitted_on is not None else table.c.submittedOn)
+        db.session.execute(stmt)
+        return
+
+    progress = db.session.get(db.Progress, (participant_id, path, occurrence))
+    if progress is None:
+        db.session.add(db.Progress(**values))
+    elif submitted_on is not None:
+        progress.submittedOn = submitted_on
+    db.session.flush()
+
+
+def flush_tracked_progress():
+    """Run the writes :meth:`ParticipantRoutingService.track_progress`
+    staged in ``g`` into the current transaction: refresh ``lastActiveOn``
+    and upsert the ``Progress`` row, skipping participants whose row was
+    cleared mid-flow."""
+    for participant_id, path, occurrence, now, submitted_on in g.pop('bofs_tracked_progress', ()):
+        touched = db.session.execute(
+            update(db.Participant)
+            .where(db.Participant.participantID == participant_id)
+            .values(lastActiveOn=now)
+        )
+        if touched.rowcount:
+            _upsert_progress(participant_id, path, occurrence, now, submitted_on)
+
+
+def write_tracked_progress(session):
+    """``before_commit`` listener: the first commit after
+    :meth:`ParticipantRoutingService.track_progress` carries its writes."""
+    if has_app_context() and 'bofs_tracked_progress' in g:
+        flush_tracked_progress()
+
+
+def commit_tracked_progress(response):
+    """Commit what :meth:`ParticipantRoutingService.track_progress` staged
+    when nothing committed after it. Called by ``BOFSFlask.process_response``
+    once the session is saved. Error responses drop it, as the request's
+    rollback would."""
+    if 'bofs_tracked_progress' in g:
+        if response.status_code < 500:
+            db.session.commit()
+        g.pop('bofs_tracked_progress', None)
+    return response
+
+
 class ParticipantRoutingService:
     """Owns participant navigation: page resolution, ``session['currentUrl']``
     writes, progress tracking, and redirect-URL construction.
@@ -59,18 +135,18 @@ class ParticipantRoutingService:
         first matching path, then to the first page, when the cursor pair
         is stale (e.g. a PAGE_LIST edit removed the entry).
         """
-        flat = self.page_list.flat_page_list()
-        annotated = self.page_list.annotate_occurrences(flat)
+        navigation = self.page_list.navigation()
         target_path = self.session.get('currentUrl')
         target_occ = self.session.get('currentOccurrence', 0) or 0
-        for i, (entry, occ) in enumerate(annotated):
-            if entry['path'] == target_path and occ == target_occ:
-                return entry, occ, i
-        for i, (entry, occ) in enumerate(annotated):
-            if entry['path'] == target_path:
-                return entry, occ, i
-        first = annotated[0] if annotated else None
-        return (first[0], first[1], 0) if first else (None, 0, 0)
+        index = navigation.index_of(target_path, target_occ)
+        if index is None:
+            index = navigation.index_of(target_path)
+        if index is None:
+            if not navigation.annotated:
+                return None, 0, 0
+            index = 0
+        entry, occ = navigation.annotated[index]
+        return entry, occ, index
 
     # ----- Navigation --------------------------------------------------
 
@@ -88,8 +164,7 @@ class ParticipantRoutingService:
 
         self.close_progress(entry['path'])
 
-        flat = self.page_list.flat_page_list()
-        annotated = self.page_list.annotate_occurrences(flat)
+        annotated = self.page_list.navigation().annotated
 
         if index + 1 < len(annotated):
             next_entry, next_occ = annotated[index + 1]
@@ -145,20 +220,17 @@ class ParticipantRoutingService:
     def go_to(self, path):
         """Set the cursor to the first matching ``(path, occurrence)`` in
         the flat list and redirect there."""
-        flat = self.page_list.flat_page_list()
-        annotated = self.page_list.annotate_occurrences(flat)
-        for entry, occ in annotated:
-            if entry['path'] == path:
-                self.session["currentUrl"] = path
-                self.session["currentOccurrence"] = occ
-                break
+        navigation = self.page_list.navigation()
+        index = navigation.index_of(path)
+        if index is not None:
+            self.session["currentUrl"] = path
+            self.session["currentOccurrence"] = navigation.annotated[index][1]
         return redirect(self.application_root + "/" + self.session["currentUrl"])
 
     def go_back(self):
         """Move the cursor one step back in the flat list and redirect."""
         entry, occ, index = self.current_entry()
-        flat = self.page_list.flat_page_list()
-        annotated = self.page_list.annotate_occurrences(flat)
+        annotated = self.page_list.navigation().annotated
         if index > 0:
             prev_entry, prev_occ = annotated[index - 1]
             self.session["currentUrl"] = prev_entry['path']
@@ -314,39 +386,26 @@ class ParticipantRoutingService:
         Occurrence is resolved from the session cursor
         (``session['currentOccurrence']``).
 
-        No-ops when there is no participant in session or the participant
-        row was cleared mid-flow.
+        Nothing is written here. The values are staged in ``g`` and
+        written just before the request's next commit (see
+        ``write_tracked_progress``), or by the commit ``BOFSFlask`` issues
+        after the view when the view doesn't commit (see
+        ``commit_tracked_progress``). Writing at request start would hold
+        SQLite's write lock through the whole view and template render.
+        The ``Progress`` row is written with one upsert on its
+        ``(participantID, path, occurrence)`` primary key.
+
+        No-ops when there is no participant in session; skipped at write
+        time when the participant row was cleared mid-flow.
         """
         if "participantID" not in self.session:
             return
 
-        participant = db.session.get(db.Participant, self.session["participantID"])
-        if participant is None:
-            return
-
-        participant.lastActiveOn = utcnow_naive()
-        db.session.commit()
-
+        now = utcnow_naive()
         occurrence = self.session.get('currentOccurrence', 0) or 0
-
-        progress = db.session.query(db.Progress).filter(
-            db.Progress.participantID == self.session["participantID"],
-            db.Progress.path == path,
-            db.Progress.occurrence == occurrence,
-        ).one_or_none()
-
-        if progress is None:
-            progress = db.Progress()
-            progress.participantID = self.session["participantID"]
-            progress.path = path
-            progress.occurrence = occurrence
-            progress.startedOn = utcnow_naive()
-            db.session.add(progress)
-            db.session.commit()
-
-        if request.method == "POST":
-            progress.submittedOn = utcnow_naive()
-            db.session.commit()
+        submitted_on = now if request.method == "POST" else None
+        g.setdefault('bofs_tracked_progress', []).append(
+            [self.session["participantID"], path, occurrence, now, submitted_on])
 
     def close_progress(self, path):
         """Close out the participant's Progress row for *path* at the
@@ -363,6 +422,16 @@ class ParticipantRoutingService:
 
         occurrence = self.session.get('currentOccurrence', 0) or 0
 
+        # A row track_progress staged this request hasn't been written yet;
+        # close it in the staged values instead.
+        staged = False
+        for entry in g.get('bofs_tracked_progress', ()):
+            if entry[:3] == [self.session["participantID"], path, occurrence]:
+                entry[4] = entry[4] or utcnow_naive()
+                staged = True
+        if staged:
+            return
+
         progress = db.session.query(db.Progress).filter(
             db.Progress.participantID == self.session["participantID"],
             db.Progress.path == path,
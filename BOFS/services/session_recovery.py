@@ -71,6 +71,10 @@ class SessionRecoveryService:
                 # the existing ``session['currentUrl']`` and verify_correct_page
                 # would redirect them straight back to the blocked URL.
                 dict_data = BOFSSessionInterface.serializer.loads(session_rows[0].data)
+                if 'currentUrl' not in dict_data:
+                    SessionRecoveryService._restore_cursor_from_progress(
+                        dict_data, session_rows[0].participantID,
+                    )
                 recovered_url = dict_data.get('currentUrl')
                 if recovered_url and recovered_url in SessionRecoveryService._LOOP_BLOCKED_PATHS:
                     return None
@@ -98,6 +102,9 @@ class SessionRecoveryService:
     @staticmethod
     def _find_past_session_rows(mturk_id: str, current_pid: int):
         """SessionStore rows for mturk_id excluding the current participant, newest first."""
+        # Sessions held dirty in the in-process cache haven't reached their
+        # rows yet; write them back so the lookup sees current data.
+        current_app.session_interface.flush(current_app)
         return (
             db.session.query(db.SessionStore)
             .filter(
@@ -127,6 +134,22 @@ class SessionRecoveryService:
 
         return query.all()
 
+    @staticmethod
+    def _restore_cursor_from_progress(dict_data: dict, participant_id: int) -> None:
+        """Rows mirrored by the cookie session backend carry only the
+        recovery keys, not the page cursor. Rebuild ``currentUrl`` /
+        ``currentOccurrence`` from the participant's most recently started
+        ``Progress`` row, which track_progress writes for every page."""
+        latest = (
+            db.session.query(db.Progress)
+            .filter(db.Progress.participantID == participant_id)
+            .order_by(db.desc(db.Progress.startedOn))
+            .first()
+        )
+        if latest is not None:
+            dict_data['currentUrl'] = latest.path
+            dict_data['currentOccurrence'] = latest.occurrence
+
     @staticmethod
     def _apply_session_dict(dict_data: dict) -> None:
         """Write each key from a pre-deserialised SessionStore.data dict into
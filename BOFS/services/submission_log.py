@@ -0,0 +1,133 @@
+"""JSONL log of questionnaire submissions (``ENABLE_LOGGING``).
+
+Every submission is appended to ``logs/submissions.jsonl`` in the project
+directory as one JSON object per line, so answers can be recovered from
+the log even when the database can't be used:
+
+    {"loggedAt": "2026-01-01T12:00:00.000001", "participantID": 12,
+     "questionnaire": "survey", "tag": "", "timeStarted": "2026-01-01 11:58:10",
+     "form": {"age": "30", ...}}
+
+A request only copies the form into a log record and puts it on a queue
+(:class:`logging.handlers.QueueHandler`); a :class:`~logging.handlers.QueueListener`
+thread serialises it and writes the file. The file rotates once it reaches
+``SUBMISSION_LOG_MAX_BYTES``, or on the ``SUBMISSION_LOG_WHEN`` schedule
+when that is set, keeping ``SUBMISSION_LOG_BACKUP_COUNT`` old files, which
+are gzipped when ``SUBMISSION_LOG_GZIP`` is on.
+"""
+
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+
+from BOFS.util import utcnow_naive
+
+
+LOG_FILE_NAME = "submissions.jsonl"
+
+# Longest form value written in full; longer ones are cut, with a note of
+# their original length, so one runaway field can't bloat the log.
+MAX_VALUE_CHARS = 64 * 1024
+
+
+class _JSONLineFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.msg, ensure_ascii=False, default=str)
+
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """Queue records as they are. The stock ``prepare`` formats the record
+    on the calling thread, which is the work this log keeps off requests."""
+
+    def prepare(self, record):
+        return record
+
+
+def _gzip_namer(name):
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _truncate(value):
+    if isinstance(value, str) and len(value) > MAX_VALUE_CHARS:
+        return value[:MAX_VALUE_CHARS] + f"... (truncated; original length {len(value)} characters)"
+    return value
+
+
+class SubmissionLog(object):
+    """The queue, the rotating file handler and the listener thread that
+    connects them. Create it with :meth:`BOFSFlask.get_submission_log`."""
+
+    def __init__(self, app):
+        config = app.config
+        log_dir = os.path.join(app.root_path, "logs")
+        os.makedirs(log_dir, exist_ok=True)
+        self.path = os.path.join(log_dir, LOG_FILE_NAME)
+
+        backup_count = config.get('SUBMISSION_LOG_BACKUP_COUNT', 10)
+        if config.get('SUBMISSION_LOG_WHEN'):
+            handler = logging.handlers.TimedRotatingFileHandler(
+                self.path, when=config['SUBMISSION_LOG_WHEN'], backupCount=backup_count,
+                encoding="utf-8", utc=True, delay=True)
+        else:
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=config.get('SUBMISSION_LOG_MAX_BYTES', 10 * 1024 * 1024),
+                backupCount=backup_count, encoding="utf-8", delay=True)
+        if config.get('SUBMISSION_LOG_GZIP'):
+            handler.namer = _gzip_namer
+            handler.rotator = _gzip_rotator
+        handler.setFormatter(_JSONLineFormatter())
+        self.handler = handler
+
+        self._queue = queue.Queue()
+        self._listener = logging.handlers.QueueListener(self._queue, handler)
+
+        # Not registered with logging.getLogger(), so it has no parent:
+        # submissions never reach app.logger's handlers (or the console)
+        # and nothing else reaches this file.
+        self.logger = logging.Logger("BOFS.submissions", logging.INFO)
+        self.logger.addHandler(_RecordQueueHandler(self._queue))
+        self._started = False
+
+    def start(self) -> None:
+        if self._started:
+            return
+        self._listener.start()
+        self._started = True
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Write every queued entry, then stop the listener thread and close
+        the file."""
+        if not self._started:
+            return
+        self._started = False
+        self._listener.stop()
+        self.handler.close()
+
+    def log(self, participant_id, questionnaire_name: str, tag: str, time_started, form) -> None:
+        """Queue one submission. ``form`` is the request's form
+        (a :class:`~werkzeug.datastructures.MultiDict`); repeated keys are
+        logged as lists."""
+        fields = {}
+        for key, values in form.lists():
+            values = [_truncate(v) for v in values]
+            fields[key] = values[0] if len(values) == 1 else values
+        self.logger.info({
+            "loggedAt": utcnow_naive().isoformat(),
+            "participantID": participant_id,
+            "questionnaire": questionnaire_name,
+            "tag": tag,
+            "timeStarted": time_started,
+            "form": fields,
+        })
@@ -65,6 +65,8 @@ CATEGORY_TO_SECTION = {
     "asset":            SECTION_QUESTIONNAIRES,
     "table":            SECTION_TABLES,
     "schema":           SECTION_DATABASE,
+    "maintenance":      SECTION_DATABASE,
+    "interaction_log":  SECTION_DATABASE,
     "route":            SECTION_BLUEPRINTS,
 }
 
@@ -81,6 +83,8 @@ CATEGORY_SUBHEADING = {
     "security":         "Security",
     "update":           "Framework update",
     "schema":           "Schema mismatches",
+    "maintenance":      "Maintenance",
+    "interaction_log":  "Interaction log",
     "route":            "Routes",
     "asset":            "Missing assets",
     # ``questionnaire`` / ``table`` deliberately have no entry — those
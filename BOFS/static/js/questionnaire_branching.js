@@ -2,11 +2,16 @@
  * Conditional question display ("show_if") for BOFS questionnaires.
  *
  * Each question whose JSON definition includes a `show_if` predicate is
- * rendered with class="bofs-conditional" and a `data-show-if` attribute
- * holding the parsed AST as JSON. On page load this script extracts the
- * referenced field IDs from each AST, attaches change/input listeners to
- * those inputs, and toggles the question's `.bofs-hidden` class plus any
- * `required`/`disabled` state on its inputs whenever the predicate flips.
+ * rendered with class="bofs-conditional", a `data-show-if` attribute
+ * holding the parsed AST as JSON and its question index in
+ * `data-show-if-index`. The server also emits a
+ * `#bofs-show-if-dependencies` JSON map from field ID to the indices of the
+ * questions whose predicate reads it. An input event re-evaluates only the
+ * questions that map lists for the changed field, reading each field they
+ * reference once per event, and toggles the question's `.bofs-hidden`
+ * class plus any `required` state on its inputs when the predicate flips.
+ * Without the map (custom templates), field IDs are collected from the
+ * ASTs here instead.
  *
  * Depends on bofs_expressions.js providing window.BOFSExpr.
  */
@@ -19,7 +24,7 @@
     }
 
     var truthy = window.BOFSExpr.truthy;
-    var conditionals = [];        // {el, ast, fields}
+    var conditionals = [];        // {el, ast, fields, visible}
     var fieldIndex = {};          // fieldId -> [conditional, ...]
 
     function collectVarNames(node, out) {
@@ -96,16 +101,20 @@
             });
         };
 
-    function buildEnv(fields) {
+    // ``values`` caches field reads for one event: several dependents of
+    // the same field share a single DOM lookup per referenced field.
+    function buildEnv(fields, values) {
         var env = {};
         for (var i = 0; i < fields.length; i++) {
-            env[fields[i]] = readFieldValue(fields[i]);
+            var f = fields[i];
+            if (!(f in values)) values[f] = readFieldValue(f);
+            env[f] = values[f];
         }
         return env;
     }
 
-    function applyVisibility(cond) {
-        var env = buildEnv(cond.fields);
+    function applyVisibility(cond, values) {
+        var env = buildEnv(cond.fields, values);
         var visible;
         try {
             visible = truthy(window.BOFSExpr.evaluate(cond.ast, env));
@@ -114,6 +123,8 @@
             // as "not yet visible" rather than blowing up the page.
             visible = false;
         }
+        if (visible === cond.visible) return;
+        cond.visible = visible;
         if (visible) {
             cond.el.classList.remove('bofs-hidden');
             restoreRequired(cond.el);
@@ -146,7 +157,20 @@
         }
     }
 
+    function readDependencies() {
+        var node = document.getElementById('bofs-show-if-dependencies');
+        if (!node) return null;
+        try {
+            return JSON.parse(node.textContent);
+        } catch (e) {
+            console.error('BOFS branching: bad show_if dependency map');
+            return null;
+        }
+    }
+
     function setup() {
+        var dependencies = readDependencies();
+        var byIndex = {};
         var nodes = document.querySelectorAll('.bofs-conditional[data-show-if]');
         for (var i = 0; i < nodes.length; i++) {
             var raw = nodes[i].getAttribute('data-show-if');
@@ -158,14 +182,35 @@
                 console.error('BOFS branching: bad data-show-if JSON', raw);
                 continue;
             }
+            var cond = {el: nodes[i], ast: ast, fields: [], visible: undefined};
+            conditionals.push(cond);
+            var index = nodes[i].getAttribute('data-show-if-index');
+            if (dependencies && index !== null) {
+                byIndex[index] = cond;
+                continue;
+            }
             var varNames = {};
             collectVarNames(ast, varNames);
-            var fields = Object.keys(varNames);
-            var cond = {el: nodes[i], ast: ast, fields: fields};
-            conditionals.push(cond);
-            for (var f = 0; f < fields.length; f++) {
-                if (!fieldIndex[fields[f]]) fieldIndex[fields[f]] = [];
-                fieldIndex[fields[f]].push(cond);
+            cond.fields = Object.keys(varNames);
+            for (var f = 0; f < cond.fields.length; f++) {
+                if (!fieldIndex[cond.fields[f]]) fieldIndex[cond.fields[f]] = [];
+                fieldIndex[cond.fields[f]].push(cond);
+            }
+        }
+
+        // Questions not rendered for this participant (disabled, or
+        // for_conditions excludes them) have no element; skip them.
+        if (dependencies) {
+            for (var field in dependencies) {
+                if (!Object.prototype.hasOwnProperty.call(dependencies, field)) continue;
+                var indices = dependencies[field];
+                for (var d = 0; d < indices.length; d++) {
+                    var dependent = byIndex[indices[d]];
+                    if (!dependent) continue;
+                    dependent.fields.push(field);
+                    if (!fieldIndex[field]) fieldIndex[field] = [];
+                    fieldIndex[field].push(dependent);
+                }
             }
         }
 
@@ -174,8 +219,9 @@
         document.addEventListener('input', onFieldEvent, true);
 
         // Initial pass: hide questions whose predicate is false on load.
+        var values = {};
         for (var k = 0; k < conditionals.length; k++) {
-            applyVisibility(conditionals[k]);
+            applyVisibility(conditionals[k], values);
         }
     }
 
@@ -184,8 +230,9 @@
         if (!target || !target.name) return;
         var dependents = fieldIndex[target.name];
         if (!dependents) return;
+        var values = {};
         for (var i = 0; i < dependents.length; i++) {
-            applyVisibility(dependents[i]);
+            applyVisibility(dependents[i], values);
         }
     }
 
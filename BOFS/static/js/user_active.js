@@ -1,7 +1,40 @@
 (function () {
-    setInterval(function () {
+    // Heartbeat that keeps Participant.lastActiveOn fresh. The server sets
+    // the interval (a third of ABANDONED_MINUTES) on the script tag; see
+    // BOFSFlask.activity_poll_interval. Only a visible page polls: hiding
+    // the tab sends one heartbeat and stops the timer, showing it again
+    // sends one and restarts it, and unloading the page sends a last one.
+    // A tab left in the background longer than ABANDONED_MINUTES reads as
+    // abandoned until the participant comes back to it.
+    var script = document.currentScript;
+    var interval = parseInt(script && script.getAttribute("data-interval"), 10) * 1000 || 100000;
+    var timer = null;
+
+    function beat() {
+        if (navigator.sendBeacon && navigator.sendBeacon("/user_active")) {
+            return;
+        }
         var xhr = new XMLHttpRequest();
-        xhr.open("GET", "/user_active", true);
+        xhr.open("POST", "/user_active", true);
         xhr.send();
-    }, 30000);
+    }
+
+    function schedule() {
+        clearTimeout(timer);
+        timer = null;
+        if (document.hidden) {
+            return;
+        }
+        timer = setTimeout(function () {
+            beat();
+            schedule();
+        }, interval);
+    }
+
+    document.addEventListener("visibilitychange", function () {
+        beat();
+        schedule();
+    });
+    window.addEventListener("pagehide", beat);
+    schedule();
 })();
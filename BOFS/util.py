@@ -45,8 +45,11 @@ def update_participant_tracking(path):
     Kept as a thin wrapper for back-compat with researcher studies and
     third-party blueprints that import it.
     """
-    from BOFS.services.routing import ParticipantRoutingService
+    from BOFS.services.routing import ParticipantRoutingService, flush_tracked_progress
     ParticipantRoutingService.from_app().track_progress(path)
+    # Callers of this older API may read the Progress row straight after,
+    # so write it into the current transaction now.
+    flush_tracked_progress()
 
 
 # Decorator to help views verify whether the user is on the right page
@@ -214,6 +217,20 @@ def suppress_activity_polling(f):
     return decorated_function
 
 
+def suppress_session_save(f):
+    """
+    Decorator for routes that only read the session, such as the
+    ``/user_active`` heartbeat: the session is not written back and no
+    cookie is set on the response, even when the session backend would
+    otherwise refresh its expiry.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.bofs_skip_session_save = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+
 def redirect_and_set_next_path(current_path=None):
     """Deprecated: use :meth:`BOFS.services.routing.ParticipantRoutingService.advance_to_next`.
 
@@ -1639,6 +1639,13 @@ def validate_page_list_show_if_refs(page_list, questionnaires,
     """
     results = []
     known = _build_global_field_namespace(questionnaires, tables)
+    field_index = getattr(questionnaires, "field_index", None)
+    if callable(field_index):
+        field_index = field_index()
+    else:
+        from BOFS.expressions import build_field_index
+        field_index = build_field_index(questionnaires)
+    reported_ambiguous = set()
 
     def label_for(entry):
         return entry.get("name", entry.get("path", "<unnamed>"))
@@ -1662,6 +1669,22 @@ def validate_page_list_show_if_refs(page_list, questionnaires,
                 "'condition', 'source', 'end_reason'."
             ))
 
+        # A bare name defined by several questionnaires reads whichever of
+        # them the participant submitted first in load order. Report each
+        # such name once, however many predicates use it.
+        for name in sorted(bare_refs - reported_ambiguous):
+            owners = field_index.get(name, [])
+            if len(owners) < 2:
+                continue
+            reported_ambiguous.add(name)
+            results.append(ValidationResult(
+                "warning", "PAGE_LIST",
+                f"show_if on {source_label} references {name!r}, which is "
+                f"a field on several questionnaires: {', '.join(owners)}.",
+                f"The first of these the participant has submitted is used. "
+                f"Qualify the reference (e.g. '{owners[0]}.{name}') to pick one."
+            ))
+
         # Validate dotted ``qname.tag.field`` placeholders that resolve
         # to a specific questionnaire row. Table refs are checked in
         # validate_page_show_if_table_refs.
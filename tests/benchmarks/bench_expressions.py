@@ -0,0 +1,48 @@
+"""Standalone microbenchmark for the expression evaluator.
+
+Compares tree-walking ``evaluate`` (which, before ``compile_ast`` existed,
+also rebuilt ``default_functions()`` on every call) against calling an
+expression compiled once with ``compile_ast``, over the parity expressions
+from ``tests/unit/test_expressions.py``. Not collected by pytest; run
+directly:
+
+    python tests/benchmarks/bench_expressions.py
+"""
+import os
+import sys
+import timeit
+
+from BOFS.expressions import compile_ast, evaluate, parse
+from BOFS.expressions.evaluator import default_functions
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "unit"))
+from test_expressions import PARITY_CASES  # noqa: E402
+
+
+def _per_call_us(fn, number):
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main(number=20000):
+    print(f"{'expression':<40} {'rebuild µs':>11} {'_eval µs':>9} {'compiled µs':>12} {'speedup':>8}")
+    totals = [0.0, 0.0, 0.0]
+    for src, env in PARITY_CASES:
+        ast = parse(src)
+        funcs = default_functions()
+        compiled = compile_ast(ast, funcs)
+        assert compiled(env) == evaluate(ast, env, functions=funcs), src
+
+        rebuild_us = _per_call_us(lambda: evaluate(ast, env, functions=default_functions()), number)
+        eval_us = _per_call_us(lambda: evaluate(ast, env, functions=funcs), number)
+        compiled_us = _per_call_us(lambda: compiled(env), number)
+        for i, value in enumerate((rebuild_us, eval_us, compiled_us)):
+            totals[i] += value
+        print(f"{src[:40]:<40} {rebuild_us:>11.2f} {eval_us:>9.2f} {compiled_us:>12.2f} {eval_us / compiled_us:>7.1f}x")
+
+    rebuild_us, eval_us, compiled_us = totals
+    print(f"{'total':<40} {rebuild_us:>11.2f} {eval_us:>9.2f} {compiled_us:>12.2f} {eval_us / compiled_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Standalone microbenchmark for the session serializers.
+
+Measures the per-request cost of ``dumps`` (``save_session``) and
+``loads`` (``open_session``) for each ``SESSION_SERIALIZER`` at three
+realistic session sizes. Not collected by pytest; run directly:
+
+    python tests/benchmarks/bench_session_serializer.py
+"""
+import timeit
+
+from BOFS.BOFSSession import SESSION_SERIALIZERS, orjson
+
+
+PARTICIPANT_SESSION = {
+    "participantID": 1234,
+    "condition": 2,
+    "currentUrl": "questionnaire/post_survey/after",
+    "currentOccurrence": 1,
+    "externalID": "5f8a1c2b9d3e4f0012345678",
+    "mTurkID": "5f8a1c2b9d3e4f0012345678",
+    "source": "prolific",
+    "consent_shown_at": 1760000000.123,
+    "csrf_token": "0f1e2d3c4b5a69788796a5b4c3d2e1f00f1e2d3c",
+}
+
+ADMIN_SESSION = dict(
+    PARTICIPANT_SESSION,
+    loggedIn=True,
+    adminIp="203.0.113.7",
+    setup_diagnostics_acknowledged=True,
+)
+
+# A blueprint that stashes trial state in the session.
+BLUEPRINT_SESSION = dict(
+    PARTICIPANT_SESSION,
+    trial_order=list(range(60)),
+    responses={f"trial_{i}": {"rt": 412.5 + i, "correct": i % 3 != 0} for i in range(40)},
+)
+
+SIZES = [
+    ("participant", PARTICIPANT_SESSION),
+    ("admin", ADMIN_SESSION),
+    ("blueprint", BLUEPRINT_SESSION),
+]
+
+
+def _per_call_us(fn, number):
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main(number=20000):
+    print(f"orjson installed: {orjson is not None}")
+    print(f"{'session':<12} {'serializer':<12} {'bytes':>7} {'dumps µs':>10} {'loads µs':>10}")
+    for size_name, data in SIZES:
+        for name, cls in SESSION_SERIALIZERS.items():
+            serializer = cls()
+            blob = serializer.dumps(data)
+            assert serializer.loads(blob) == data, f"{name} round trip failed"
+            dumps_us = _per_call_us(lambda: serializer.dumps(data), number)
+            loads_us = _per_call_us(lambda: serializer.loads(blob), number)
+            print(f"{size_name:<12} {name:<12} {len(blob):>7} {dumps_us:>10.2f} {loads_us:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
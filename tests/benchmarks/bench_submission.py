@@ -0,0 +1,161 @@
+"""Standalone benchmark for questionnaire submission with interaction logging.
+
+Submits a 20-row radiogrid questionnaire with ``LOG_QUESTIONNAIRE_INTERACTIONS``
+on and 500 logged events per page to a file-backed SQLite database, and
+reports the commits per submission and the mean latency of
+``ParticipantQuestionnaireService.handle_submission``. For comparison it also
+times the previous approach, one ORM object per event and a commit of its own
+before the answer row is committed. Not collected by pytest; run directly:
+
+    python tests/benchmarks/bench_submission.py
+"""
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import toml
+from sqlalchemy import event
+
+ROWS = 20
+EVENTS = 500
+SUBMISSIONS = 30
+
+QUESTIONNAIRE = {
+    "title": "Grid",
+    "instructions": "",
+    "questions": [
+        {
+            "questiontype": "radiogrid",
+            "id": "grid",
+            "labels": ["1", "2", "3", "4", "5"],
+            "q_text": [{"id": f"row_{i}", "text": f"Item {i}"} for i in range(ROWS)],
+        }
+    ],
+}
+
+
+def _create_app(root):
+    os.makedirs(os.path.join(root, "questionnaires"))
+    with open(os.path.join(root, "questionnaires", "grid.json"), "w", encoding="utf-8") as f:
+        json.dump(QUESTIONNAIRE, f)
+    with open(os.path.join(root, "consent.html"), "w", encoding="utf-8") as f:
+        f.write("<p>Consent</p>")
+    config = {
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(root, "bench.db").replace("\\", "/"),
+        "TITLE": "Submission benchmark",
+        "ADMIN_PASSWORD": "bench",
+        "USE_ADMIN": False,
+        "BRUTE_FORCE_PROTECTION": False,
+        "CHECK_FOR_UPDATES": False,
+        "LOG_QUESTIONNAIRE_INTERACTIONS": True,
+        "PAGE_LIST": [
+            {"name": "Consent", "path": "consent"},
+            {"name": "Grid", "path": "questionnaire/grid"},
+            {"name": "End", "path": "end"},
+        ],
+    }
+    config_path = os.path.join(root, "config.toml")
+    with open(config_path, "w", encoding="utf-8") as f:
+        toml.dump(config, f)
+
+    from BOFS.create_app import create_app
+    app = create_app(root, config_path, debug=False)
+    with app.app_context():
+        app.db.create_all()
+    return app
+
+
+def _form():
+    form = {"timeStarted": "2024-01-01 12:00:00"}
+    form.update({f"row_{i}": str(i % 5 + 1) for i in range(ROWS)})
+    form["questionnaireInteractions"] = "\n".join(
+        json.dumps({"questionID": f"row_{i % ROWS}", "eventType": "change",
+                    "timestamp": 1704110400 + i / 10, "value": str(i % 5 + 1)})
+        for i in range(EVENTS)
+    )
+    return form
+
+
+def _participant(app):
+    p = app.db.Participant()
+    p.mTurkID = ""
+    p.ipAddress = "127.0.0.1"
+    p.userAgent = "bench"
+    p.condition = 1
+    p.finished = False
+    app.db.session.add(p)
+    app.db.session.commit()
+    return p.participantID
+
+
+def _legacy_submission(app, service, questionnaire, form):
+    """The pre-change write pattern: an ORM object per event and a commit
+    for the events, then the answer row in a second transaction."""
+    for line in form["questionnaireInteractions"].splitlines():
+        data = json.loads(line)
+        interaction = app.db.QuestionnaireInteraction()
+        interaction.participantID = service.participant_id
+        interaction.questionnaire = questionnaire.file_name
+        interaction.questionID = data["questionID"]
+        interaction.eventType = data["eventType"]
+        interaction.timestamp = datetime.fromtimestamp(data["timestamp"])
+        interaction.value = data["value"]
+        app.db.session.add(interaction)
+    app.db.session.commit()
+    app.config["LOG_QUESTIONNAIRE_INTERACTIONS"] = False
+    try:
+        service.handle_submission(questionnaire)
+    finally:
+        app.config["LOG_QUESTIONNAIRE_INTERACTIONS"] = True
+
+
+def _run(app, submit):
+    from flask import session
+    from BOFS.services.participant_questionnaire import ParticipantQuestionnaireService
+
+    questionnaire = app.questionnaires["grid"]
+    form = _form()
+    commits = []
+    record = lambda s: commits.append(s)
+    elapsed = 0.0
+    with app.app_context():
+        event.listen(app.db.session, "after_commit", record)
+        try:
+            for _ in range(SUBMISSIONS):
+                pid = _participant(app)
+                del commits[:]
+                with app.test_request_context("/questionnaire/grid", method="POST", data=form):
+                    session["participantID"] = pid
+                    service = ParticipantQuestionnaireService(pid)
+                    start = time.perf_counter()
+                    submit(app, service, questionnaire, form)
+                    elapsed += time.perf_counter() - start
+        finally:
+            event.remove(app.db.session, "after_commit", record)
+    return len(commits), elapsed / SUBMISSIONS
+
+
+def main():
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as root:
+        try:
+            app = _create_app(root)
+            print(f"{ROWS} grid rows, {EVENTS} interaction events per submission, "
+                  f"{SUBMISSIONS} submissions, file-backed SQLite")
+            print(f"{'path':<20} {'commits':>8} {'mean ms':>9}")
+            for name, submit in (
+                ("per-object, 2 tx", _legacy_submission),
+                ("executemany, 1 tx", lambda app, service, q, form: service.handle_submission(q)),
+            ):
+                commits, mean_s = _run(app, submit)
+                print(f"{name:<20} {commits:>8} {mean_s * 1e3:>9.2f}")
+            with app.app_context():
+                app.db.engine.dispose()
+        finally:
+            os.chdir(original_cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 """Tier 2 tests for the activity-polling script injection in
 ``BOFSFlask.after_request_`` and the ``suppress_activity_polling`` decorator.
 
-The hook injects ``<script src="/BOFS_static/js/user_active.js"></script>``
+The hook injects ``<script src="/BOFS_static/js/user_active.js" data-interval="100"></script>``
 before ``</body>`` for participant-flow HTML responses, so custom pages that
 don't extend ``template.html`` still refresh ``lastActiveOn``.
 """
@@ -11,7 +11,7 @@ from flask import Response, g, session
 from BOFS.util import suppress_activity_polling
 
 
-SCRIPT_TAG = b'<script src="/BOFS_static/js/user_active.js"></script>'
+SCRIPT_TAG = b'<script src="/BOFS_static/js/user_active.js" data-interval="100"></script>'
 
 
 def _html_response(body=b"<html><body>hi</body></html>"):
@@ -132,6 +132,50 @@ class TestActivityInjection:
         assert out.count(SCRIPT_TAG) == 1
         assert out.rindex(SCRIPT_TAG) < out.rindex(b"</body>")
 
+    def test_interval_follows_abandoned_minutes(self, bofs_app):
+        bofs_app.config["ABANDONED_MINUTES"] = 30
+        with bofs_app.test_request_context("/page"):
+            session['participantID'] = 1
+            resp = bofs_app.after_request_(_html_response())
+
+        assert b'data-interval="600"' in resp.get_data()
+
+
+class TestStreamedActivityInjection:
+    def _stream(self, bofs_app, chunks, path="/page"):
+        with bofs_app.test_request_context(path):
+            session['participantID'] = 1
+            resp = bofs_app.after_request_(Response(iter(chunks), mimetype="text/html"))
+            assert resp.is_streamed
+            return b"".join(c.encode() if isinstance(c, str) else c for c in resp.response)
+
+    def test_injects_when_closing_body_spans_chunks(self, bofs_app):
+        out = self._stream(bofs_app, ["<html><body>hi</bo", "dy></html>"])
+        assert out == b"<html><body>hi" + SCRIPT_TAG + b"</body></html>"
+
+    def test_inserts_before_last_body_tag_across_chunks(self, bofs_app):
+        out = self._stream(bofs_app, [b"<body>a</body>", b" b ", b"</body>", b"</html>"])
+        assert out == b"<body>a</body> b " + SCRIPT_TAG + b"</body></html>"
+
+    def test_streams_chunks_before_the_end(self, bofs_app):
+        with bofs_app.test_request_context("/page"):
+            session['participantID'] = 1
+            chunks = ["<html><body>" + "x" * 100, "y" * 100, "</body></html>"]
+            resp = bofs_app.after_request_(Response(iter(chunks), mimetype="text/html"))
+            first = next(iter(resp.response))
+        # Everything but a possible partial "</body>" goes out immediately.
+        assert first.startswith("<html><body>x")
+
+    def test_logs_warning_when_no_closing_body(self, bofs_app, caplog):
+        with caplog.at_level("WARNING"):
+            out = self._stream(bofs_app, ["<p>frag", "ment</p>"], path="/fragmentary_stream")
+
+        assert out == b"<p>fragment</p>"
+        assert any(
+            "no </body>" in rec.message and "/fragmentary_stream" in rec.message
+            for rec in caplog.records
+        )
+
 
 # ===========================================================================
 # Decorator
@@ -140,3 +140,35 @@ class TestDeleteAllWithBackup:
         after_files = set(os.listdir(project_root))
         assert not any(n.startswith("backup_") and n.endswith(".zip")
                        for n in (after_files - before_files))
+
+
+class TestDeleteDropsInProcessState:
+    def test_cached_sessions_do_not_outlive_delete(self, bofs_app_with_file_binds):
+        app = bofs_app_with_file_binds
+        app.config["SESSION_CACHE_SIZE"] = 16
+        p = _seed_one_participant_with_pii(app)
+        participant = app.test_client()
+        with participant.session_transaction() as sess:
+            sess["participantID"] = p.participantID
+            sess["condition"] = 1
+        assert len(app.session_interface.get_cache(app)) == 1
+
+        _login(app).post("/admin/database_delete", data={"password": "test"})
+
+        with participant.session_transaction() as sess:
+            assert "participantID" not in sess
+            assert "condition" not in sess
+
+    def test_buffered_heartbeats_are_discarded(self, bofs_app_with_file_binds, monkeypatch):
+        from BOFS.util import utcnow_naive
+        app = bofs_app_with_file_binds
+        app.config["HEARTBEAT_FLUSH_SECONDS"] = 60
+        p = _seed_one_participant_with_pii(app)
+        # Admin pages flush the buffer first; this heartbeat stands in for
+        # one that arrives while the delete is running.
+        monkeypatch.setattr(app, "flush_heartbeats", lambda: None)
+        app.get_heartbeat_buffer().record(p.participantID, utcnow_naive())
+
+        _login(app).post("/admin/database_delete", data={"password": "test"})
+
+        assert len(app.heartbeats) == 0
@@ -0,0 +1,126 @@
+"""Tier 2 tests for the ``/user_active`` heartbeat endpoint and the
+``HEARTBEAT_FLUSH_SECONDS`` heartbeat buffer.
+
+Uses the ``bofs_app`` fixture from conftest.py (in-memory SQLite, app context
+pushed). The buffer tests call ``/user_active`` through
+``test_request_context`` so its state can be inspected between heartbeats.
+"""
+
+from datetime import timedelta
+
+from flask import session
+from sqlalchemy import event
+
+from BOFS.default.views import route_user_active
+from BOFS.util import utcnow_naive
+
+
+def _participant(app, minutes_ago=0, condition=1):
+    p = app.db.Participant()
+    p.mTurkID = ""
+    p.ipAddress = "127.0.0.1"
+    p.userAgent = "test"
+    p.condition = condition
+    p.finished = False
+    p.lastActiveOn = utcnow_naive() - timedelta(minutes=minutes_ago)
+    app.db.session.add(p)
+    app.db.session.commit()
+    return p.participantID
+
+
+def _heartbeat(app, pid):
+    with app.test_request_context("/user_active"):
+        session["participantID"] = pid
+        route_user_active()
+
+
+def _last_active(app, pid):
+    app.db.session.expire_all()
+    return app.db.session.get(app.db.Participant, pid).lastActiveOn
+
+
+def _is_abandoned(app, pid):
+    app.db.session.expire_all()
+    return app.db.session.query(app.db.Participant.is_abandoned). \
+        filter(app.db.Participant.participantID == pid).scalar()
+
+
+class TestHeartbeatBuffer:
+    def test_disabled_by_default_writes_through(self, bofs_app):
+        pid = _participant(bofs_app, minutes_ago=30)
+        assert bofs_app.get_heartbeat_buffer() is None
+
+        _heartbeat(bofs_app, pid)
+
+        assert utcnow_naive() - _last_active(bofs_app, pid) < timedelta(minutes=1)
+
+    def test_heartbeats_are_buffered_until_the_interval(self, bofs_app):
+        bofs_app.config["HEARTBEAT_FLUSH_SECONDS"] = 60
+        pids = [_participant(bofs_app, minutes_ago=30) for _ in range(3)]
+        before = [_last_active(bofs_app, pid) for pid in pids]
+
+        for pid in pids:
+            _heartbeat(bofs_app, pid)
+
+        heartbeats = bofs_app.heartbeats
+        assert len(heartbeats) == 3
+        assert [_last_active(bofs_app, pid) for pid in pids] == before
+
+        statements = []
+        record = lambda conn, cursor, statement, params, context, executemany: \
+            statements.append((statement, executemany))
+        engine = bofs_app.db.engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            heartbeats._last_flush -= 60
+            _heartbeat(bofs_app, pids[0])
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        updates = [s for s in statements if s[0].lstrip().upper().startswith("UPDATE")]
+        assert len(updates) == 1 and updates[0][1]
+        assert len(heartbeats) == 0
+        assert all(_last_active(bofs_app, pid) > old for pid, old in zip(pids, before))
+
+    def test_flush_does_not_move_last_active_backwards(self, bofs_app):
+        bofs_app.config["HEARTBEAT_FLUSH_SECONDS"] = 60
+        pid = _participant(bofs_app)
+        heartbeats = bofs_app.get_heartbeat_buffer()
+        heartbeats.record(pid, utcnow_naive() - timedelta(minutes=10))
+        newer = _last_active(bofs_app, pid)
+
+        heartbeats.flush()
+
+        assert _last_active(bofs_app, pid) == newer
+
+    def test_balancer_counts_see_buffered_heartbeats(self, bofs_app):
+        bofs_app.config["HEARTBEAT_FLUSH_SECONDS"] = 60
+        bofs_app.config["CONDITIONS"] = [{"label": "A", "enabled": True}]
+        pid = _participant(bofs_app, minutes_ago=30)
+        assert _is_abandoned(bofs_app, pid)
+        assert bofs_app.db.Participant.balancer_counts() == [0]
+
+        _heartbeat(bofs_app, pid)
+
+        assert bofs_app.db.Participant.balancer_counts() == [1]
+        assert not _is_abandoned(bofs_app, pid)
+        assert len(bofs_app.heartbeats) == 0
+
+
+class TestUserActiveEndpoint:
+    def test_beacon_gets_empty_204_and_no_session_save(self, bofs_app):
+        # With the cookie backend and a refresh fraction of 0 every saved
+        # response would re-sign the cookie.
+        bofs_app.config["SESSION_BACKEND"] = "cookie"
+        bofs_app.config["SESSION_EXPIRY_REFRESH_FRACTION"] = 0
+        pid = _participant(bofs_app, minutes_ago=30)
+        client = bofs_app.test_client()
+        with client.session_transaction() as s:
+            s["participantID"] = pid
+
+        resp = client.post("/user_active")
+
+        assert resp.status_code == 204
+        assert resp.data == b""
+        assert "Set-Cookie" not in resp.headers
+        assert utcnow_naive() - _last_active(bofs_app, pid) < timedelta(minutes=1)
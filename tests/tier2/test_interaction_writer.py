@@ -0,0 +1,220 @@
+"""Tier 2 tests for the background interaction-event writer.
+
+Uses the ``bofs_app`` fixture from conftest.py (in-memory SQLite, app context
+pushed). Every test that starts a writer stops it before the fixture drops
+the tables.
+"""
+
+import threading
+
+import pytest
+from flask import session
+from sqlalchemy import event
+
+from BOFS.services import interaction_writer
+from BOFS.services.interaction_writer import InteractionWriter
+from BOFS.services.participant_questionnaire import ParticipantQuestionnaireService
+from tests.conftest import write_questionnaire_file
+
+
+GRID_QUESTIONNAIRE = {
+    "title": "Grid",
+    "instructions": "",
+    "questions": [
+        {
+            "questiontype": "radiogrid",
+            "id": "g",
+            "labels": ["1", "2", "3"],
+            "q_text": [{"id": "g_q1", "text": "One"}, {"id": "g_q2", "text": "Two"}],
+        }
+    ],
+}
+
+
+def _events(n, start=0):
+    return "\n".join(
+        '{"questionID":"g_q1","eventType":"change","timestamp":%d,"value":"%d"}' % (1704110400 + i, i)
+        for i in range(start, start + n)
+    )
+
+
+def _participant(app):
+    p = app.db.Participant()
+    p.mTurkID = ""
+    p.ipAddress = "127.0.0.1"
+    p.userAgent = "test"
+    p.condition = 1
+    p.finished = False
+    app.db.session.add(p)
+    app.db.session.commit()
+    return p.participantID
+
+
+def _submit(app, q, pid, events):
+    with app.test_request_context("/questionnaire/grid", method="POST", data={
+        "timeStarted": "2024-01-01 12:00:00",
+        "g_q1": "2",
+        "g_q2": "3",
+        "questionnaireInteractions": events,
+    }):
+        session["participantID"] = pid
+        ParticipantQuestionnaireService(pid).handle_submission(q)
+
+
+def _interaction_count(app):
+    app.db.session.expire_all()
+    return app.db.session.query(app.db.QuestionnaireInteraction).count()
+
+
+class _BlockedWriter(InteractionWriter):
+    """A writer whose thread doesn't consume the queue until released."""
+
+    def __init__(self, *args, **kwargs):
+        super(_BlockedWriter, self).__init__(*args, **kwargs)
+        self.release = threading.Event()
+
+    def _run(self):
+        self.release.wait(5)
+        super(_BlockedWriter, self)._run()
+
+
+class TestInteractionWriter:
+    def test_disabled_by_default(self, bofs_app):
+        assert bofs_app.config["INTERACTION_LOG_QUEUE_SIZE"] == 0
+        assert bofs_app.get_interaction_writer() is None
+
+    def test_started_on_first_use(self, bofs_app):
+        bofs_app.config["INTERACTION_LOG_QUEUE_SIZE"] = 10
+        writer = bofs_app.get_interaction_writer()
+        try:
+            assert writer.running
+            assert bofs_app.get_interaction_writer() is writer
+        finally:
+            writer.stop(timeout=5)
+
+    def test_submission_queues_events_for_the_writer(self, bofs_app):
+        # The in-memory database is one shared connection, so the writer is
+        # held back until the submissions are done with it.
+        bofs_app.config["LOG_QUESTIONNAIRE_INTERACTIONS"] = True
+        q = write_questionnaire_file(bofs_app, "grid", GRID_QUESTIONNAIRE)
+        writer = _BlockedWriter(bofs_app, max_size=10, batch_size=5000)
+        writer.start()
+        bofs_app.interaction_writer = writer
+        bofs_app.config["INTERACTION_LOG_QUEUE_SIZE"] = 10
+        try:
+            for _ in range(3):
+                _submit(bofs_app, q, _participant(bofs_app), _events(40))
+            assert len(q.fetch_all_data()) == 3
+            assert writer.depth == 3
+            assert _interaction_count(bofs_app) == 0
+        finally:
+            writer.release.set()
+            writer.stop(timeout=5)
+
+        assert not writer.running
+        assert writer.written == 120
+        assert _interaction_count(bofs_app) == 120
+
+    def test_full_queue_writes_during_the_request(self, bofs_app):
+        bofs_app.config["LOG_QUESTIONNAIRE_INTERACTIONS"] = True
+        q = write_questionnaire_file(bofs_app, "grid", GRID_QUESTIONNAIRE)
+        writer = _BlockedWriter(bofs_app, max_size=1, batch_size=5000)
+        writer.start()
+        bofs_app.interaction_writer = writer
+        bofs_app.config["INTERACTION_LOG_QUEUE_SIZE"] = 1
+        try:
+            _submit(bofs_app, q, _participant(bofs_app), _events(5))
+            assert writer.depth == 1
+            _submit(bofs_app, q, _participant(bofs_app), _events(7, start=5))
+            # The second submission didn't fit and wrote its own events.
+            assert _interaction_count(bofs_app) == 7
+            assert bofs_app.setup_diagnostics.by_category("interaction_log")
+        finally:
+            writer.release.set()
+            writer.stop(timeout=5)
+
+        assert writer.max_depth == 1
+        assert _interaction_count(bofs_app) == 12
+
+    def test_failed_submission_queues_nothing(self, bofs_app):
+        bofs_app.config["LOG_QUESTIONNAIRE_INTERACTIONS"] = True
+        q = write_questionnaire_file(bofs_app, "grid", GRID_QUESTIONNAIRE)
+        pid = _participant(bofs_app)
+        writer = _BlockedWriter(bofs_app, max_size=10, batch_size=5000)
+        writer.start()
+        bofs_app.interaction_writer = writer
+        bofs_app.config["INTERACTION_LOG_QUEUE_SIZE"] = 10
+
+        def fail(session):
+            raise RuntimeError("commit failed")
+        event.listen(bofs_app.db.session, "before_commit", fail)
+        try:
+            with pytest.raises(RuntimeError):
+                _submit(bofs_app, q, pid, _events(5))
+            assert writer.depth == 0
+        finally:
+            event.remove(bofs_app.db.session, "before_commit", fail)
+            bofs_app.db.session.rollback()
+            writer.release.set()
+            writer.stop(timeout=5)
+
+        assert _interaction_count(bofs_app) == 0
+
+    def test_failed_batch_is_retried(self, bofs_app, monkeypatch):
+        monkeypatch.setattr(interaction_writer, "_RETRY_DELAYS", (0, 0))
+        insert = interaction_writer.insert_interaction_rows
+        calls = []
+
+        def flaky(rows):
+            calls.append(len(rows))
+            if len(calls) == 1:
+                raise RuntimeError("database is locked")
+            insert(rows)
+        monkeypatch.setattr(interaction_writer, "insert_interaction_rows", flaky)
+        writer = InteractionWriter(bofs_app, max_size=10, batch_size=25)
+
+        writer._write([(_events(4), _participant(bofs_app), "grid", "")])
+
+        assert calls == [4, 4]
+        assert writer.written == 4 and writer.dropped == 0
+        assert _interaction_count(bofs_app) == 4
+
+    def test_batch_failing_every_attempt_is_counted(self, bofs_app, monkeypatch):
+        monkeypatch.setattr(interaction_writer, "_RETRY_DELAYS", (0, 0))
+
+        def locked(rows):
+            raise RuntimeError("database is locked")
+        monkeypatch.setattr(interaction_writer, "insert_interaction_rows", locked)
+        writer = InteractionWriter(bofs_app, max_size=10, batch_size=25)
+
+        writer._write([(_events(4), 1, "grid", "")])
+        writer._write([(_events(2), 1, "grid", "")])
+
+        assert writer.written == 0 and writer.dropped == 6
+        [diagnostic] = bofs_app.setup_diagnostics.by_category("interaction_log")
+        assert diagnostic.severity == "error"
+        assert diagnostic.message.startswith("6 ")
+
+    def test_restarting_registers_one_exit_hook(self, bofs_app, monkeypatch):
+        hooks = []
+        monkeypatch.setattr(interaction_writer.atexit, "register", lambda *args: hooks.append(args))
+        writer = InteractionWriter(bofs_app, max_size=10, batch_size=25)
+        for _ in range(3):
+            writer.start()
+            writer.stop(timeout=5)
+
+        assert len(hooks) == 1
+
+    def test_batches_queued_payloads_up_to_batch_size(self, bofs_app):
+        writer = InteractionWriter(bofs_app, max_size=10, batch_size=25)
+        for start in (0, 10, 20, 30):
+            writer._queue.put_nowait((_events(10, start), 1, "grid", ""))
+
+        assert len(writer._take_batch()) == 3
+        assert len(writer._take_batch()) == 1
+        assert writer.depth == 0
+
+    def test_not_running_writer_refuses_payloads(self, bofs_app):
+        writer = InteractionWriter(bofs_app, max_size=10, batch_size=25)
+        assert writer.submit(_events(1), 1, "grid", "") is False
+        assert writer.depth == 0
@@ -0,0 +1,197 @@
+"""Tier 2 tests for the background maintenance sweep.
+
+Uses the ``bofs_app`` fixture from conftest.py (in-memory SQLite, app context
+pushed). ``run_sweep`` is called directly; the scheduler is only started in
+the one test that checks the thread itself.
+"""
+
+import os
+import time
+
+import toml
+from datetime import timedelta
+
+from sqlalchemy import inspect
+
+from BOFS.services import maintenance
+from BOFS.services.data_export import MAX_CACHE_SECONDS
+from BOFS.util import utcnow_naive
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _make_session(app, sid, expires_in_minutes):
+    row = app.db.SessionStore()
+    row.sessionID = sid
+    row.data = "{}"
+    row.expiry = utcnow_naive() + timedelta(minutes=expires_in_minutes)
+    app.db.session.add(row)
+    app.db.session.commit()
+
+
+def _make_ban(app, ip, expires_in_minutes):
+    now = utcnow_naive()
+    ban = app.db.BannedIp()
+    ban.ipAddress = ip
+    ban.bannedAt = now - timedelta(days=90)
+    ban.expiresAt = now + timedelta(minutes=expires_in_minutes)
+    ban.failCount = 5
+    app.db.session.add(ban)
+    app.db.session.commit()
+
+
+def _make_attempt(app, ip, minutes_ago):
+    attempt = app.db.LoginAttempt()
+    attempt.ipAddress = ip
+    attempt.attemptedAt = utcnow_naive() - timedelta(minutes=minutes_ago)
+    app.db.session.add(attempt)
+    app.db.session.commit()
+
+
+# ---------------------------------------------------------------------------
+# run_sweep
+# ---------------------------------------------------------------------------
+
+class TestRunSweep:
+    def test_removes_expired_sessions_only(self, bofs_app):
+        _make_session(bofs_app, "old", -5)
+        _make_session(bofs_app, "live", 60)
+
+        report = maintenance.run_sweep(bofs_app)
+
+        assert report.sessions == 1
+        remaining = [r.sessionID for r in bofs_app.db.session.query(bofs_app.db.SessionStore)]
+        assert remaining == ["live"]
+
+    def test_deletes_in_batches(self, bofs_app):
+        bofs_app.config['MAINTENANCE_BATCH_SIZE'] = 2
+        for i in range(5):
+            _make_session(bofs_app, f"old-{i}", -5)
+
+        report = maintenance.run_sweep(bofs_app)
+
+        assert report.sessions == 5
+        assert bofs_app.db.session.query(bofs_app.db.SessionStore).count() == 0
+
+    def test_keeps_recently_lapsed_bans(self, bofs_app):
+        """Lapsed bans feed the progressive schedule, so only bans past
+        MAINTENANCE_BAN_RETENTION_DAYS are removed."""
+        bofs_app.config['MAINTENANCE_BAN_RETENTION_DAYS'] = 30
+        _make_ban(bofs_app, "10.0.0.1", -60 * 24 * 45)  # lapsed 45 days ago
+        _make_ban(bofs_app, "10.0.0.2", -60 * 24 * 2)   # lapsed 2 days ago
+        _make_ban(bofs_app, "10.0.0.3", 60)             # still active
+
+        report = maintenance.run_sweep(bofs_app)
+
+        assert report.bans == 1
+        ips = sorted(b.ipAddress for b in bofs_app.db.session.query(bofs_app.db.BannedIp))
+        assert ips == ["10.0.0.2", "10.0.0.3"]
+
+    def test_prunes_login_attempts_outside_window(self, bofs_app):
+        bofs_app.config['BRUTE_FORCE_WINDOW_MINUTES'] = 15
+        _make_attempt(bofs_app, "10.0.0.1", 30)
+        _make_attempt(bofs_app, "10.0.0.1", 1)
+
+        report = maintenance.run_sweep(bofs_app)
+
+        assert report.login_attempts == 1
+        assert bofs_app.db.session.query(bofs_app.db.LoginAttempt).count() == 1
+
+    def test_removes_stale_results_cache(self, bofs_app, tmp_path):
+        bofs_app.root_path = str(tmp_path)
+        cache_path = tmp_path / "cached_results.json"
+        cache_path.write_text("{}", encoding="utf-8")
+
+        assert maintenance.run_sweep(bofs_app).cache_files == 0
+        assert cache_path.exists()
+
+        stale = time.time() - 3 * MAX_CACHE_SECONDS
+        os.utime(cache_path, (stale, stale))
+
+        assert maintenance.run_sweep(bofs_app).cache_files == 1
+        assert not cache_path.exists()
+
+    def test_reports_to_setup_diagnostics(self, bofs_app):
+        _make_session(bofs_app, "old", -5)
+
+        maintenance.run_sweep(bofs_app)
+        maintenance.run_sweep(bofs_app)
+
+        entries = bofs_app.setup_diagnostics.by_category("maintenance")
+        assert len(entries) == 1
+        assert entries[0].severity == "info"
+        assert "0 expired session(s)" in entries[0].message
+        assert bofs_app.maintenance_report.sessions == 0
+
+
+# ---------------------------------------------------------------------------
+# Schema and scheduler
+# ---------------------------------------------------------------------------
+
+class TestMaintenanceSetup:
+    def test_expiry_columns_are_indexed(self, bofs_app):
+        inspector = inspect(bofs_app.db.engine)
+        session_cols = {tuple(ix["column_names"]) for ix in inspector.get_indexes("session_store")}
+        ban_cols = {tuple(ix["column_names"]) for ix in inspector.get_indexes("banned_ip")}
+        assert ("expiry",) in session_cols
+        assert ("expiresAt",) in ban_cols
+
+    def test_expiry_indexes_added_to_existing_database(self, tmp_path):
+        from BOFS.create_app import create_app
+
+        (tmp_path / "questionnaires").mkdir()
+        (tmp_path / "consent.html").write_text("<p>Consent</p>", encoding="utf-8")
+        config_path = tmp_path / "config.toml"
+        config_path.write_text(toml.dumps({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + (tmp_path / "app.db").as_posix(),
+            "TITLE": "Test Experiment",
+            "ADMIN_PASSWORD": "test",
+            "USE_ADMIN": False,
+            "BRUTE_FORCE_PROTECTION": False,
+            "CHECK_FOR_UPDATES": False,
+            "PAGE_LIST": [{"name": "Consent", "path": "consent"}, {"name": "End", "path": "end"}],
+        }), encoding="utf-8")
+
+        original_cwd = os.getcwd()
+        try:
+            app = create_app(str(tmp_path), str(config_path))
+            with app.app_context():
+                with app.db.engine.begin() as conn:
+                    conn.exec_driver_sql("DROP INDEX ix_session_store_expiry")
+                    conn.exec_driver_sql('DROP INDEX "ix_banned_ip_expiresAt"')
+                app.db.engine.dispose()
+
+            # Starting up again on the older schema adds the indexes back.
+            app = create_app(str(tmp_path), str(config_path))
+            with app.app_context():
+                inspector = inspect(app.db.engine)
+                names = {ix["name"] for ix in inspector.get_indexes("session_store")} | \
+                    {ix["name"] for ix in inspector.get_indexes("banned_ip")}
+                app.db.engine.dispose()
+        finally:
+            os.chdir(original_cwd)
+
+        assert {"ix_session_store_expiry", "ix_banned_ip_expiresAt"} <= names
+
+    def test_scheduler_sweeps_on_start(self, bofs_app):
+        _make_session(bofs_app, "old", -5)
+        bofs_app.config['MAINTENANCE_INTERVAL_MINUTES'] = 60
+
+        bofs_app.start_maintenance()
+        try:
+            assert bofs_app.maintenance.running
+            deadline = time.time() + 5
+            while bofs_app.maintenance_report is None and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            bofs_app.maintenance.stop(timeout=5)
+
+        assert bofs_app.maintenance_report.sessions == 1
+        assert not bofs_app.maintenance.running
+
+    def test_interval_zero_disables_scheduler(self, bofs_app):
+        bofs_app.config['MAINTENANCE_INTERVAL_MINUTES'] = 0
+        bofs_app.start_maintenance()
+        assert bofs_app.maintenance is None
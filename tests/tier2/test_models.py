@@ -507,6 +507,8 @@ class TestBeforeRequestTracking:
             session['participantID'] = p.participantID
             session['currentUrl'] = "my_custom_page"
             bofs_app.before_request_()
+            # Tracking is staged until the request commits.
+            bofs_app.db.session.commit()
 
         prog = bofs_app.db.session.query(bofs_app.db.Progress).filter_by(
             participantID=p.participantID, path="my_custom_page"
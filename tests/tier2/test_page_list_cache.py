@@ -1,19 +1,29 @@
 """Tier 2 tests for the request-scoped ``flat_page_list`` cache.
 
 The cache lives on ``flask.g`` and is invalidated on SQLAlchemy
-``after_commit`` so a write-then-read within one request stays correct.
-These tests need a request context (the cache no-ops without one), so they
-use the ``bofs_app`` fixture and push a ``test_request_context``.
+``after_commit`` when the transaction wrote ``show_if`` inputs, so a
+write-then-read within one request stays correct.
+These tests need a request context (the cache no-ops without one) and a
+PAGE_LIST with a ``show_if`` — sequences without one are served from the
+per-condition index precompiled at startup and never reach the cache.
 """
 
 import os
 
+import pytest
 import toml
+from sqlalchemy import update
 
-from BOFS.PageList import _flat_page_list_cache, invalidate_flat_page_list_cache
+from BOFS.PageList import (
+    NavigationIndex,
+    VisibilityCache,
+    _flat_page_list_cache,
+    bump_participant_data_version,
+    invalidate_flat_page_list_cache,
+)
 
 
-def _make_show_if_app(tmp_path):
+def _make_show_if_app(tmp_path, **overrides):
     """App whose PAGE_LIST has a page gated on ``source == 'prolific'`` — a
     show_if that resolves against the live Participant row, so its visibility
     flips when the participant's source is committed."""
@@ -31,6 +41,7 @@ def _make_show_if_app(tmp_path):
             {"name": "End", "path": "end"},
         ],
     }
+    config.update(overrides)
     config_path = tmp_path / "config.toml"
     config_path.write_text(toml.dumps(config), encoding="utf-8")
     (tmp_path / "consent.html").write_text("<p>Consent</p>", encoding="utf-8")
@@ -43,73 +54,82 @@ def _make_show_if_app(tmp_path):
     return app, ctx, cwd
 
 
+@pytest.fixture
+def show_if_app(tmp_path):
+    app, ctx, cwd = _make_show_if_app(tmp_path)
+    yield app
+    app.db.drop_all()
+    ctx.pop()
+    os.chdir(cwd)
+
+
 class TestFlatPageListCache:
-    def test_second_call_is_served_from_cache(self, bofs_app):
+    def test_second_call_is_served_from_cache(self, show_if_app):
         """Tampering with the cached value and seeing the next call return it
         proves the second call short-circuited rather than rebuilt."""
-        with bofs_app.test_request_context("/"):
-            pl = bofs_app.page_list
+        with show_if_app.test_request_context("/"):
+            pl = show_if_app.page_list
             pl.flat_page_list()
             cache = _flat_page_list_cache()
             (key,) = cache.keys()
-            cache[key] = [{"path": "sentinel"}]
+            cache[key] = NavigationIndex([{"path": "sentinel"}])
             second = pl.flat_page_list()
             assert [e["path"] for e in second] == ["sentinel"]
 
-    def test_distinct_keys_cached_separately(self, bofs_app):
+    def test_distinct_keys_cached_separately(self, show_if_app):
         """Different (condition, hide_unresolved) inputs are cached under
         separate keys and don't collide."""
-        with bofs_app.test_request_context("/"):
-            pl = bofs_app.page_list
+        with show_if_app.test_request_context("/"):
+            pl = show_if_app.page_list
             a = pl.flat_page_list(condition=1)
             c = pl.flat_page_list(condition=1, hide_unresolved=True)
             cache = _flat_page_list_cache()
             # participant_id resolves to None (no participantID in session).
             assert (1, None, False) in cache
             assert (1, None, True) in cache
-            assert [e["path"] for e in a] == [e["path"] for e in cache[(1, None, False)]]
+            assert [e["path"] for e in a] == [e["path"] for e in cache[(1, None, False)].entries]
             assert a is not c  # different cache key, distinct results
 
-    def test_commit_invalidates_cache(self, bofs_app):
+    def test_commit_invalidates_cache(self, show_if_app):
         """A DB commit clears the cache so the next call rebuilds — this is
         what keeps route_end's stamp-then-resolve correct."""
-        with bofs_app.test_request_context("/"):
-            pl = bofs_app.page_list
+        with show_if_app.test_request_context("/"):
+            pl = show_if_app.page_list
             first = pl.flat_page_list()
 
             # A real write + commit fires the after_commit listener.
-            p = bofs_app.db.Participant()
-            bofs_app.db.session.add(p)
-            bofs_app.db.session.commit()
+            p = show_if_app.db.Participant()
+            show_if_app.db.session.add(p)
+            show_if_app.db.session.commit()
 
             second = pl.flat_page_list()
             assert first is not second
             # Same content, freshly built.
             assert [e["path"] for e in first] == [e["path"] for e in second]
 
-    def test_explicit_invalidation(self, bofs_app):
-        with bofs_app.test_request_context("/"):
-            pl = bofs_app.page_list
+    def test_explicit_invalidation(self, show_if_app):
+        with show_if_app.test_request_context("/"):
+            pl = show_if_app.page_list
             first = pl.flat_page_list()
             invalidate_flat_page_list_cache()
             second = pl.flat_page_list()
             assert first is not second
 
-    def test_no_request_context_does_not_cache(self, bofs_app):
+    def test_no_request_context_does_not_cache(self, show_if_app):
         """Outside a request there is no ``g`` to cache on, so each call
         recomputes (and the cache accessor reports unavailable)."""
-        # bofs_app pushes only an app context, not a request context.
+        # show_if_app pushes only an app context, not a request context.
         assert _flat_page_list_cache() is None
-        pl = bofs_app.page_list
+        pl = show_if_app.page_list
         first = pl.flat_page_list(participant_id=None)
         second = pl.flat_page_list(participant_id=None)
         assert first is not second
 
-    def test_mutating_returned_list_does_not_poison_cache(self, bofs_app):
+    def test_mutating_returned_list_does_not_poison_cache(self, show_if_app):
         """Each call hands back its own list — appending to one result must
         not change what a later call sees (the pre-cache invariant)."""
-        with bofs_app.test_request_context("/"):
-            pl = bofs_app.page_list
+        with show_if_app.test_request_context("/"):
+            pl = show_if_app.page_list
             first = pl.flat_page_list()
             n = len(first)
             first.append({"path": "injected"})
@@ -118,6 +138,56 @@ class TestFlatPageListCache:
             assert all(e.get("path") != "injected" for e in second)
 
 
+class TestSelectiveInvalidation:
+    """Only commits that write ``show_if`` inputs drop the request cache."""
+
+    def _participant(self, app):
+        return TestVisibilityCache._participant(self, app)
+
+    def _cache_survives(self, app, write):
+        with app.test_request_context("/"):
+            app.page_list.flat_page_list(condition=1)
+            write()
+            app.db.session.commit()
+            return (1, None, False) in _flat_page_list_cache()
+
+    def test_progress_write_keeps_cache(self, show_if_app):
+        p = self._participant(show_if_app)
+
+        def write():
+            row = show_if_app.db.Progress()
+            row.participantID = p.participantID
+            row.path = "consent"
+            show_if_app.db.session.add(row)
+
+        assert self._cache_survives(show_if_app, write)
+
+    def test_unreserved_participant_column_keeps_cache(self, show_if_app):
+        p = self._participant(show_if_app)
+
+        def write():
+            p.finished = True
+
+        assert self._cache_survives(show_if_app, write)
+
+    def test_reserved_participant_column_drops_cache(self, show_if_app):
+        p = self._participant(show_if_app)
+
+        def write():
+            p.end_reason = "screened_out"
+
+        assert not self._cache_survives(show_if_app, write)
+
+    def test_rollback_discards_recorded_changes(self, show_if_app):
+        p = self._participant(show_if_app)
+        session = show_if_app.db.session
+        p.source = "prolific"
+        session.flush()
+        assert session.info.get("bofs_show_if_changes") == {p.participantID}
+        session.rollback()
+        assert "bofs_show_if_changes" not in session.info
+
+
 class TestCacheReflectsCommittedShowIf:
     """The whole point of after_commit invalidation: a show_if whose value
     changes when data is committed must be reflected on the next read."""
@@ -152,3 +222,174 @@ class TestCacheReflectsCommittedShowIf:
             app.db.drop_all()
             ctx.pop()
             os.chdir(cwd)
+
+
+class TestStaticNavigation:
+    """Without a ``show_if`` in play, the page sequence is the same for every
+    participant in a condition, so it comes from an index built at startup."""
+
+    def test_static_sequence_bypasses_request_cache(self, bofs_app):
+        with bofs_app.test_request_context("/"):
+            pl = bofs_app.page_list
+            first = pl.navigation(condition=1)
+            second = pl.navigation(condition=1, participant_id=7, hide_unresolved=True)
+            assert first is second
+            assert _flat_page_list_cache() == {}
+            assert [e["path"] for e in pl.flat_page_list(condition=1)] == ["consent", "end"]
+
+    def test_show_if_sequence_is_resolved_per_request(self, show_if_app):
+        with show_if_app.test_request_context("/"):
+            pl = show_if_app.page_list
+            assert pl._static_navigation_for(1) is None
+            pl.flat_page_list(condition=1)
+            assert (1, None, False) in _flat_page_list_cache()
+
+    def test_index_lookups(self, bofs_app):
+        with bofs_app.test_request_context("/"):
+            pl = bofs_app.page_list
+            assert pl.get_index("/end") == 1
+            assert pl.get_index("missing") is None
+            assert pl.next_path("consent") == "end"
+            assert pl.previous_path("end") == "consent"
+
+
+class TestVisibilityCache:
+    """``PAGE_VISIBILITY_CACHE_SIZE`` keeps resolved sequences across
+    requests until the participant's data version is bumped."""
+
+    def _participant(self, app):
+        from BOFS.util import utcnow_naive
+        p = app.db.Participant()
+        p.ipAddress = "127.0.0.1"
+        p.userAgent = "test"
+        p.condition = 0
+        p.timeStarted = utcnow_naive()
+        app.db.session.add(p)
+        app.db.session.commit()
+        return p
+
+    def _paths(self, app, pid):
+        with app.test_request_context("/"):
+            # g outlives this request because the fixture's app context
+            # does; drop it so only the cross-request cache is exercised.
+            invalidate_flat_page_list_cache()
+            return [e["path"] for e in app.page_list.flat_page_list(participant_id=pid)]
+
+    def test_disabled_by_default(self, show_if_app):
+        assert show_if_app.config['PAGE_VISIBILITY_CACHE_SIZE'] == 0
+        assert show_if_app.page_list._get_visibility_cache() is None
+
+    def test_sequence_is_shared_across_requests(self, show_if_app):
+        show_if_app.config['PAGE_VISIBILITY_CACHE_SIZE'] = 8
+        p = self._participant(show_if_app)
+        with show_if_app.test_request_context("/"):
+            first = show_if_app.page_list.navigation(participant_id=p.participantID)
+        with show_if_app.test_request_context("/"):
+            second = show_if_app.page_list.navigation(participant_id=p.participantID)
+        assert first is second
+
+    def test_commit_invalidates_only_that_participant(self, show_if_app):
+        show_if_app.config['PAGE_VISIBILITY_CACHE_SIZE'] = 8
+        p = self._participant(show_if_app)
+        other = self._participant(show_if_app)
+        assert "instructions/prolific" not in self._paths(show_if_app, p.participantID)
+        assert "instructions/prolific" not in self._paths(show_if_app, other.participantID)
+
+        with show_if_app.test_request_context("/"):
+            p.source = "prolific"
+            show_if_app.db.session.commit()
+            # A Core UPDATE bypasses the flush hooks, so other's cached
+            # sequence survives until its version is bumped by hand.
+            show_if_app.db.session.execute(
+                update(show_if_app.db.Participant)
+                .where(show_if_app.db.Participant.participantID == other.participantID)
+                .values(source="prolific")
+            )
+            show_if_app.db.session.commit()
+
+        assert "instructions/prolific" in self._paths(show_if_app, p.participantID)
+        assert "instructions/prolific" not in self._paths(show_if_app, other.participantID)
+
+        bump_participant_data_version(other.participantID)
+        assert "instructions/prolific" in self._paths(show_if_app, other.participantID)
+
+    def test_route_end_bumps_version(self, show_if_app):
+        show_if_app.config['PAGE_VISIBILITY_CACHE_SIZE'] = 8
+        p = self._participant(show_if_app)
+        self._paths(show_if_app, p.participantID)
+        cache = show_if_app.page_list._get_visibility_cache()
+        before = cache.version(p.participantID)
+
+        client = show_if_app.test_client()
+        with client.session_transaction() as sess:
+            sess["participantID"] = p.participantID
+            sess["currentUrl"] = "end"
+        assert client.get("/end").status_code == 200
+
+        assert cache.version(p.participantID) != before
+
+
+class TestVisibilityCacheDatabaseDelete:
+    def test_delete_drops_cached_sequences(self, tmp_path):
+        # /admin/database_delete needs a database file to back up.
+        app, ctx, cwd = _make_show_if_app(
+            tmp_path, SQLALCHEMY_DATABASE_URI="sqlite:///main.db", USE_ADMIN=True,
+            WTF_CSRF_ENABLED=False, PAGE_VISIBILITY_CACHE_SIZE=8)
+        try:
+            helper = TestVisibilityCache()
+            p = helper._participant(app)
+            p.source = "prolific"
+            app.db.session.commit()
+            pid = p.participantID
+            assert "instructions/prolific" in helper._paths(app, pid)
+            cache = app.page_list._get_visibility_cache()
+            assert len(cache) == 1
+
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess["loggedIn"] = True
+            resp = client.post("/admin/database_delete", data={"password": "test"})
+            assert resp.status_code in (302, 303)
+            assert len(cache) == 0
+
+            # SQLite reuses the freed ID for the next participant; forget
+            # the deleted one this test's session still holds.
+            app.db.session.expunge_all()
+            assert helper._participant(app).participantID == pid
+            assert "instructions/prolific" not in helper._paths(app, pid)
+        finally:
+            app.db.drop_all()
+            ctx.pop()
+            os.chdir(cwd)
+
+
+class TestVisibilityCacheStore:
+    def test_clear_invalidates_every_participant(self):
+        cache = VisibilityCache(4)
+        version = cache.version(1)
+        cache.put((1, 0, False), NavigationIndex([]), version)
+        cache.clear()
+        assert cache.get((1, 0, False)) is None
+        cache.put((1, 0, False), NavigationIndex([]), version)
+        assert cache.get((1, 0, False)) is None
+
+    def test_put_under_old_version_is_stale(self):
+        """A bump that lands while a sequence is being resolved must leave
+        that sequence unusable once stored."""
+        cache = VisibilityCache(4)
+        version = cache.version(1)
+        cache.bump(1)
+        cache.put((1, 0, False), NavigationIndex([]), version)
+        assert cache.get((1, 0, False)) is None
+        assert len(cache) == 0
+
+    def test_evicts_least_recently_used(self):
+        cache = VisibilityCache(2)
+        a, b, c = NavigationIndex([]), NavigationIndex([]), NavigationIndex([])
+        cache.put((1, 0, False), a, cache.version(1))
+        cache.put((2, 0, False), b, cache.version(2))
+        assert cache.get((1, 0, False)) is a
+        cache.put((3, 0, False), c, cache.version(3))
+        assert cache.get((2, 0, False)) is None
+        assert cache.get((1, 0, False)) is a
+        assert cache.get((3, 0, False)) is c
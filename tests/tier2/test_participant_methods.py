@@ -180,6 +180,25 @@ class TestParticipantEvaluate:
         assert p.evaluate(42) is None
         assert p.evaluate(["age", ">", "18"]) is None
 
+    def test_bare_field_resolves_through_field_index(self, bofs_app):
+        pre = write_questionnaire_file(bofs_app, "pre", SURVEY)
+        post = write_questionnaire_file(bofs_app, "post", SURVEY)
+        assert bofs_app.questionnaires.field_index()["age"] == ["pre", "post"]
+        assert bofs_app.questionnaires.ambiguous_fields()["color"] == ["pre", "post"]
+
+        p = _create_participant(bofs_app)
+        # Only ``post`` is submitted, so the bare name falls through to it.
+        _seed_survey(bofs_app, post, p.participantID, color="red", age=30)
+        assert p.evaluate("age") == 30
+        _seed_survey(bofs_app, pre, p.participantID, color="blue", age=20)
+        assert p.evaluate("age") == 20
+
+    def test_field_index_follows_registry_changes(self, bofs_app):
+        write_questionnaire_file(bofs_app, "survey", SURVEY)
+        assert bofs_app.questionnaires.field_index()["age"] == ["survey"]
+        del bofs_app.questionnaires["survey"]
+        assert "age" not in bofs_app.questionnaires.field_index()
+
     def test_compiled_expressions_are_cached(self, bofs_app):
         from BOFS.default.models import _compile_expression
         p = _create_participant(bofs_app)
@@ -749,6 +749,71 @@ class TestHandleQuestionnaire:
         assert [r.value for r in rows] == ["", "2", "2", "3"]
         assert rows[0].timestamp == datetime.fromtimestamp(1704110400.000)
 
+    def test_submission_with_interactions_commits_once(self, bofs_app):
+        from sqlalchemy import event
+        bofs_app.config["LOG_QUESTIONNAIRE_INTERACTIONS"] = True
+        q = write_questionnaire_file(bofs_app, "grid_q", RADIOGRID_QUESTIONNAIRE)
+        pid = self._create_participant(bofs_app)
+        events = "\n".join(
+            '{"questionID":"g_q1","eventType":"change","timestamp":%d,"value":"2"}' % (1704110400 + i)
+            for i in range(50)
+        )
+
+        commits = []
+        record = lambda session: commits.append(session)
+        event.listen(bofs_app.db.session, "after_commit", record)
+        try:
+            with bofs_app.test_request_context(
+                "/questionnaire/grid_q",
+                method="POST",
+                data={
+                    "timeStarted": "2024-01-01 12:00:00",
+                    "g_q1": "2",
+                    "g_q2": "3",
+                    "questionnaireInteractions": events,
+                },
+            ):
+                from flask import session
+                session["participantID"] = pid
+                ParticipantQuestionnaireService(pid).handle_submission(q)
+        finally:
+            event.remove(bofs_app.db.session, "after_commit", record)
+
+        assert len(commits) == 1
+        assert bofs_app.db.session.query(bofs_app.db.QuestionnaireInteraction).count() == 50
+        assert len(q.fetch_all_data()) == 1
+
+    def test_resubmission_updates_most_recent_of_several_rows(self, bofs_app):
+        q = write_questionnaire_file(bofs_app, "survey", SIMPLE_QUESTIONNAIRE)
+        pid = self._create_participant(bofs_app)
+        for name, minute in (("old", 0), ("newest", 30), ("middle", 10)):
+            row = q.db_class()
+            row.participantID = pid
+            row.tag = ""
+            row.name = name
+            row.timeStarted = datetime(2024, 1, 1)
+            row.timeEnded = datetime(2024, 1, 1, 0, minute)
+            bofs_app.db.session.add(row)
+        bofs_app.db.session.commit()
+
+        with bofs_app.test_request_context(
+            "/questionnaire/survey",
+            method="POST",
+            data={
+                "timeStarted": "2024-01-01 12:00:00",
+                "name": "Bob",
+                "rating": "5",
+                "age": "25",
+                "questionnaireInteractions": "",
+            },
+        ):
+            from flask import session
+            session["participantID"] = pid
+            ParticipantQuestionnaireService(pid).handle_submission(q)
+
+        names = sorted(r.name for r in q.fetch_all_data())
+        assert names == ["Bob", "middle", "old"]
+
     def test_interaction_event_malformed_does_not_lose_others(self, bofs_app):
         bofs_app.config["LOG_QUESTIONNAIRE_INTERACTIONS"] = True
         q = write_questionnaire_file(bofs_app, "grid_q", RADIOGRID_QUESTIONNAIRE)
@@ -1004,6 +1069,121 @@ class TestGroupPriorValues:
         assert sub["prior_listened"] == 10.5
 
 
+# ===========================================================================
+# Question fragment cache (QUESTION_FRAGMENT_CACHE)
+# ===========================================================================
+
+FRAGMENT_QUESTIONNAIRE = {
+    "title": "Fragments",
+    "instructions": "",
+    "questions": [
+        {"questiontype": "field", "id": "name", "instructions": "Name"},
+        {"questiontype": "num_field", "id": "age",
+         "instructions": "Condition {{ condition }}"},
+        {"questiontype": "radiolist", "id": "pick", "labels": ["a", "b"],
+         "shuffle": True},
+        {"questiontype": "slider", "id": "rating"},
+    ],
+}
+
+
+class TestQuestionFragmentCache:
+    def _render(self, app, q, pid):
+        from flask import session
+        with app.test_request_context():
+            session["participantID"] = pid
+            session["condition"] = 1
+            return ParticipantQuestionnaireService(pid).render_questionnaire(q)
+
+    def _participant(self, app):
+        p = app.db.Participant()
+        p.mTurkID = ""
+        p.ipAddress = "127.0.0.1"
+        p.userAgent = "test"
+        p.condition = 1
+        p.finished = False
+        app.db.session.add(p)
+        app.db.session.commit()
+        return p.participantID
+
+    def test_disabled_by_default(self, bofs_app):
+        q = write_questionnaire_file(bofs_app, "fragments", FRAGMENT_QUESTIONNAIRE)
+        self._render(bofs_app, q, self._participant(bofs_app))
+        assert q.fragment_cache == {}
+
+    def test_caches_only_untouched_questions(self, bofs_app):
+        bofs_app.config["QUESTION_FRAGMENT_CACHE"] = True
+        q = write_questionnaire_file(bofs_app, "fragments", FRAGMENT_QUESTIONNAIRE)
+        first = self._render(bofs_app, q, self._participant(bofs_app))
+        # ``age`` is substituted and ``pick`` shuffles; neither is cached.
+        assert sorted(q.fragment_cache) == [(0, ""), (3, "")]
+
+        q.fragment_cache[(0, "")] = (q.fragment_cache[(0, "")][0], "<i>cached name</i>")
+        second = self._render(bofs_app, q, self._participant(bofs_app))
+        assert "<i>cached name</i>" in second
+        assert "<i>cached name</i>" not in first
+
+    def test_prior_value_bypasses_cache(self, bofs_app):
+        bofs_app.config["QUESTION_FRAGMENT_CACHE"] = True
+        q = write_questionnaire_file(bofs_app, "fragments", FRAGMENT_QUESTIONNAIRE)
+        self._render(bofs_app, q, self._participant(bofs_app))
+        q.fragment_cache[(0, "")] = (q.fragment_cache[(0, "")][0], "<i>cached name</i>")
+
+        pid = self._participant(bofs_app)
+        row = q.db_class()
+        row.participantID = pid
+        row.tag = ""
+        row.name = "Alice"
+        bofs_app.db.session.add(row)
+        bofs_app.db.session.commit()
+
+        html = self._render(bofs_app, q, pid)
+        assert "<i>cached name</i>" not in html
+        assert "Alice" in html
+
+    def test_changed_template_invalidates_entry(self, bofs_app):
+        bofs_app.config["QUESTION_FRAGMENT_CACHE"] = True
+        q = write_questionnaire_file(bofs_app, "fragments", FRAGMENT_QUESTIONNAIRE)
+        self._render(bofs_app, q, self._participant(bofs_app))
+        # An entry recorded against other template objects is stale.
+        q.fragment_cache[(0, "")] = ((object(),), "<i>stale</i>")
+        html = self._render(bofs_app, q, self._participant(bofs_app))
+        assert "<i>stale</i>" not in html
+
+    def test_cache_hit_still_requires_participant_in_session(self, bofs_app):
+        bofs_app.config["QUESTION_FRAGMENT_CACHE"] = True
+        q = write_questionnaire_file(bofs_app, "fragments", FRAGMENT_QUESTIONNAIRE)
+        pid = self._participant(bofs_app)
+        self._render(bofs_app, q, pid)
+        assert (0, "") in q.fragment_cache
+
+        from BOFS.services.participant_questionnaire import _QuestionHtml
+        with bofs_app.test_request_context():
+            q_html = _QuestionHtml(q.json_data, "", {}, q)
+            with pytest.raises(Exception, match="No participantID in session"):
+                q_html[0]
+
+    def test_streamed_render_renders_questions_as_reached(self, bofs_app):
+        from flask import session
+        bofs_app.config["QUESTION_FRAGMENT_CACHE"] = True
+        bofs_app.config["STREAM_QUESTIONNAIRES"] = True
+        q = write_questionnaire_file(bofs_app, "fragments", FRAGMENT_QUESTIONNAIRE)
+        pid = self._participant(bofs_app)
+        with bofs_app.test_request_context():
+            session["participantID"] = pid
+            session["condition"] = 1
+            resp = ParticipantQuestionnaireService(pid).render_questionnaire(q)
+            assert resp.is_streamed
+            # Nothing is rendered until the body is iterated.
+            assert q.fragment_cache == {}
+            chunks = list(resp.response)
+
+        assert sorted(q.fragment_cache) == [(0, ""), (3, "")]
+        html = "".join(chunks)
+        assert html.rstrip().endswith("</html>")
+        assert 'name="name"' in html
+
+
 # ===========================================================================
 # TestFetchMethods
 # ===========================================================================
@@ -9,6 +9,7 @@ import copy
 import pytest
 
 from BOFS.expressions import (
+    SubstitutionIndex,
     substitute_in_questionnaire,
     substitute_string,
 )
@@ -270,6 +271,81 @@ class TestSubstituteInQuestionnaire:
         assert original == snapshot
         assert result["title"] == "Hello 2"
 
+    def test_reads_each_questionnaire_once(self, bofs_app):
+        """All placeholders are evaluated against one hydrated env, so
+        piping several answers into the wording costs one query per
+        referenced questionnaire, not one per placeholder."""
+        from sqlalchemy import event
+
+        q = write_questionnaire_file(bofs_app, "survey", SURVEY)
+        p = _create_participant(bofs_app, condition=2)
+        _seed_survey(bofs_app, q, p.participantID, color="blue", age=25)
+        json_data = {
+            "title": "{{ survey.color }} / {{ survey.age }}",
+            "instructions": "{{ survey.age + 1 }} {{ condition }}",
+            "questions": [
+                {"id": "x", "questiontype": "field",
+                 "title": "{{ survey.color }}", "labels": ["{{ survey..age }}"]},
+            ],
+        }
+
+        table = q.db_class.__tablename__
+        statements = []
+
+        def _record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(bofs_app.db.engine, "before_cursor_execute", _record)
+        try:
+            result = substitute_in_questionnaire(json_data, p)
+        finally:
+            event.remove(bofs_app.db.engine, "before_cursor_execute", _record)
+
+        assert result["title"] == "blue / 25"
+        assert result["instructions"] == "26 2"
+        assert result["questions"][0]["title"] == "blue"
+        assert result["questions"][0]["labels"] == ["25"]
+        assert sum(1 for s in statements if f"FROM {table}" in s) == 1
+
+    def test_copies_only_containers_on_placeholder_paths(self, bofs_app):
+        p = _create_participant(bofs_app, condition=2)
+        json_data = {
+            "title": "T",
+            "instructions": "",
+            "questions": [
+                {"id": "a", "questiontype": "field", "title": "Plain"},
+                {"id": "b", "questiontype": "radiolist",
+                 "labels": ["x", "c{{ condition }}"]},
+            ],
+        }
+        result = substitute_in_questionnaire(json_data, p)
+        assert result["questions"][1]["labels"] == ["x", "c2"]
+        assert result["questions"] is not json_data["questions"]
+        assert result["questions"][1] is not json_data["questions"][1]
+        # Untouched question dicts are shared with the cached JSON.
+        assert result["questions"][0] is json_data["questions"][0]
+        assert json_data["questions"][1]["labels"] == ["x", "c{{ condition }}"]
+
+    def test_without_placeholders_returns_input(self, bofs_app):
+        p = _create_participant(bofs_app)
+        json_data = {"title": "T", "instructions": "", "code": "{{ x }}",
+                     "questions": [{"id": "a", "questiontype": "field"}]}
+        assert not SubstitutionIndex(json_data)
+        assert substitute_in_questionnaire(json_data, p) is json_data
+
+    def test_index_records_paths_and_compiled_expressions(self, bofs_app):
+        index = SubstitutionIndex({
+            "title": "{{ condition }} and {{ age < }}",
+            "questions": [
+                {"id": "{{ id }}", "labels": ["a", "{{ condition }}"]},
+            ],
+        })
+        assert [path for path, _ in index.paths] == [
+            ("title",), ("questions", 0, "labels", 1),
+        ]
+        assert set(index.compiled) == {"condition", "age <"}
+        assert index.compiled["age <"] is None
+
     def test_passes_through_non_dict_input(self, bofs_app):
         p = _create_participant(bofs_app)
         # Defensive: non-dict json_data returns unchanged.
@@ -350,6 +426,16 @@ class TestRenderPipelineSubstitution:
         # Top-level instructions placeholder should survive verbatim.
         assert "{{ tables.scores.total }}" in html
 
+    def test_loaded_questionnaire_has_index(self, bofs_app):
+        self._setup(bofs_app)
+        index = bofs_app.questionnaires['survey'].substitution_index
+        assert [path for path, _ in index.paths] == [
+            ("instructions",), ("questions", 0, "instructions"),
+        ]
+        assert set(index.compiled) == {
+            "tables.scores.total", "tables.scores.by_round[1]",
+        }
+
     def test_cached_json_is_not_mutated_by_render(self, bofs_app):
         p = self._setup(bofs_app)
         cached = bofs_app.questionnaires['survey'].json_data
@@ -364,3 +450,33 @@ class TestRenderPipelineSubstitution:
                 .render_questionnaire(bofs_app.questionnaires['survey'])
 
         assert cached == snapshot
+
+    def test_shuffled_options_leave_cached_json_unchanged(self, bofs_app):
+        labels = [f"Option {i}" for i in range(20)]
+        rows = [{"id": f"grid_q{i}", "text": f"Row {i}"} for i in range(20)]
+        write_questionnaire_file(bofs_app, "shuffled", {
+            "title": "Shuffled",
+            "instructions": "",
+            "questions": [
+                {"questiontype": "radiolist", "id": "pick", "labels": labels, "shuffle": True},
+                {"questiontype": "radiogrid", "id": "grid", "labels": ["1", "2"],
+                 "q_text": rows, "shuffle": True},
+            ],
+        })
+        for with_placeholders in (False, True):
+            # Without placeholders the cached dict is rendered as is; with
+            # one only the containers on its path are copied.
+            q = bofs_app.questionnaires['shuffled']
+            if with_placeholders:
+                q.json_data["instructions"] = "{{ 1 + 1 }}"
+                q.substitution_index = SubstitutionIndex(q.json_data)
+            snapshot = copy.deepcopy(q.json_data)
+            p = _create_participant(bofs_app)
+
+            from flask import session
+            with bofs_app.test_request_context():
+                session['participantID'] = p.participantID
+                for _ in range(3):
+                    ParticipantQuestionnaireService(p.participantID).render_questionnaire(q)
+
+            assert q.json_data == snapshot
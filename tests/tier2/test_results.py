@@ -6,6 +6,7 @@ questionnaires in PAGE_LIST.
 """
 
 import os
+import sys
 import time
 from datetime import datetime
 
@@ -173,6 +174,36 @@ class TestQuestionnaireExport:
         data = r.export_data[p.participantID]
         assert data["survey_grid_total"] == 8.0  # 3 + 5
 
+    def test_calculated_fields_match_row_methods(self, bofs_app_with_questionnaires):
+        """Exports evaluate calculations over whole columns; the values must
+        be exactly what each row's calc method returns."""
+        app = bofs_app_with_questionnaires
+        _seed_full_participant(app, survey_data={"g1_q1": 3, "g1_q2": 5})
+        _seed_full_participant(app, survey_data={"g1_q1": None, "g1_q2": 2})
+        _seed_full_participant(app, survey_data={"g1_q1": 1, "g1_q2": 1})
+
+        q = app.questionnaires["survey"]
+        rows = app.db.session.query(q.db_class).filter_by(tag="").all()
+        calculated = q.calculate_fields(rows)
+        assert calculated == {"grid_total": [row.grid_total() for row in rows]}
+        assert calculated["grid_total"] == [8.0, None, 2.0]
+
+        r = Results()
+        assert [r.export_data[row.participantID]["survey_grid_total"] for row in rows] == \
+            [8.0, None, 2.0]
+
+    def test_arithmetic_calculations_skip_vectorizing(self, bofs_app_with_questionnaires, monkeypatch):
+        """``g1_q1 + g1_q2`` is faster row by row than column-wise."""
+        def fail(*args):
+            raise AssertionError("evaluate_columns called")
+        monkeypatch.setattr(sys.modules["BOFS.JSONQuestionnaire"], "evaluate_columns", fail)
+        app = bofs_app_with_questionnaires
+        _seed_full_participant(app, survey_data={"g1_q1": 3, "g1_q2": 5})
+
+        q = app.questionnaires["survey"]
+        rows = app.db.session.query(q.db_class).filter_by(tag="").all()
+        assert q.calculate_fields(rows) == {"grid_total": [8.0]}
+
     def test_duration_column_per_questionnaire(self, bofs_app_with_questionnaires):
         app = bofs_app_with_questionnaires
         p = _seed_full_participant(app, survey_data={
@@ -263,6 +263,7 @@ class TestProgressTracking:
             session["participantID"] = p.participantID
             session["condition"] = 0
             ParticipantRoutingService.from_app().track_progress("consent")
+            app.db.session.commit()
 
         row = app.db.session.query(app.db.Progress).filter_by(
             participantID=p.participantID, path="consent"
@@ -279,12 +280,14 @@ class TestProgressTracking:
             session["participantID"] = p.participantID
             session["condition"] = 0
             ParticipantRoutingService.from_app().track_progress("questionnaire/survey")
+            app.db.session.commit()
 
         # Then a POST closes submittedOn
         with app.test_request_context("/questionnaire/survey", method="POST"):
             session["participantID"] = p.participantID
             session["condition"] = 0
             ParticipantRoutingService.from_app().track_progress("questionnaire/survey")
+            app.db.session.commit()
 
         row = app.db.session.query(app.db.Progress).filter_by(
             participantID=p.participantID, path="questionnaire/survey"
@@ -300,6 +303,105 @@ class TestProgressTracking:
 
         assert app.db.session.query(app.db.Progress).count() == 0
 
+    def test_track_progress_defers_to_one_commit(self, bofs_app_with_questionnaires):
+        from flask import Response
+        from sqlalchemy import event
+        from BOFS.services.routing import commit_tracked_progress
+
+        app = bofs_app_with_questionnaires
+        p = _make_participant(app)
+        commits = []
+        record = lambda s: commits.append(s)
+        event.listen(app.db.session, "after_commit", record)
+        try:
+            with app.test_request_context("/questionnaire/survey", method="POST"):
+                session["participantID"] = p.participantID
+                ParticipantRoutingService.from_app().track_progress("questionnaire/survey")
+                assert commits == []
+                commit_tracked_progress(Response())
+        finally:
+            event.remove(app.db.session, "after_commit", record)
+
+        assert len(commits) == 1
+        app.db.session.expire_all()
+        row = app.db.session.query(app.db.Progress).filter_by(participantID=p.participantID).one()
+        assert row.submittedOn == row.startedOn
+        assert app.db.session.get(app.db.Participant, p.participantID).lastActiveOn == row.startedOn
+
+    def test_track_progress_rides_on_view_commit(self, bofs_app_with_questionnaires):
+        from flask import Response, g
+        from BOFS.services.routing import commit_tracked_progress
+
+        app = bofs_app_with_questionnaires
+        p = _make_participant(app)
+        with app.test_request_context("/consent", method="GET"):
+            session["participantID"] = p.participantID
+            ParticipantRoutingService.from_app().track_progress("consent")
+            app.db.session.commit()  # the view's own commit
+            assert "bofs_tracked_progress" not in g
+            commit_tracked_progress(Response())
+
+        assert app.db.session.query(app.db.Progress).count() == 1
+
+    def test_track_progress_writes_nothing_before_commit(self, bofs_app_with_questionnaires):
+        # The writes must not open a transaction (and take SQLite's write
+        # lock) for the whole view; they go out with the commit.
+        from sqlalchemy import event
+
+        app = bofs_app_with_questionnaires
+        p = _make_participant(app)
+        statements = []
+        record = lambda conn, cursor, statement, *args: \
+            statements.append(statement) if statement.lstrip().startswith(("INSERT", "UPDATE")) else None
+        event.listen(app.db.engine, "before_cursor_execute", record)
+        try:
+            with app.test_request_context("/questionnaire/survey", method="GET"):
+                session["participantID"] = p.participantID
+                ParticipantRoutingService.from_app().track_progress("questionnaire/survey")
+                assert statements == []
+                app.db.session.commit()
+        finally:
+            event.remove(app.db.engine, "before_cursor_execute", record)
+
+        assert len(statements) == 2
+        assert app.db.session.query(app.db.Progress).count() == 1
+
+    def test_close_progress_closes_staged_row(self, bofs_app_with_questionnaires):
+        app = bofs_app_with_questionnaires
+        p = _make_participant(app)
+        with app.test_request_context("/consent", method="GET"):
+            session["participantID"] = p.participantID
+            service = ParticipantRoutingService.from_app()
+            service.track_progress("consent")
+            service.close_progress("consent")
+            app.db.session.commit()
+
+        row = app.db.session.query(app.db.Progress).filter_by(participantID=p.participantID).one()
+        assert row.submittedOn is not None
+
+    def test_track_progress_upsert_keeps_started_on(self, bofs_app_with_questionnaires):
+        app = bofs_app_with_questionnaires
+        p = _make_participant(app)
+        for method in ("GET", "GET", "POST"):
+            with app.test_request_context("/questionnaire/survey", method=method):
+                session["participantID"] = p.participantID
+                ParticipantRoutingService.from_app().track_progress("questionnaire/survey")
+                app.db.session.commit()
+
+        rows = app.db.session.query(app.db.Progress).filter_by(participantID=p.participantID).all()
+        assert len(rows) == 1
+        assert rows[0].submittedOn is not None
+        assert rows[0].submittedOn >= rows[0].startedOn
+
+    def test_track_progress_skips_deleted_participant(self, bofs_app_with_questionnaires):
+        app = bofs_app_with_questionnaires
+        with app.test_request_context("/consent", method="GET"):
+            session["participantID"] = 9999
+            ParticipantRoutingService.from_app().track_progress("consent")
+            app.db.session.commit()
+
+        assert app.db.session.query(app.db.Progress).count() == 0
+
     def test_close_progress_sets_submitted(self, bofs_app_with_questionnaires):
         app = bofs_app_with_questionnaires
         p = _make_participant(app)
@@ -430,6 +532,7 @@ class TestCursorOccurrence:
             session["currentOccurrence"] = 1
             service = ParticipantRoutingService.from_app()
             service.track_progress("instructions/intro")
+            app.db.session.commit()
 
         rows = app.db.session.query(app.db.Progress).filter_by(
             participantID=p.participantID, path="instructions/intro"
@@ -466,6 +569,7 @@ class TestCursorOccurrence:
             assert session["currentOccurrence"] == 1
 
             service.track_progress("instructions/intro")
+            app.db.session.commit()
 
         rows = app.db.session.query(app.db.Progress).filter_by(
             participantID=p.participantID, path="instructions/intro"
@@ -107,9 +107,34 @@ class TestOpenSession:
 
         assert s.new is True
         assert s.sessionID is not None
-        # Should have created a SessionStore record
+        # The row is deferred until save_session has something to store.
         stored = bofs_app.db.session.get(bofs_app.db.SessionStore, s.sessionID)
-        assert stored is not None
+        assert stored is None
+
+    def test_unknown_cookie_does_not_create_row(self, bofs_app):
+        interface = bofs_app.session_interface
+        cookie_name = interface.get_cookie_name(bofs_app)
+
+        builder = EnvironBuilder(method="GET", path="/")
+        request = builder.get_request()
+        request.cookies = {cookie_name: "no-such-row"}
+
+        s = interface.open_session(bofs_app, request)
+
+        assert s.new is True
+        assert s.sessionID == "no-such-row"
+        assert bofs_app.db.session.get(bofs_app.db.SessionStore, "no-such-row") is None
+
+    def test_static_request_gets_null_session(self, bofs_app):
+        interface = bofs_app.session_interface
+        builder = EnvironBuilder(method="GET", path="/BOFS_static/style.css")
+        request = builder.get_request()
+
+        s = interface.open_session(bofs_app, request)
+
+        assert interface.is_null_session(s)
+        assert "participantID" not in s
+        assert bofs_app.db.session.query(bofs_app.db.SessionStore).count() == 0
 
     def test_valid_cookie_loads_data(self, bofs_app):
         interface = bofs_app.session_interface
@@ -198,6 +223,158 @@ class TestSaveSession:
         assert stored.participantID == 99
 
 
+    def test_recent_expiry_is_not_rewritten(self, bofs_app):
+        from werkzeug.wrappers import Response
+        interface = bofs_app.session_interface
+        session_id = "expiry-throttle"
+        row = interface.create_db_object(bofs_app, session_id)
+        recent = utcnow_naive() + bofs_app.permanent_session_lifetime - timedelta(minutes=1)
+        row.expiry = recent
+        bofs_app.db.session.commit()
+
+        s = BOFSSession(None, sessionID=session_id, new=False)
+        s["currentUrl"] = "questionnaire/survey"
+        interface.save_session(bofs_app, s, Response())
+
+        stored = bofs_app.db.session.get(bofs_app.db.SessionStore, session_id)
+        assert stored.expiry == recent
+        assert interface.serializer.loads(stored.data)["currentUrl"] == "questionnaire/survey"
+
+    def test_stale_expiry_is_extended(self, bofs_app):
+        from werkzeug.wrappers import Response
+        interface = bofs_app.session_interface
+        session_id = "expiry-extend"
+        row = interface.create_db_object(bofs_app, session_id)
+        stale = utcnow_naive() + timedelta(days=1)
+        row.expiry = stale
+        bofs_app.db.session.commit()
+
+        s = BOFSSession(None, sessionID=session_id, new=False)
+        s["currentUrl"] = "questionnaire/survey"
+        interface.save_session(bofs_app, s, Response())
+
+        stored = bofs_app.db.session.get(bofs_app.db.SessionStore, session_id)
+        assert stored.expiry > stale + timedelta(days=1)
+
+    def test_refresh_fraction_zero_always_extends(self, bofs_app):
+        from werkzeug.wrappers import Response
+        bofs_app.config['SESSION_EXPIRY_REFRESH_FRACTION'] = 0
+        interface = bofs_app.session_interface
+        session_id = "expiry-always"
+        row = interface.create_db_object(bofs_app, session_id)
+        recent = utcnow_naive() + bofs_app.permanent_session_lifetime - timedelta(minutes=1)
+        row.expiry = recent
+        bofs_app.db.session.commit()
+
+        s = BOFSSession(None, sessionID=session_id, new=False)
+        s["currentUrl"] = "questionnaire/survey"
+        interface.save_session(bofs_app, s, Response())
+
+        stored = bofs_app.db.session.get(bofs_app.db.SessionStore, session_id)
+        assert stored.expiry > recent
+
+    def test_unchanged_session_does_not_commit(self, bofs_app):
+        from sqlalchemy import event
+        from werkzeug.wrappers import Response
+        interface = bofs_app.session_interface
+        session_id = "no-op-save"
+        row = interface.create_db_object(bofs_app, session_id)
+        row.data = interface.serializer.dumps({"currentUrl": "end"})
+        row.expiry = utcnow_naive() + bofs_app.permanent_session_lifetime
+        bofs_app.db.session.commit()
+
+        commits = []
+        listener = lambda session: commits.append(session)
+        event.listen(bofs_app.db.session, "after_commit", listener)
+        try:
+            s = BOFSSession({"currentUrl": "end"}, sessionID=session_id, new=False)
+            s["currentUrl"] = "end"  # Marks modified without changing anything.
+            interface.save_session(bofs_app, s, Response())
+        finally:
+            event.remove(bofs_app.db.session, "after_commit", listener)
+
+        assert commits == []
+
+    def test_new_session_row_created_in_one_commit(self, bofs_app):
+        from sqlalchemy import event
+        from werkzeug.wrappers import Response
+        interface = bofs_app.session_interface
+
+        commits = []
+        listener = lambda session: commits.append(session)
+        event.listen(bofs_app.db.session, "after_commit", listener)
+        try:
+            s = BOFSSession(None, sessionID="one-commit", new=True)
+            s["participantID"] = 5
+            interface.save_session(bofs_app, s, Response())
+        finally:
+            event.remove(bofs_app.db.session, "after_commit", listener)
+
+        assert len(commits) == 1
+        stored = bofs_app.db.session.get(bofs_app.db.SessionStore, "one-commit")
+        assert stored.participantID == 5
+        assert stored.expiry is not None
+
+    def test_page_view_commits_session_and_progress_once(self, bofs_app):
+        from sqlalchemy import event
+
+        def touch_page():
+            session["visits"] = session.get("visits", 0) + 1
+            return "ok"
+        bofs_app.add_url_rule("/touch_page", view_func=touch_page)
+
+        p = bofs_app.db.Participant()
+        p.ipAddress = ""
+        p.userAgent = ""
+        bofs_app.db.session.add(p)
+        bofs_app.db.session.commit()
+
+        client = bofs_app.test_client()
+        with client.session_transaction() as s:
+            s["participantID"] = p.participantID
+            s["currentUrl"] = "touch_page"
+
+        commits = []
+        listener = lambda session: commits.append(session)
+        event.listen(bofs_app.db.session, "after_commit", listener)
+        try:
+            assert client.get("/touch_page").status_code == 200
+        finally:
+            event.remove(bofs_app.db.session, "after_commit", listener)
+
+        assert len(commits) == 1
+        bofs_app.db.session.expire_all()
+        assert bofs_app.db.session.query(bofs_app.db.Progress).filter_by(
+            participantID=p.participantID, path="touch_page").count() == 1
+        with client.session_transaction() as s:
+            assert s["visits"] == 1
+
+    def test_new_session_persisted_on_first_write(self, bofs_app):
+        from werkzeug.wrappers import Response
+        interface = bofs_app.session_interface
+        s = interface.open_session(bofs_app, EnvironBuilder(method="GET", path="/").get_request())
+        s["participantID"] = 8
+
+        response = Response()
+        interface.save_session(bofs_app, s, response)
+
+        stored = bofs_app.db.session.get(bofs_app.db.SessionStore, s.sessionID)
+        assert stored is not None
+        assert stored.participantID == 8
+        assert interface.get_cookie_name(bofs_app) in response.headers.get("Set-Cookie", "")
+
+    def test_empty_new_session_is_not_persisted(self, bofs_app):
+        from werkzeug.wrappers import Response
+        interface = bofs_app.session_interface
+        s = interface.open_session(bofs_app, EnvironBuilder(method="GET", path="/").get_request())
+
+        response = Response()
+        interface.save_session(bofs_app, s, response)
+
+        assert bofs_app.db.session.query(bofs_app.db.SessionStore).count() == 0
+        assert "Set-Cookie" not in response.headers
+
+
 # ===========================================================================
 # TestRegenerate
 # ===========================================================================
@@ -234,3 +411,325 @@ class TestRegenerate:
         # save_session only emits Set-Cookie when session.new is True.
         assert s.new is True
         assert s.modified is True
+
+
+# ===========================================================================
+# TestSessionCache — optional in-process LRU in front of SessionStore
+# ===========================================================================
+
+def _request_with_cookie(interface, app, session_id):
+    builder = EnvironBuilder(method="GET", path="/")
+    request = builder.get_request()
+    request.cookies = {interface.get_cookie_name(app): session_id}
+    return request
+
+
+class TestSessionCache:
+    def _cached_interface(self, app, size=4, flush_seconds=0):
+        app.config['SESSION_CACHE_SIZE'] = size
+        app.config['SESSION_CACHE_FLUSH_SECONDS'] = flush_seconds
+        return BOFSSessionInterface()
+
+    def test_disabled_by_default(self, bofs_app):
+        assert BOFSSessionInterface().get_cache(bofs_app) is None
+
+    def test_hit_skips_database(self, bofs_app, monkeypatch):
+        from werkzeug.wrappers import Response
+        interface = self._cached_interface(bofs_app)
+        session_id = "cache-hit"
+        interface.create_db_object(bofs_app, session_id)
+
+        s = BOFSSession(None, sessionID=session_id, new=False)
+        s["participantID"] = 7
+        interface.save_session(bofs_app, s, Response())
+
+        def _fail(*args, **kwargs):
+            raise AssertionError("cache hit should not query SessionStore")
+        monkeypatch.setattr(bofs_app.db.session, "get", _fail)
+
+        loaded = interface.open_session(
+            bofs_app, _request_with_cookie(interface, bofs_app, session_id)
+        )
+        assert loaded["participantID"] == 7
+        assert loaded.new is False
+        interface.save_session(bofs_app, loaded, Response())
+
+    def test_write_through_by_default(self, bofs_app):
+        from werkzeug.wrappers import Response
+        interface = self._cached_interface(bofs_app)
+        session_id = "cache-write-through"
+        interface.create_db_object(bofs_app, session_id)
+
+        s = BOFSSession(None, sessionID=session_id, new=False)
+        s["participantID"] = 11
+        interface.save_session(bofs_app, s, Response())
+
+        stored = bofs_app.db.session.get(bofs_app.db.SessionStore, session_id)
+        assert interface.serializer.loads(stored.data)["participantID"] == 11
+        assert stored.participantID == 11
+
+    def test_flush_interval_defers_write(self, bofs_app):
+        from werkzeug.wrappers import Response
+        interface = self._cached_interface(bofs_app, flush_seconds=3600)
+        session_id = "cache-deferred"
+        interface.create_db_object(bofs_app, session_id)
+
+        s = BOFSSession(None, sessionID=session_id, new=False)
+        s["currentUrl"] = "questionnaire/survey"
+        interface.save_session(bofs_app, s, Response())
+
+        stored = bofs_app.db.session.get(bofs_app.db.SessionStore, session_id)
+        assert stored.data is None
+
+        interface.flush(bofs_app)
+        bofs_app.db.session.refresh(stored)
+        assert interface.serializer.loads(stored.data)["currentUrl"] == "questionnaire/survey"
+
+    def test_eviction_writes_back_dirty_entry(self, bofs_app):
+        from werkzeug.wrappers import Response
+        interface = self._cached_interface(bofs_app, size=1, flush_seconds=3600)
+        for session_id in ("evict-a", "evict-b"):
+            interface.create_db_object(bofs_app, session_id)
+            s = BOFSSession(None, sessionID=session_id, new=False)
+            s["marker"] = session_id
+            interface.save_session(bofs_app, s, Response())
+
+        assert len(interface.get_cache(bofs_app)) == 1
+        stored = bofs_app.db.session.get(bofs_app.db.SessionStore, "evict-a")
+        assert interface.serializer.loads(stored.data)["marker"] == "evict-a"
+
+    def test_cached_dict_is_not_shared(self, bofs_app):
+        from werkzeug.wrappers import Response
+        interface = self._cached_interface(bofs_app)
+        session_id = "cache-copy"
+        interface.create_db_object(bofs_app, session_id)
+        s = BOFSSession(None, sessionID=session_id, new=False)
+        s["items"] = [1]
+        interface.save_session(bofs_app, s, Response())
+
+        request = _request_with_cookie(interface, bofs_app, session_id)
+        first = interface.open_session(bofs_app, request)
+        first["items"].append(2)
+        second = interface.open_session(bofs_app, request)
+        assert second["items"] == [1]
+
+    def test_expired_entry_is_dropped(self, bofs_app):
+        interface = self._cached_interface(bofs_app)
+        session_id = "cache-expired"
+        cache = interface.get_cache(bofs_app)
+        cache.put(session_id, {"old": "data"}, utcnow_naive() - timedelta(days=1))
+
+        s = interface.open_session(
+            bofs_app, _request_with_cookie(interface, bofs_app, session_id)
+        )
+        assert s.new is True
+        assert "old" not in s
+
+    def test_regenerate_discards_old_entry(self, bofs_app):
+        from werkzeug.wrappers import Response
+        interface = self._cached_interface(bofs_app)
+        old_id = "cache-rotate"
+        interface.create_db_object(bofs_app, old_id)
+        s = BOFSSession(None, sessionID=old_id, new=False)
+        s["participantID"] = 3
+        interface.save_session(bofs_app, s, Response())
+
+        interface.regenerate(bofs_app, s)
+
+        assert interface.get_cache(bofs_app).get(old_id) is None
+
+
+# ===========================================================================
+# TestCookieBackend — SESSION_BACKEND = "cookie"
+# ===========================================================================
+
+def _set_cookie_value(response):
+    header = response.headers.get("Set-Cookie", "")
+    return header.split(";", 1)[0].split("=", 1)[1]
+
+
+class TestCookieBackend:
+    @pytest.fixture(autouse=True)
+    def _cookie_backend(self, bofs_app):
+        bofs_app.config['SESSION_BACKEND'] = "cookie"
+
+    def _save(self, app, s):
+        from werkzeug.wrappers import Response
+        response = Response()
+        app.session_interface.save_session(app, s, response)
+        return response
+
+    def test_round_trip_without_session_store(self, bofs_app):
+        interface = bofs_app.session_interface
+        s = interface.open_session(bofs_app, EnvironBuilder(method="GET", path="/").get_request())
+        s["currentUrl"] = "consent"
+        s["currentOccurrence"] = 0
+
+        value = _set_cookie_value(self._save(bofs_app, s))
+        loaded = interface.open_session(
+            bofs_app, _request_with_cookie(interface, bofs_app, value)
+        )
+
+        assert loaded.new is False
+        assert loaded.sessionID == s.sessionID
+        assert loaded["currentUrl"] == "consent"
+        assert bofs_app.db.session.query(bofs_app.db.SessionStore).count() == 0
+
+    def test_recovery_keys_mirrored_only_when_changed(self, bofs_app):
+        from sqlalchemy import event
+        interface = bofs_app.session_interface
+        s = interface.open_session(bofs_app, EnvironBuilder(method="GET", path="/").get_request())
+        s["participantID"] = 12
+        s["externalID"] = "WORKER"
+        value = _set_cookie_value(self._save(bofs_app, s))
+
+        stored = bofs_app.db.session.get(bofs_app.db.SessionStore, s.sessionID)
+        assert stored.participantID == 12
+        assert stored.externalID == "WORKER"
+        assert interface.serializer.loads(stored.data) == {
+            "participantID": 12, "externalID": "WORKER",
+        }
+
+        loaded = interface.open_session(
+            bofs_app, _request_with_cookie(interface, bofs_app, value)
+        )
+        commits = []
+        listener = lambda session: commits.append(session)
+        event.listen(bofs_app.db.session, "after_commit", listener)
+        try:
+            loaded["currentUrl"] = "questionnaire/survey"
+            self._save(bofs_app, loaded)
+        finally:
+            event.remove(bofs_app.db.session, "after_commit", listener)
+        assert commits == []
+
+    def test_tampered_cookie_gives_blank_session(self, bofs_app):
+        interface = bofs_app.session_interface
+        s = interface.open_session(bofs_app, EnvironBuilder(method="GET", path="/").get_request())
+        s["participantID"] = 1
+        value = _set_cookie_value(self._save(bofs_app, s))
+
+        loaded = interface.open_session(
+            bofs_app, _request_with_cookie(interface, bofs_app, value[:-2] + "xx")
+        )
+        assert loaded.new is True
+        assert "participantID" not in loaded
+
+    def test_database_session_cookie_is_carried_over(self, bofs_app):
+        interface = bofs_app.session_interface
+        session_id = "pre-switch-session"
+        stored = interface.create_db_object(bofs_app, session_id)
+        stored.data = interface.serializer.dumps({"participantID": 4, "currentUrl": "end"})
+        bofs_app.db.session.commit()
+
+        loaded = interface.open_session(
+            bofs_app, _request_with_cookie(interface, bofs_app, session_id)
+        )
+
+        assert loaded.sessionID == session_id
+        assert loaded["currentUrl"] == "end"
+        assert loaded.new is True  # Re-issued as a signed cookie on save.
+
+
+# ===========================================================================
+# TestSessionSerializers — SESSION_SERIALIZER formats and mixed-format reads
+# ===========================================================================
+
+class TestSessionSerializers:
+    SESSION = {
+        "participantID": 17,
+        "condition": 2,
+        "currentUrl": "questionnaire/survey/before",
+        "currentOccurrence": 1,
+        "externalID": "WORKER",
+        "mTurkID": "WORKER",
+        "loggedIn": False,
+    }
+
+    def test_orjson_output_is_prefixed(self):
+        from BOFS.BOFSSession import OrjsonSessionSerializer
+        blob = OrjsonSessionSerializer().dumps(self.SESSION)
+        assert blob.startswith(OrjsonSessionSerializer.prefix)
+        assert OrjsonSessionSerializer().loads(blob) == self.SESSION
+
+    def test_every_serializer_reads_every_format(self):
+        from BOFS.BOFSSession import SESSION_SERIALIZERS
+        blobs = [cls().dumps(self.SESSION) for cls in SESSION_SERIALIZERS.values()]
+        for cls in SESSION_SERIALIZERS.values():
+            for blob in blobs:
+                assert cls().loads(blob) == self.SESSION
+
+    def test_base_serializer_decodes_its_own_payload(self):
+        from BOFS.BOFSSession import SessionSerializer
+        serializer = SessionSerializer()
+        assert serializer.decode(serializer.dumps(self.SESSION)) == self.SESSION
+
+    def test_orjson_falls_back_for_tagged_values(self):
+        from BOFS.BOFSSession import OrjsonSessionSerializer
+        from markupsafe import Markup
+        value = {"when": utcnow_naive(), "pair": (1, 2), "html": Markup("<b>x</b>")}
+        blob = OrjsonSessionSerializer().dumps(value)
+        assert not blob.startswith(OrjsonSessionSerializer.prefix)
+        loaded = OrjsonSessionSerializer().loads(blob)
+        assert loaded["pair"] == (1, 2)
+        assert isinstance(loaded["html"], Markup)
+        assert loaded["when"].replace(tzinfo=None) == value["when"].replace(microsecond=0)
+
+    def test_stdlib_fallback_writes_same_format(self, monkeypatch):
+        import BOFS.BOFSSession as session_module
+        with_orjson = session_module.OrjsonSessionSerializer().dumps(self.SESSION)
+        monkeypatch.setattr(session_module, "orjson", None)
+        without = session_module.OrjsonSessionSerializer().dumps(self.SESSION)
+        assert session_module.OrjsonSessionSerializer().loads(with_orjson) == self.SESSION
+        assert session_module.OrjsonSessionSerializer().loads(without) == self.SESSION
+
+    def test_switching_serializer_keeps_existing_sessions(self, bofs_app):
+        session_id = "tagged-row"
+        legacy = BOFSSessionInterface()
+        stored = legacy.create_db_object(bofs_app, session_id)
+        stored.data = legacy.get_serializer(bofs_app).dumps(self.SESSION)
+        bofs_app.db.session.commit()
+
+        bofs_app.config['SESSION_SERIALIZER'] = "orjson"
+        interface = BOFSSessionInterface()
+        loaded = interface.open_session(
+            bofs_app, _request_with_cookie(interface, bofs_app, session_id)
+        )
+        assert dict(loaded) == self.SESSION
+
+        from werkzeug.wrappers import Response
+        loaded["currentOccurrence"] = 2
+        interface.save_session(bofs_app, loaded, Response())
+        stored = bofs_app.db.session.get(bofs_app.db.SessionStore, session_id)
+        assert stored.data.startswith("oj1:")
+        # The class-level serializer (used by session recovery) still reads it.
+        assert BOFSSessionInterface.serializer.loads(stored.data)["currentOccurrence"] == 2
+
+    def test_unknown_serializer_reported(self, tmp_path):
+        import os
+        import toml
+        config_data = {
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "SECRET_KEY": "test-secret-key",
+            "TITLE": "Serializer Config",
+            "USE_ADMIN": False,
+            "CHECK_FOR_UPDATES": False,
+            "SESSION_SERIALIZER": "pickle",
+            "PAGE_LIST": [{"name": "End", "path": "end"}],
+        }
+        (tmp_path / "questionnaires").mkdir()
+        (tmp_path / "consent.html").write_text("<p>Consent</p>", encoding="utf-8")
+        config_path = tmp_path / "config.toml"
+        config_path.write_text(toml.dumps(config_data), encoding="utf-8")
+        original_cwd = os.getcwd()
+        try:
+            from BOFS.create_app import create_app
+            app = create_app(str(tmp_path), str(config_path))
+        finally:
+            os.chdir(original_cwd)
+
+        assert app.config['SESSION_SERIALIZER'] == "tagged_json"
+        assert any(
+            d.source == "SESSION_SERIALIZER"
+            for d in app.setup_diagnostics.by_severity("warning")
+        )
@@ -0,0 +1,86 @@
+"""Tier 2 tests for the ``ENABLE_LOGGING`` JSONL submission log.
+
+Uses the ``bofs_app`` fixture from conftest.py. The log is written by a
+listener thread, so every test stops the log before reading the file.
+"""
+
+import gzip
+import json
+import os
+
+from flask import session
+from werkzeug.datastructures import MultiDict
+
+from BOFS.services.participant_questionnaire import ParticipantQuestionnaireService
+from BOFS.services.submission_log import MAX_VALUE_CHARS, SubmissionLog
+from tests.conftest import write_questionnaire_file
+
+
+SIMPLE = {
+    "title": "Simple",
+    "instructions": "",
+    "questions": [
+        {"questiontype": "field", "id": "name", "instructions": "Name?"},
+    ],
+}
+
+
+def _read_lines(path, opener=open):
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class TestSubmissionLog:
+    def test_disabled_by_default(self, bofs_app):
+        assert bofs_app.get_submission_log() is None
+
+    def test_submission_is_logged_as_json_line(self, bofs_app):
+        bofs_app.config["ENABLE_LOGGING"] = True
+        q = write_questionnaire_file(bofs_app, "simple", SIMPLE)
+        with bofs_app.test_request_context("/questionnaire/simple/t1", method="POST", data={
+            "timeStarted": "2024-01-01 12:00:00",
+            "name": "Alice",
+            "questionnaireInteractions": "",
+        }):
+            session["participantID"] = 7
+            ParticipantQuestionnaireService(7).handle_submission(q, "t1")
+
+        log = bofs_app.submission_log
+        log.stop()
+
+        assert log.path == os.path.join(bofs_app.root_path, "logs", "submissions.jsonl")
+        [entry] = _read_lines(log.path)
+        assert entry["participantID"] == 7
+        assert entry["questionnaire"] == "simple"
+        assert entry["tag"] == "t1"
+        assert entry["timeStarted"] == "2024-01-01 12:00:00"
+        assert entry["form"]["name"] == "Alice"
+
+    def test_repeated_keys_and_long_values(self, bofs_app):
+        log = SubmissionLog(bofs_app)
+        log.start()
+        log.log(1, "simple", "", None, MultiDict([
+            ("pick", "a"), ("pick", "b"), ("essay", "x" * (MAX_VALUE_CHARS + 10)),
+        ]))
+        log.stop()
+
+        [entry] = _read_lines(log.path)
+        assert entry["form"]["pick"] == ["a", "b"]
+        assert entry["form"]["essay"].startswith("x" * MAX_VALUE_CHARS + "... (truncated")
+
+    def test_rotates_by_size_and_gzips_old_files(self, bofs_app):
+        bofs_app.config["SUBMISSION_LOG_MAX_BYTES"] = 300
+        bofs_app.config["SUBMISSION_LOG_BACKUP_COUNT"] = 2
+        bofs_app.config["SUBMISSION_LOG_GZIP"] = True
+        log = SubmissionLog(bofs_app)
+        log.start()
+        for pid in range(6):
+            log.log(pid, "simple", "", None, MultiDict({"name": "n" * 100}))
+        log.stop()
+
+        log_dir = os.path.dirname(log.path)
+        assert sorted(os.listdir(log_dir)) == [
+            "submissions.jsonl", "submissions.jsonl.1.gz", "submissions.jsonl.2.gz",
+        ]
+        rotated = _read_lines(os.path.join(log_dir, "submissions.jsonl.1.gz"), gzip.open)
+        assert all(entry["form"]["name"] == "n" * 100 for entry in rotated)
@@ -332,6 +332,104 @@ class TestPageShowIf:
         assert "questionnaire/followup" in paths
 
 
+class TestPageShowIfBatching:
+    """Every ``show_if`` evaluated while one flat page list is built shares
+    a single load of each referenced questionnaire."""
+
+    @pytest.fixture
+    def app_with_several_gates(self, tmp_path):
+        import os
+        import json
+        import toml
+
+        DEMOG = {
+            "title": "Demographics",
+            "instructions": "",
+            "questions": [
+                {"questiontype": "num_field", "id": "age",
+                 "instructions": "Enter age"},
+            ],
+        }
+        FOLLOWUP = {
+            "title": "Followup",
+            "instructions": "",
+            "questions": [
+                {"questiontype": "field", "id": "guardian",
+                 "instructions": "Guardian"},
+            ],
+        }
+
+        q_dir = tmp_path / "questionnaires"
+        q_dir.mkdir()
+        (q_dir / "demographics.json").write_text(
+            json.dumps(DEMOG), encoding="utf-8")
+        (q_dir / "followup.json").write_text(
+            json.dumps(FOLLOWUP), encoding="utf-8")
+        (tmp_path / "consent.html").write_text("<p>Consent</p>",
+                                                encoding="utf-8")
+
+        config_data = {
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "SECRET_KEY": "test-secret-key",
+            "TITLE": "Test",
+            "ADMIN_PASSWORD": "test",
+            "USE_ADMIN": False,
+            "PAGE_LIST": [
+                {"name": "Consent", "path": "consent"},
+                {"name": "Demographics", "path": "questionnaire/demographics"},
+                {"name": "Minor", "path": "questionnaire/followup/minor",
+                 "show_if": "demographics.age < 18"},
+                {"name": "Adult", "path": "questionnaire/followup/adult",
+                 "show_if": "demographics..age >= 18"},
+                {"name": "Senior", "path": "questionnaire/followup/senior",
+                 "show_if": "age >= 65"},
+                {"name": "End", "path": "end"},
+            ],
+        }
+        config_path = tmp_path / "config.toml"
+        config_path.write_text(toml.dumps(config_data), encoding="utf-8")
+
+        original_cwd = os.getcwd()
+        from BOFS.create_app import create_app
+        app = create_app(str(tmp_path), str(config_path), debug=False)
+        ctx = app.app_context()
+        ctx.push()
+        yield app
+        app.db.drop_all()
+        ctx.pop()
+        os.chdir(original_cwd)
+
+    def test_one_query_per_referenced_questionnaire(self, app_with_several_gates):
+        from sqlalchemy import event
+
+        app = app_with_several_gates
+        client = app.test_client()
+        pid = create_participant_via_consent(client, app)
+        submit_questionnaire_data(client, "demographics", data_dict={"age": "30"})
+
+        table = app.questionnaires["demographics"].db_class.__tablename__
+        statements = []
+
+        def _record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(app.db.engine, "before_cursor_execute", _record)
+        try:
+            with app.test_request_context():
+                from flask import session
+                session["participantID"] = pid
+                session["condition"] = 1
+                paths = [p["path"] for p in app.page_list.flat_page_list()]
+        finally:
+            event.remove(app.db.engine, "before_cursor_execute", _record)
+
+        assert paths == [
+            "consent", "questionnaire/demographics",
+            "questionnaire/followup/adult", "end",
+        ]
+        assert sum(1 for s in statements if f"FROM {table}" in s) == 1
+
+
 class TestPageShowIfTags:
     """Verify that page-level ``show_if`` can reference a *specific tagged*
     submission of a questionnaire (``qname.tag.field``) and pick the right
@@ -5,6 +5,7 @@ radio-grid logging, and calculated fields.
 """
 
 import json
+import re
 from datetime import datetime
 
 import pytest
@@ -108,6 +109,50 @@ class TestTagging:
 # Question types and field values
 # ===========================================================================
 
+class TestStreamedRendering:
+    def test_streamed_page_matches_buffered_page(self, bofs_app_with_questionnaires):
+        app = bofs_app_with_questionnaires
+        client = app.test_client()
+        create_participant_via_consent(client, app)
+
+        buffered = client.get("/questionnaire/survey")
+        app.config["STREAM_QUESTIONNAIRES"] = True
+        streamed = client.get("/questionnaire/survey")
+
+        assert streamed.status_code == 200
+        html = streamed.data.decode("utf-8")
+        # timeStarted differs between the two renders; nothing else may.
+        strip = lambda page: re.sub(r'name="timeStarted" value="[^"]*"', "", page)
+        assert strip(html) == strip(buffered.data.decode("utf-8"))
+        for name in ("name", "rating", "age", "g1_q1"):
+            assert f'name="{name}"' in html
+
+    def test_streamed_page_gets_activity_script_once(self, bofs_app_with_questionnaires):
+        app = bofs_app_with_questionnaires
+        app.config["STREAM_QUESTIONNAIRES"] = True
+        client = app.test_client()
+        create_participant_via_consent(client, app)
+
+        html = client.get("/questionnaire/survey").data.decode("utf-8")
+        tag = '<script src="/BOFS_static/js/user_active.js" data-interval="100"></script>'
+        assert html.count(tag) == 1
+        assert html.index(tag) < html.rindex("</body>")
+
+    def test_streamed_page_can_be_submitted(self, bofs_app_with_questionnaires):
+        app = bofs_app_with_questionnaires
+        app.config["STREAM_QUESTIONNAIRES"] = True
+        client = app.test_client()
+        create_participant_via_consent(client, app)
+
+        client.get("/questionnaire/survey").close()
+        resp = submit_questionnaire_data(client, "survey", data_dict={
+            "name": "A", "rating": "4", "age": "30",
+            "g1_q1": "3", "g1_q2": "5",
+        }, follow_redirects=False)
+        assert resp.status_code == 302
+        assert len(app.questionnaires["survey"].fetch_all_data()) == 1
+
+
 class TestQuestionTypes:
     def test_radiogrid_values_saved(self, bofs_app_with_questionnaires):
         app = bofs_app_with_questionnaires
@@ -318,6 +363,19 @@ class TestShowIfRendering:
         assert "bofs_expressions.js" in html
         assert "questionnaire_branching.js" in html
 
+    def test_dependency_map_is_emitted(self, bofs_app_with_show_if):
+        app = bofs_app_with_show_if
+        questions = app.questionnaires["branched"].json_data["questions"]
+        assert questions[1]["_show_if_fields"] == ["age"]
+        assert app.questionnaires["branched"].json_data["_show_if_dependencies"] == {"age": [1]}
+
+        client = app.test_client()
+        create_participant_via_consent(client, app)
+        html = client.get("/questionnaire/branched").data.decode("utf-8")
+        assert ('<script type="application/json" id="bofs-show-if-dependencies">'
+                '{"age": [1]}</script>') in html
+        assert 'data-show-if-index="1"' in html
+
     def test_unconditional_question_has_no_show_if_attribute(
         self, bofs_app_with_show_if
     ):
@@ -341,3 +341,65 @@ class TestSessionRecovery:
         app.db.session.expire_all()
         p = app.db.session.get(app.db.Participant, pid)
         assert p.mTurkID == "ABC123"
+
+    # ------------------------------------------------------------------
+    # 8. cookie session backend: cursor rebuilt from Progress
+    # ------------------------------------------------------------------
+    def test_recovery_with_cookie_backend(self, bofs_app_with_external_id):
+        """With SESSION_BACKEND = "cookie" the SessionStore row only holds
+        the recovery keys, so the resumed page comes from Progress."""
+        app = bofs_app_with_external_id
+        app.config["SESSION_BACKEND"] = "cookie"
+        mturk_id = "WORKER_COOKIE"
+
+        first = app.test_client()
+        past_pid = _advance_to_external_id(first, app)
+        first.post("/external_id", data={"mTurkID": mturk_id}, follow_redirects=True)
+
+        stored = app.db.session.query(app.db.SessionStore).filter_by(
+            participantID=past_pid
+        ).one()
+        assert "currentUrl" not in BOFSSessionInterface.serializer.loads(stored.data)
+
+        second = app.test_client()
+        _advance_to_external_id(second, app)
+        response = second.post("/external_id", data={"mTurkID": mturk_id}, follow_redirects=False)
+
+        assert response.status_code == 302
+        assert "questionnaire/survey" in response.location
+        with second.session_transaction() as sess:
+            assert sess.get("participantID") == past_pid
+
+    # ------------------------------------------------------------------
+    # 9. cookie session backend: maintenance sweep keeps live mirror rows
+    # ------------------------------------------------------------------
+    def test_cookie_mirror_row_survives_sweep(self, bofs_app_with_external_id, monkeypatch):
+        """A participant still active past the session lifetime keeps its
+        SessionStore mirror row through the sweep, so recovery still works."""
+        from BOFS.services import maintenance
+
+        app = bofs_app_with_external_id
+        app.config["SESSION_BACKEND"] = "cookie"
+        mturk_id = "WORKER_LONG"
+        lifetime = app.permanent_session_lifetime
+        offset = [datetime.timedelta(0)]
+        shifted = lambda: utcnow_naive() + offset[0]
+        monkeypatch.setattr("BOFS.BOFSSession.utcnow_naive", shifted)
+        monkeypatch.setattr(maintenance, "utcnow_naive", shifted)
+
+        first = app.test_client()
+        past_pid = _advance_to_external_id(first, app)
+        first.post("/external_id", data={"mTurkID": mturk_id}, follow_redirects=True)
+
+        # Still working on the study most of a lifetime later...
+        offset[0] = lifetime - datetime.timedelta(days=1)
+        first.get("/questionnaire/survey")
+        # ...and the sweep runs after the first mirror write would expire.
+        offset[0] = lifetime + datetime.timedelta(days=1)
+        maintenance.run_sweep(app)
+
+        second = app.test_client()
+        _advance_to_external_id(second, app)
+        second.post("/external_id", data={"mTurkID": mturk_id}, follow_redirects=False)
+        with second.session_transaction() as sess:
+            assert sess.get("participantID") == past_pid
@@ -1,6 +1,7 @@
 """Tests for the BOFS expression engine (parser + evaluators)."""
 
 import json
+import math
 import os
 import shutil
 import subprocess
@@ -9,7 +10,9 @@ import pytest
 
 from BOFS.expressions import (
     ExpressionError,
+    compile_ast,
     evaluate,
+    optimize,
     parse,
     referenced_fields,
 )
@@ -520,3 +523,225 @@ def test_python_js_parity(src, env):
         f"parity mismatch for {src!r} with env {env!r}: "
         f"py={py_val!r}, js={js_val!r}"
     )
+
+
+# ---------------------------------------------------------------------------
+# Compiled evaluator: compile_ast(ast)(env) must match evaluate(ast, env),
+# including when and where errors are raised.
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("src,env", PARITY_CASES)
+def test_compiled_matches_interpreter(src, env):
+    from BOFS.expressions.evaluator import default_functions
+    ast = parse(src)
+    for funcs in (_TEST_FUNCS, default_functions()):
+        assert compile_ast(ast, funcs)(env) == evaluate(ast, env, functions=funcs)
+
+
+class TestCompiledEvaluator:
+    def test_reusable_across_envs(self):
+        fn = compile_ast(parse("age >= 18 and country in ['US', 'CA']"), _TEST_FUNCS)
+        assert fn({"age": 30, "country": "CA"}) is True
+        assert fn({"age": 12, "country": "CA"}) is False
+
+    def test_undefined_var_raises_on_call(self):
+        fn = compile_ast(parse("missing + 1"), _TEST_FUNCS)
+        with pytest.raises(ExpressionError):
+            fn({})
+
+    def test_short_circuit_skips_bad_branch(self):
+        fn = compile_ast(parse("flag and missing"), _TEST_FUNCS)
+        assert fn({"flag": False}) is False
+
+    def test_disallowed_function_deferred_to_call(self):
+        fn = compile_ast({"call": "exec", "args": []}, _TEST_FUNCS)
+        with pytest.raises(ExpressionError):
+            fn({})
+
+    def test_malformed_branch_deferred_until_reached(self):
+        ast = {"op": "if", "args": [{"var": "c"}, {"const": 1}, {"bogus": True}]}
+        fn = compile_ast(ast, _TEST_FUNCS)
+        assert fn({"c": True}) == 1
+        with pytest.raises(ExpressionError):
+            fn({"c": False})
+
+    def test_subscript(self):
+        fn = compile_ast(parse("d[k]"), _TEST_FUNCS)
+        assert fn({"d": {"1": "a"}, "k": 1}) == "a"
+        with pytest.raises(ExpressionError):
+            fn({"d": {}, "k": 1})
+
+    def test_default_functions_are_shared(self):
+        from BOFS.expressions.evaluator import _shared_default_functions
+        assert _shared_default_functions() is _shared_default_functions()
+        assert compile_ast(parse("mean([1, 2, 3])"))({}) == 2.0
+
+
+# ---------------------------------------------------------------------------
+# Optimizer: constant folding and dead-branch elimination.
+# ---------------------------------------------------------------------------
+
+def opt(src):
+    return optimize(parse(src), _TEST_FUNCS)
+
+
+class TestOptimizer:
+    def test_folds_literal_arithmetic(self):
+        assert opt("2 * 3 + 1") == {"const": 7}
+        assert opt("x + 2 * 3") == {"op": "+", "args": [{"var": "x"}, {"const": 6}]}
+
+    def test_folds_calls_on_constants(self):
+        assert opt("mean([1, 2, 3])") == {"const": 2.0}
+
+    def test_keeps_failing_subtree(self):
+        # Division by zero must still raise at evaluation time.
+        ast = opt("1 / 0")
+        assert ast == parse("1 / 0")
+        with pytest.raises(ZeroDivisionError):
+            evaluate(ast, {}, functions=_TEST_FUNCS)
+
+    def test_if_with_constant_test_prunes_arm(self):
+        assert opt("a if 2 > 1 else b") == {"var": "a"}
+        assert opt("a if 1 == 2 else b") == {"var": "b"}
+
+    def test_and_chain(self):
+        assert opt("True and x") == {"var": "x"}
+        assert opt("False and x") == {"const": False}
+        assert opt("x and 0 and y") == {"op": "and", "args": [{"var": "x"}, {"const": 0}]}
+        # A trailing truthy constant is the chain's value when x is truthy.
+        assert opt("x and 1") == parse("x and 1")
+
+    def test_or_chain(self):
+        assert opt("False or x") == {"var": "x"}
+        assert opt("x or 'y' or z") == {"op": "or", "args": [{"var": "x"}, {"const": "y"}]}
+        assert opt("0 or ''") == {"const": ""}
+
+    def test_referenced_fields_only_reachable(self):
+        assert referenced_fields(opt("a if 1 > 2 else b")) == {"b"}
+        assert referenced_fields(opt("(1 == 1) or expensive")) == set()
+
+    def test_does_not_mutate_input(self):
+        ast = parse("x + 2 * 3")
+        before = json.dumps(ast, sort_keys=True)
+        opt_ast = optimize(ast, _TEST_FUNCS)
+        assert json.dumps(ast, sort_keys=True) == before
+        assert opt_ast != ast
+
+    def test_list_literal_not_folded_to_const(self):
+        assert opt("[1, 2]") == parse("[1, 2]")
+        assert opt("2 in [1, 2]") == {"const": True}
+
+
+@pytest.mark.parametrize("src,env", PARITY_CASES)
+def test_optimized_matches_unoptimized(src, env):
+    ast = parse(src)
+    assert evaluate(optimize(ast, _TEST_FUNCS), env, functions=_TEST_FUNCS) == \
+        evaluate(ast, env, functions=_TEST_FUNCS)
+
+
+# ---------------------------------------------------------------------------
+# Vectorized evaluation: evaluate_columns must return exactly what the
+# per-row evaluator returns for every row, or refuse.
+# ---------------------------------------------------------------------------
+
+from BOFS.expressions.vectorized import Unvectorizable, evaluate_columns, worth_vectorizing  # noqa: E402
+
+VECTOR_CASES = [
+    "q1 + 6-q2 + q3",
+    "mean([q1, 6-q2, q3])",
+    "median([q1, q2, q3])",
+    "stdev([q1, q2, q3])",
+    "variance([q1, q2, q3, 2.5])",
+    "min(q1, q2, q3)",
+    "max([q1, q2])",
+    "q1 / 2 - q2 // 3 + q3 % 4",
+    "-q1 + abs(q2) * float(q3)",
+    "q1 > 2 and q2 <= 3",
+    "q1 == q2 or not q3",
+    "q1 != None",
+    "q1 if q2 > 2 else q3",
+    "1 if q1 >= 3 else 0",
+    "q1 and q2 or q3",
+]
+
+
+def _vector_rows():
+    import random
+    rng = random.Random(1234)
+    choices = [None, 0.0, -0.0, 1.0, 2.0, 3.0, 4.5, 5.0, float("nan")]
+    return [{name: rng.choice(choices) for name in ("q1", "q2", "q3")} for _ in range(400)]
+
+
+def _columns(rows):
+    import numpy
+    columns = {}
+    for name in ("q1", "q2", "q3"):
+        raw = [row[name] for row in rows]
+        missing = numpy.array([v is None for v in raw])
+        values = numpy.array([numpy.nan if v is None else v for v in raw])
+        columns[name] = (values, missing)
+    return columns
+
+
+def _same(a, b):
+    """Equal value and the same Python type family, so the two render
+    identically in an export (``1`` vs ``1.0``, ``0.0`` vs ``-0.0``)."""
+    if a is None or b is None:
+        return a is b
+    if isinstance(a, float) or isinstance(b, float):
+        if not (isinstance(a, float) and isinstance(b, float)):
+            return False
+        if a != a:
+            return b != b
+        return a == b and math.copysign(1, a) == math.copysign(1, b)
+    return a == b and isinstance(a, bool) == isinstance(b, bool)
+
+
+@pytest.mark.parametrize("src", VECTOR_CASES)
+def test_vectorized_matches_per_row(src):
+    from BOFS.expressions.evaluator import default_functions
+    funcs = default_functions()
+    ast = optimize(parse(src), funcs)
+    rows = _vector_rows()
+    expected = [evaluate(ast, row, functions=funcs) for row in rows]
+    actual = evaluate_columns(ast, _columns(rows), len(rows))
+    for row, e, a in zip(rows, expected, actual):
+        assert _same(e, a), (src, row, e, a)
+
+
+@pytest.mark.parametrize("src,expected", [
+    ("mean([q1, 6-q2, q3])", True),
+    ("max(q1, q2) - min(q1, q2)", True),
+    ("1 if stdev([q1, q2]) > 1 else 0", True),
+    ("q1 + 6-q2 + q3", False),
+    ("q1 if q2 > 2 else q3", False),
+    ("abs(q1) * float(q2)", False),
+])
+def test_worth_vectorizing(src, expected):
+    assert worth_vectorizing(parse(src)) is expected
+
+
+class TestVectorizedRefuses:
+    def _run(self, src, rows):
+        return evaluate_columns(parse(src), _columns(rows), len(rows))
+
+    def test_division_by_zero(self):
+        # The per-row path raises; the caller must see that, not inf.
+        rows = [{"q1": 1.0, "q2": 0.0, "q3": None}]
+        with pytest.raises(Unvectorizable):
+            self._run("q1 / q2", rows)
+
+    def test_division_by_missing_zero_is_fine(self):
+        rows = [{"q1": 1.0, "q2": None, "q3": None}]
+        assert self._run("q1 / q2", rows) == [None]
+
+    @pytest.mark.parametrize("src", ["sum([q1, q2])", "round(q1)", "len(q1)", "q1 in [1, 2]", "str(q1)"])
+    def test_unsupported_constructs(self, src):
+        rows = [{"q1": 1.0, "q2": 2.0, "q3": None}]
+        with pytest.raises(Unvectorizable):
+            self._run(src, rows)
+
+    def test_mixed_branch_types(self):
+        rows = [{"q1": 1.0, "q2": 2.0, "q3": None}]
+        with pytest.raises(Unvectorizable):
+            self._run("q1 if q2 else q1 > 0", rows)
@@ -779,6 +779,16 @@ class TestShowIfCompilation:
         with pytest.raises(Exception, match="show_if"):
             PageList(data)
 
+    def test_show_if_fields_skip_dead_branches(self):
+        """Fields are taken from the optimized AST, so a questionnaire
+        behind a constant-false branch is never loaded."""
+        data = [{'name': 'X', 'path': 'x',
+                 'show_if': "demographics.age >= 18 if 1 > 2 else source == 'prolific'"}]
+        PageList(data)
+        assert data[0]['_show_if_fields'] == {'source'}
+        assert len(data[0]['_show_if_refs']) == 1
+        assert data[0]['_show_if_fn']({'source': 'prolific'}) is True
+
     def test_show_if_disallowed_construct_raises(self):
         data = [{'name': 'X', 'path': 'x', 'show_if': '__import__("os")'}]
         with pytest.raises(Exception, match="show_if"):
@@ -1365,3 +1375,90 @@ class TestAnnotateOccurrences:
             ('instructions/intro', 1),
             ('end', 0),
         ]
+
+
+# ---------------------------------------------------------------------------
+# Navigation index
+# ---------------------------------------------------------------------------
+
+class TestNavigationIndex:
+    def test_cursor_and_first_occurrence_lookups(self):
+        from BOFS.PageList import NavigationIndex
+        index = NavigationIndex([
+            {'name': 'Intro', 'path': 'instructions/intro'},
+            {'name': 'Task', 'path': 'task'},
+            {'name': 'Intro Again', 'path': 'instructions/intro'},
+        ])
+        assert len(index) == 3
+        assert index.index_of('instructions/intro') == 0
+        assert index.index_of('instructions/intro', 1) == 2
+        assert index.index_of('instructions/intro', 2) is None
+        assert index.index_of('missing') is None
+        assert index.annotated[2][1] == 1
+
+    def test_static_sequence_reused_across_participants(self):
+        pl = PageList([
+            {'name': 'A', 'path': 'a'},
+            {'conditional_routing': [
+                {'condition': 1, 'page_list': [{'name': 'B', 'path': 'b'}]},
+                {'condition': 2, 'page_list': [
+                    {'name': 'C', 'path': 'c', 'show_if': 'age < 18'},
+                ]},
+            ]},
+        ])
+        first = pl.navigation(condition=1, participant_id=1)
+        assert pl.navigation(condition=1, participant_id=2, hide_unresolved=True) is first
+        assert [e['path'] for e in first.entries] == ['a', 'b']
+        # Condition 2 selects the arm with a gated page.
+        assert pl._static_navigation_for(2) is None
+
+    def test_show_if_on_any_reachable_arm_is_dynamic(self):
+        """hide_unresolved inspects every arm the condition doesn't rule
+        out, so a gated later arm makes the sequence dynamic too."""
+        pl = PageList([
+            {'conditional_routing': [
+                {'condition': 1, 'page_list': [{'name': 'B', 'path': 'b'}]},
+                {'show_if': 'age < 18', 'page_list': [{'name': 'C', 'path': 'c'}]},
+            ]},
+        ])
+        assert pl._sequence_has_show_if(1)
+        assert pl._sequence_has_show_if(2)
+        assert pl._static_navigation_for(1) is None
+
+    def test_reassigning_page_list_drops_indexes(self):
+        pl = PageList([{'name': 'A', 'path': 'a'}])
+        pl.precompile_navigation(0)
+        pl.page_list = [{'name': 'B', 'path': 'b'}]
+        assert [e['path'] for e in pl.flat_page_list(condition=0)] == ['b']
+
+    def test_appending_in_place_drops_indexes(self):
+        pl = PageList([{'name': 'A', 'path': 'a'}])
+        pl.precompile_navigation(0)
+        pl.page_list.append({'name': 'B', 'path': 'b'})
+        assert [e['path'] for e in pl.flat_page_list(condition=0)] == ['a', 'b']
+
+    def test_editing_an_entry_in_place_recompiles_show_if(self):
+        pl = PageList([{'name': 'A', 'path': 'a'}, {'name': 'B', 'path': 'b'}])
+        assert pl._static_navigation_for(0) is not None
+        pl.page_list[1]['show_if'] = 'age < 18'
+        pl.flat_page_list(condition=0, participant_id=None)
+        assert '_show_if_ast' in pl.page_list[1]
+        assert pl._static_navigation_for(0) is None
+
+    def test_navigation_follows_overridden_flat_page_list(self):
+        class Custom(PageList):
+            def flat_page_list(self, *args, **kwargs):
+                return super(Custom, self).flat_page_list(*args, **kwargs)[::-1]
+
+        pl = Custom([{'name': 'A', 'path': 'a'}, {'name': 'B', 'path': 'b'}])
+        assert [e['path'] for e in pl.navigation(condition=0).entries] == ['b', 'a']
+
+    def test_auto_tagging_rebuilds_index(self):
+        pl = PageList([
+            {'name': 'S', 'path': 'questionnaire/survey'},
+            {'name': 'S', 'path': 'questionnaire/survey'},
+        ])
+        pl.precompile_navigation(0)
+        pl.auto_tag_duplicate_questionnaires(0)
+        index = pl.navigation(condition=0)
+        assert index.index_of('questionnaire/survey/2') == 1
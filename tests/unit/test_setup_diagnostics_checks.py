@@ -239,6 +239,26 @@ class TestPageListShowIfRefs:
         assert "years" in results[0].message
         assert "intake" in results[0].message
 
+    def test_ambiguous_bare_field_warns_once(self):
+        questionnaires = {}
+        for name in ("pre", "post"):
+            q = _q({"questions": [{"questiontype": "field", "id": "mood"}]})
+            q.db_class = object()
+            questionnaires[name] = q
+        page_list = _build_page_list([
+            {"name": "A", "path": "questionnaire/a", "show_if": "mood > 3"},
+            {"name": "B", "path": "questionnaire/b", "show_if": "mood < 2"},
+            {"name": "C", "path": "questionnaire/c", "show_if": "post.mood < 2"},
+        ])
+        results = validate_page_list_show_if_refs(
+            page_list, questionnaires, tables={}
+        )
+        assert len(results) == 1
+        assert results[0].severity == "warning"
+        assert "'mood'" in results[0].message
+        assert "pre, post" in results[0].message
+        assert "pre.mood" in results[0].suggestion
+
     def test_conditional_routing_arm_show_if_checked(self):
         page_list = _build_page_list([
             {"name": "Branch", "path": "questionnaire/branch",